@@ -3,6 +3,7 @@ agents 模块初始化
 """
 from .intent_classifier import create_intent_classifier
 from .ambiguity_checker import create_ambiguity_checker
+from .unified_analyzer import create_unified_analyzer
 from .context_assembler import create_context_assembler
 from .sql_generator import create_sql_generator
 from .sql_executor import create_sql_executor
@@ -17,6 +18,7 @@ from .python_executor import create_python_executor
 __all__ = [
     "create_intent_classifier",
     "create_ambiguity_checker", 
+    "create_unified_analyzer",
     "create_context_assembler",
     "create_sql_generator",
     "create_sql_executor",
@@ -1,19 +1,36 @@
 """
 歧义检测与澄清智能体 - 使用 LLM 检测查询中的歧义并生成澄清问题
 """
-import json
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
 
 from state import AgentState, IntentType
-from tools.schema_cache import get_metrics_text
+from tools.schema_cache import get_metrics_prompt_text
+from tools.llm_cache import LLMResponseCache, cached_invoke
+from tools.llm_json import extract_first_json_array, extract_first_json_model
+
+
+class AmbiguityResult(BaseModel):
+    """歧义检测 LLM 输出"""
+    ambiguity_detected: bool = False
+    ambiguity_details: List[Any] = []
+    clarification_question: Optional[str] = None
+    refined_intent: Optional[str] = None
+
 
-def create_ambiguity_checker(llm_client, prompt_builder):
+def _parse_ambiguity_result(response_text: str) -> Optional[AmbiguityResult]:
+    return extract_first_json_model(response_text, AmbiguityResult)
+
+
+def create_ambiguity_checker(llm_client, prompt_builder, response_cache: LLMResponseCache | None = None):
     """
     创建歧义检测节点函数
     
     Args:
         llm_client: LLM 客户端
         prompt_builder: 提示词构建器
+        response_cache: 可选的 LLM 响应缓存，相同 prompt 直接复用解析结果
     """
     
     def ambiguity_checker_node(state: AgentState) -> Dict[str, Any]:
@@ -24,9 +41,6 @@ def create_ambiguity_checker(llm_client, prompt_builder):
         clarification_response = state.get("clarification_response", "")
         clarification_count = state.get("clarification_count", 0)
         
-        # 加载全量指标体系 (使用缓存)
-        full_metrics_text = get_metrics_text()
-        
         # 如果已经澄清过多次，直接放行
         if clarification_count >= 2:
             return {
@@ -35,6 +49,9 @@ def create_ambiguity_checker(llm_client, prompt_builder):
                 "current_node": "ambiguity_checker"
             }
         
+        # 以下分支都会调用 LLM，此时才加载全量指标体系 (使用缓存)
+        full_metrics_text = get_metrics_prompt_text()
+        
         # 关键修复：如果用户已经提供了澄清回复，直接放行，不再检测歧义
         if clarification_response:
             refined = f"{user_query} ({clarification_response})"
@@ -44,7 +61,8 @@ def create_ambiguity_checker(llm_client, prompt_builder):
                 prompt_builder=prompt_builder,
                 user_query=user_query,
                 refined_intent=refined,
-                full_metrics_text=full_metrics_text
+                full_metrics_text=full_metrics_text,
+                response_cache=response_cache
             )
             return {
                 "ambiguity_detected": False,
@@ -75,70 +93,70 @@ def create_ambiguity_checker(llm_client, prompt_builder):
             conversation_history=history_text
         )
         
-        # 调用 LLM
-        response = llm_client.invoke(prompt)
-        
-        # 解析响应
-        try:
-            response_text = response.content if hasattr(response, 'content') else str(response)
-            
-            # 提取 JSON
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                result = json.loads(json_str)
-            else:
-                try:
-                    result = json.loads(response_text)
-                except:
-                    result = {"ambiguity_detected": False, "refined_intent": user_query}
-            
-            ambiguity_detected = result.get("ambiguity_detected", False)
-            
-            if ambiguity_detected:
-                return {
-                    "ambiguity_detected": True,
-                    "ambiguity_details": result.get("ambiguity_details", []),
-                    "clarification_question": result.get("clarification_question", "请提供更多细节"),
-                    "current_node": "ambiguity_checker",
-                    "clarification_count": clarification_count + 1
-                }
-            else:
-                # 无歧义时，使用 LLM 提取结构化的指标体系
-                extracted_metrics = _extract_metrics_with_llm(
-                    llm_client=llm_client,
-                    prompt_builder=prompt_builder,
-                    user_query=user_query,
-                    refined_intent=result.get("refined_intent", user_query),
-                    full_metrics_text=full_metrics_text
-                )
-                
-                return {
-                    "ambiguity_detected": False,
-                    "ambiguity_details": [],
-                    "refined_intent": result.get("refined_intent", user_query),
-                    "metrics_context": extracted_metrics,  # 新增：LLM 提取的指标体系
-                    "current_node": "ambiguity_checker"
-                }
-            
-        except json.JSONDecodeError:
+        # 调用 LLM (带缓存) 并提取 JSON
+        result = cached_invoke(
+            response_cache,
+            "ambiguity_checker",
+            llm_client,
+            prompt,
+            _parse_ambiguity_result,
+        )
+        if result is None:
             # 解析失败，默认放行
+            result = AmbiguityResult()
+
+        refined_intent = result.refined_intent or user_query
+
+        if result.ambiguity_detected:
+            return {
+                "ambiguity_detected": True,
+                "ambiguity_details": result.ambiguity_details,
+                "clarification_question": result.clarification_question or "请提供更多细节",
+                "current_node": "ambiguity_checker",
+                "clarification_count": clarification_count + 1
+            }
+        else:
+            # 无歧义时，使用 LLM 提取结构化的指标体系
+            extracted_metrics = _extract_metrics_with_llm(
+                llm_client=llm_client,
+                prompt_builder=prompt_builder,
+                user_query=user_query,
+                refined_intent=refined_intent,
+                full_metrics_text=full_metrics_text,
+                response_cache=response_cache
+            )
+
             return {
                 "ambiguity_detected": False,
-                "refined_intent": user_query,
+                "ambiguity_details": [],
+                "refined_intent": refined_intent,
+                "metrics_context": extracted_metrics,  # 新增：LLM 提取的指标体系
                 "current_node": "ambiguity_checker"
             }
-    
+
     return ambiguity_checker_node
 
 
+def _filter_metric_items(items: list) -> list[dict[str, str]]:
+    """只保留包含一级/二级指标键的字典"""
+    return [
+        item for item in items
+        if isinstance(item, dict) and '一级指标' in item and '二级指标' in item
+    ]
+
+
+def _parse_extracted_metrics(response_text: str) -> list[dict[str, str]]:
+    """从 LLM 响应中提取指标列表，只保留包含一级/二级指标键的字典"""
+    return _filter_metric_items(extract_first_json_array(response_text) or [])
+
+
 def _extract_metrics_with_llm(
     llm_client,
     prompt_builder,
     user_query: str,
     refined_intent: str,
-    full_metrics_text: str
+    full_metrics_text: str,
+    response_cache: LLMResponseCache | None = None
 ) -> list[dict[str, str]]:
     """
     使用 LLM 从全量指标体系中提取与用户问题相关的指标列表。
@@ -182,23 +200,15 @@ def _extract_metrics_with_llm(
 请只输出 JSON 数组："""
 
     try:
-        # 调用 LLM
-        response = llm_client.invoke(extract_prompt)
-        response_text = response.content if hasattr(response, 'content') else str(response)
-        
-        # 提取 JSON
-        json_start = response_text.find('[')
-        json_end = response_text.rfind(']') + 1
-        if json_start >= 0 and json_end > json_start:
-            json_str = response_text[json_start:json_end]
-            extracted_metrics = json.loads(json_str)
-            if isinstance(extracted_metrics, list):
-                # 验证每个元素是否是字典且包含需要的键
-                validated = []
-                for item in extracted_metrics:
-                    if isinstance(item, dict) and '一级指标' in item and '二级指标' in item:
-                        validated.append(item)
-                return validated
+        # 调用 LLM (带缓存，仅缓存非空结果)
+        return cached_invoke(
+            response_cache,
+            "ambiguity_checker.extract_metrics",
+            llm_client,
+            extract_prompt,
+            _parse_extracted_metrics,
+            should_cache=bool,
+        )
     except Exception as e:
         # 提取失败，返回空列表，让下游使用全量指标
         print(f"[WARNING] LLM 指标提取失败: {e}")
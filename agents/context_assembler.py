@@ -3,75 +3,137 @@
 """
 # pyright: reportDeprecated=false, reportUnknownParameterType=false, reportMissingTypeArgument=false, reportUnknownVariableType=false, reportUnknownMemberType=false, reportUnknownArgumentType=false, reportUnnecessaryComparison=false
 import json
+from functools import lru_cache
 from typing import cast, Optional
 
 from state import AgentState, IntentType
-from prompts.prompt_builder import PromptBuilder
-from prompts.domain_config import EducationDomain, DomainConfig
+from prompts.prompt_builder import PromptBuilder, get_prompt_builder
 from prompts.sql_samples import SQLSampleLibrary
 from tools.schema_provider import get_schema_provider
+from tools.json_utils import dumps_compact
 
 
-def filter_metrics_by_selection(full_metrics: dict[str, object], selected_metrics: list[str]) -> str:
+class _MetricSelectionIndex:
+    """
+    指标体系的扁平化索引
+
+    在指标体系加载后构建一次，把每个一级/二级指标预先渲染成文本块，
+    筛选时只需按路径查表拼接；相同的筛选组合直接命中 LRU 缓存。
+    """
+
+    def __init__(self, full_metrics: dict[str, object]):
+        self.full_metrics = full_metrics
+        self.level1_blocks: dict[str, list[str]] = {}
+        self.level2_blocks: dict[tuple[str, str], list[str]] = {}
+        # 指标在文档中的先后位置，用于把筛选结果排成固定顺序
+        self.positions: dict[tuple[str, str], int] = {}
+
+        for level1_name, level1_raw in full_metrics.items():
+            if not isinstance(level1_raw, dict):
+                continue
+            level1_data = cast(dict[str, object], level1_raw)
+            level2_dict = cast(dict[str, dict[str, object]], level1_data.get("二级指标", {}))
+
+            self.positions[(level1_name, "")] = len(self.positions)
+            block = [f"### {level1_name}", f"定义: {level1_data.get('一级指标解释', '')}"]
+            if level2_dict:
+                # 列出其下的二级指标
+                block.append("包含二级指标:")
+                for l2_name, l2_info in level2_dict.items():
+                    block.append(f"  - {l2_name}: {l2_info.get('二级指标解释', '')}")
+                    self.positions[(level1_name, l2_name)] = len(self.positions)
+                    self.level2_blocks[(level1_name, l2_name)] = [
+                        f"### {level1_name} > {l2_name}",
+                        f"定义: {l2_info.get('二级指标解释', '')}",
+                    ]
+            self.level1_blocks[level1_name] = block
+
+        self.filter = lru_cache(maxsize=512)(self._filter)
+        self._full_text: Optional[str] = None
+
+    @property
+    def full_text(self) -> str:
+        """全量指标体系文本（同一份指标体系只序列化一次）"""
+        if self._full_text is None:
+            self._full_text = dumps_compact(self.full_metrics)
+        return self._full_text
+
+    def canonical_selection(self, selected_metrics: list[str]) -> tuple[tuple[str, str], ...]:
+        """
+        去重并按指标体系文档顺序排列，与 LLM 给出的顺序无关
+
+        同一组指标总是渲染成相同文本，SQL 生成 prompt 的前缀保持稳定，
+        便于推理端复用 KV 缓存，也提高筛选结果的 LRU 命中率。
+        """
+        paths: set[tuple[str, str]] = set()
+        for metric_path in selected_metrics:
+            # 解析 "一级 > 二级" 格式
+            parts = [p.strip() for p in metric_path.split(">")]
+            paths.add((parts[0], parts[1] if len(parts) >= 2 else ""))
+        unknown = len(self.positions)
+        return tuple(sorted(paths, key=lambda path: (self.positions.get(path, unknown), path)))
+
+    def _filter(self, selected_metrics: tuple[tuple[str, str], ...]) -> Optional[str]:
+        filtered_parts: list[str] = []
+
+        for level1_name, level2_name in selected_metrics:
+            # 在全量指标中查找
+            if level1_name not in self.full_metrics:
+                continue
+            if level2_name:
+                filtered_parts.extend(self.level2_blocks.get((level1_name, level2_name), ()))
+            else:
+                filtered_parts.extend(self.level1_blocks.get(level1_name, ()))
+            filtered_parts.append("")
+
+        return "\n".join(filtered_parts) if filtered_parts else None
+
+
+# 最近一次使用的索引（指标体系文件不变时 full_metrics 为同一对象）
+_selection_index: Optional[_MetricSelectionIndex] = None
+
+
+def _get_selection_index(full_metrics: dict[str, object]) -> _MetricSelectionIndex:
+    global _selection_index
+    index = _selection_index
+    if index is None or index.full_metrics is not full_metrics:
+        index = _MetricSelectionIndex(full_metrics)
+        _selection_index = index
+    return index
+
+
+def filter_metrics_by_selection(
+    full_metrics: dict[str, object],
+    selected_metrics: list[str],
+    full_metrics_text: Optional[str] = None,
+) -> str:
     """
     根据 Query Planner 选择的指标，从全量指标中提取相关部分
     
     Args:
         full_metrics: 完整指标体系 (dict)
         selected_metrics: Query Planner 筛选出的指标列表 (e.g., ["基础设施 > 网络"])
+        full_metrics_text: 已序列化的全量指标文本（来自缓存），回退时直接复用
         
     Returns:
         筛选后的指标信息文本
     """
-    if not selected_metrics:
-        # 如果没有筛选结果，返回全部（退化为原逻辑）
-        return json.dumps(full_metrics, ensure_ascii=False, indent=2)
-    
-    filtered_parts = []
-    
-    for metric_path in selected_metrics:
-        # 解析 "一级 > 二级" 格式
-        parts = [p.strip() for p in metric_path.split(">")]
-        level1_name = parts[0] if len(parts) >= 1 else ""
-        level2_name = parts[1] if len(parts) >= 2 else None
-        
-        # 在全量指标中查找
-        if level1_name in full_metrics:
-            level1_data = cast(dict[str, object], full_metrics[level1_name])
-            
-            if level2_name:
-                # 二级指标
-                level2_dict = cast(dict[str, dict[str, object]], level1_data.get("二级指标", {}))
-                if level2_name in level2_dict:
-                    filtered_parts.append(f"### {level1_name} > {level2_name}")
-                    filtered_parts.append(f"定义: {level2_dict[level2_name].get('二级指标解释', '')}")
-            else:
-                # 一级指标
-                filtered_parts.append(f"### {level1_name}")
-                filtered_parts.append(f"定义: {level1_data.get('一级指标解释', '')}")
-                # 列出其下的二级指标
-                level2_dict = cast(dict[str, dict[str, object]], level1_data.get("二级指标", {}))
-                if level2_dict:
-                    filtered_parts.append("包含二级指标:")
-                    for l2_name, l2_info in level2_dict.items():
-                        filtered_parts.append(f"  - {l2_name}: {l2_info.get('二级指标解释', '')}")
-            
-            filtered_parts.append("")
-    
-    if filtered_parts:
-        return "\n".join(filtered_parts)
-    else:
-        # 未能匹配，返回全部
-        return json.dumps(full_metrics, ensure_ascii=False, indent=2)
-
-
-def get_domain_config() -> DomainConfig:
-    """获取域配置"""
-    return EducationDomain()
+    index = _get_selection_index(full_metrics)
+    if selected_metrics:
+        filtered_text = index.filter(index.canonical_selection(selected_metrics))
+        if filtered_text is not None:
+            return filtered_text
+    # 没有筛选结果或未能匹配，返回全部（退化为原逻辑）
+    return full_metrics_text or index.full_text
 
 
+@lru_cache(maxsize=8)
 def _parse_json_object(text: str) -> Optional[dict[str, object]]:
-    """Best-effort parse for provider text that may still be JSON."""
+    """
+    Best-effort parse for provider text that may still be JSON.
+
+    Provider 文本来自进程级缓存，内容不变时直接复用解析结果（调用方只读，勿修改）。
+    """
     if not text:
         return None
 
@@ -135,9 +197,9 @@ def create_context_assembler(prompt_builder: Optional[PromptBuilder] = None):
         schema = _parse_json_object(schema_text) or {"schema_summary": schema_text}
         full_metrics = _parse_json_object(metrics_text)
         
-        # 获取域配置和 PromptBuilder
-        domain = get_domain_config()
-        builder = prompt_builder or PromptBuilder(domain=domain)
+        # 获取 PromptBuilder 和域配置（优先复用图构建时创建的实例）
+        builder = prompt_builder or get_prompt_builder()
+        domain = builder.domain
         
         # 判断是否为指标查询
         is_metric_query = (intent_type == IntentType.METRIC_QUERY or 
@@ -159,7 +221,11 @@ def create_context_assembler(prompt_builder: Optional[PromptBuilder] = None):
             # 非指标查询 (VALUE_QUERY): 使用原有的完整 SQL 生成 Prompt
             # 根据选择的指标进行上下文剪枝
             if selected_metrics and full_metrics:
-                filtered_metrics_text = filter_metrics_by_selection(full_metrics, selected_metrics)
+                filtered_metrics_text = filter_metrics_by_selection(
+                    full_metrics,
+                    selected_metrics,
+                    full_metrics_text=metrics_text,
+                )
             elif metrics_text:
                 filtered_metrics_text = metrics_text
             else:
@@ -1,19 +1,45 @@
 """
 意图分类智能体 - 使用 LLM 分析用户查询意图
 """
-import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from pydantic import BaseModel
 
 from state import AgentState, IntentType, MetricInfo
 from tools.schema_cache import get_metrics_summary
+from tools.llm_cache import LLMResponseCache, cached_invoke
+from tools.llm_json import extract_first_json_model
+
+
+# LLM 输出的意图字符串 -> IntentType，模块加载时构建一次
+_INTENT_TYPE_MAP: dict[str, IntentType] = {
+    "value_query": IntentType.VALUE_QUERY,
+    "simple_query": IntentType.VALUE_QUERY,
+    "metric_query": IntentType.METRIC_QUERY,
+    "metric_definition": IntentType.METRIC_DEFINITION,
+    "chitchat": IntentType.CHITCHAT,
+}
+
+
+class IntentResult(BaseModel):
+    """意图分类 LLM 输出"""
+    intent_type: str = "chitchat"
+    analysis: Optional[str] = ""
+    refined_intent: Optional[str] = None
+
+
+def _parse_intent_result(response_text: str) -> Optional[IntentResult]:
+    return extract_first_json_model(response_text, IntentResult)
 
-def create_intent_classifier(llm_client, prompt_builder):
+
+def create_intent_classifier(llm_client, prompt_builder, response_cache: LLMResponseCache | None = None):
     """
     创建意图分类节点函数
     
     Args:
         llm_client: LLM 客户端，需要有 invoke 方法
         prompt_builder: 提示词构建器
+        response_cache: 可选的 LLM 响应缓存，相同 prompt 直接复用解析结果
     """
     
     def intent_classifier_node(state: AgentState) -> Dict[str, Any]:
@@ -52,56 +78,31 @@ def create_intent_classifier(llm_client, prompt_builder):
             full_metrics_context=metrics_summary
         )
         
-        # 调用 LLM
-        response = llm_client.invoke(prompt)
-        
-        # 解析响应
-        try:
-            # 提取 JSON
-            response_text = response.content if hasattr(response, 'content') else str(response)
-            
-            # 尝试找到 JSON 块
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                result = json.loads(json_str)
-            else:
-                try:
-                    result = json.loads(response_text)
-                except:
-                    result = {"intent_type": "chitchat", "analysis": "解析失败"}
-            
-            # 转换意图类型
-            intent_type_str = result.get("intent_type", "chitchat")
-            intent_type_map = {
-                "value_query": IntentType.VALUE_QUERY,
-                "metric_query": IntentType.METRIC_QUERY,
-                "metric_definition": IntentType.METRIC_DEFINITION,
-                "chitchat": IntentType.CHITCHAT
-            }
-            intent_type = intent_type_map.get(intent_type_str, IntentType.CHITCHAT)
-            
-            # 使用改写后的意图重新赋值 user_query (方案 A: 直接覆盖)
-            # 这样下游节点可以直接消费最清晰的 Query，无需感知多轮逻辑
-            final_query = result.get("refined_intent", user_query)
-            
-            return {
-                "intent_type": intent_type,
-                "intent_analysis": result.get("analysis", ""),
-                "user_query": final_query,               # 正式覆盖原始 user_query
-                "correction_count": 0,                   # 初始化计数器
-                "current_node": "intent_classifier"
-            }
-            
-        except json.JSONDecodeError:
-            return {
-                "intent_type": IntentType.CHITCHAT,
-                "intent_analysis": "无法解析 LLM 响应",
-                "correction_count": 0,
-                "current_node": "intent_classifier"
-            }
+        # 调用 LLM (带缓存) 并提取 JSON
+        result = cached_invoke(
+            response_cache,
+            "intent_classifier",
+            llm_client,
+            prompt,
+            _parse_intent_result,
+        )
+        if result is None:
+            result = IntentResult(analysis="无法解析 LLM 响应")
 
+        # 转换意图类型
+        intent_type = _INTENT_TYPE_MAP.get(result.intent_type, IntentType.CHITCHAT)
+
+        # 使用改写后的意图重新赋值 user_query (方案 A: 直接覆盖)
+        # 这样下游节点可以直接消费最清晰的 Query，无需感知多轮逻辑
+        final_query = result.refined_intent or user_query
+
+        return {
+            "intent_type": intent_type,
+            "intent_analysis": result.analysis or "",
+            "user_query": final_query,               # 正式覆盖原始 user_query
+            "correction_count": 0,                   # 初始化计数器
+            "current_node": "intent_classifier"
+        }
 
-    
     return intent_classifier_node
+
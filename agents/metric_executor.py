@@ -11,6 +11,7 @@ from typing import Protocol
 
 from state import AgentState
 from config import config
+from prompts.sql_rules import is_safe_sql
 
 
 class _DBCursor(Protocol):
@@ -344,36 +345,15 @@ def _safety_sql_check(sql: str) -> str | None:
     Returns:
         错误信息，如果没有危险操作返回 None
     """
-    sql_upper = sql.upper().strip()
-    
-    # 只允许以 SELECT 或 CREATE TABLE 开头的语句
-    if not (sql_upper.startswith("SELECT") or 
-            sql_upper.startswith("CREATE TABLE") or 
-            sql_upper.startswith("CREATE TEMPORARY TABLE")):
-        return "只允许 SELECT 和 CREATE TABLE 语句"
+    sql_stripped = sql.strip()
     
     # 禁止多语句（分号注入）
-    if ";" in sql_upper.rstrip(";"):
+    if ";" in sql_stripped.rstrip(";"):
         return "禁止多语句执行"
     
-    # 检查危险关键字
-    dangerous_keywords = [
-        r"\bDROP\b",
-        r"\bDELETE\b", 
-        r"\bUPDATE\b",
-        r"\bINSERT\b",
-        r"\bALTER\b",
-        r"\bTRUNCATE\b",
-        r"\bGRANT\b",
-        r"\bREVOKE\b",
-        r"\bEXEC\b",
-        r"\bEXECUTE\b",
-    ]
-    
-    import re
-    for pattern in dangerous_keywords:
-        if re.search(pattern, sql_upper):
-            return f"检测到危险操作: {pattern}"
+    # 起始语句与危险关键字与 prompts.sql_rules 共用同一份 FORBIDDEN_KEYWORDS
+    if not is_safe_sql(sql_stripped, allow_create_table=True):
+        return "只允许 SELECT 和 CREATE TABLE 语句，且不能包含危险操作关键字"
     
     return None  # 安全检查通过
 
@@ -578,49 +558,9 @@ def _execute_select_directly(
 
 def _is_safe_sql(sql: str) -> bool:
     """
-    检查SQL是否安全
-    
-    允许的操作:
-    - SELECT 语句（包括 UNION）
-    - CREATE TABLE 语句（用于临时表物化）
-    
-    禁止的操作:
-    - 数据修改: INSERT, UPDATE, DELETE
-    - 结构修改: DROP, ALTER, TRUNCATE
-    - 权限操作: GRANT, REVOKE
-    - 执行操作: EXEC, EXECUTE
+    检查SQL是否安全（允许 SELECT 与用于临时表物化的 CREATE TABLE，规则见 _safety_sql_check）
     """
-    import re
-    
-    sql_upper = sql.upper().strip()
-
-    # 只允许以 SELECT 或 CREATE TABLE 开头的语句
-    if not (sql_upper.startswith("SELECT") or sql_upper.startswith("CREATE TABLE") or sql_upper.startswith("CREATE TEMPORARY TABLE")):
-        return False
-
-    # 禁止多语句（分号注入）
-    if ";" in sql_upper.rstrip(";"):
-        return False
-
-    # 使用词边界检查危险关键字，避免误杀字段名（如 updated_at）
-    dangerous_keywords = [
-        r"\bDROP\b",
-        r"\bDELETE\b",
-        r"\bUPDATE\b",
-        r"\bINSERT\b",
-        r"\bALTER\b",
-        r"\bTRUNCATE\b",
-        r"\bGRANT\b",
-        r"\bREVOKE\b",
-        r"\bEXEC\b",
-        r"\bEXECUTE\b",
-    ]
-
-    for pattern in dangerous_keywords:
-        if re.search(pattern, sql_upper):
-            return False
-
-    return True
+    return _safety_sql_check(sql) is None
 
 
 __all__ = ["create_metric_executor"]
@@ -18,6 +18,7 @@ from typing import Protocol, TypeAlias, cast
 from agents.metric_constants import MAX_ITERATIONS
 from prompts.data_validation_prompt import build_data_validation_prompt
 from state import AgentState
+from tools.llm_json import extract_first_json_obj
 
 MetricPlanNode: TypeAlias = dict[str, object]
 Observation: TypeAlias = dict[str, object]
@@ -241,15 +242,9 @@ def _parse_validation_response(response_text: str) -> dict[str, object]:
         pass
 
     # 尝试提取 JSON 块
-    try:
-        json_start = response_text.find("{")
-        json_end = response_text.rfind("}") + 1
-        if json_start >= 0 and json_end > json_start:
-            result = json.loads(response_text[json_start:json_end])
-            if isinstance(result, dict):
-                return result
-    except json.JSONDecodeError:
-        pass
+    result = extract_first_json_obj(response_text)
+    if result is not None:
+        return result
 
     # 解析失败，返回空结果
     return {
@@ -12,6 +12,8 @@ from typing import Protocol, TypeAlias, cast
 
 from state import AgentState
 from config import config
+from runtime import get_llm_http_clients
+from tools.json_utils import dumps_compact, loads
 
 MetricPlanNode: TypeAlias = dict[str, object]
 StepResult: TypeAlias = dict[str, object]
@@ -523,8 +525,6 @@ def _build_intermediate_table_context(
 
 def _call_llm_api(prompt: str) -> str:
     """调用LLM API生成SQL"""
-    import requests
-    
     # 验证配置完整性
     if not hasattr(config, 'llm') or config.llm is None:
         raise ValueError("LLM配置缺失: config.llm 未配置")
@@ -549,10 +549,14 @@ def _call_llm_api(prompt: str) -> str:
         "Content-Type": "application/json"
     }
     
-    response = requests.post(url, json=payload, headers=headers, timeout=60)
+    # 复用进程级共享的 keep-alive 连接池
+    http_client, _ = get_llm_http_clients()
+    # orjson（C 实现）一次完成序列化与 UTF-8 编码，直接以 bytes 发送
+    body = dumps_compact(payload).encode("utf-8")
+    response = http_client.post(url, content=body, headers=headers, timeout=60)
     response.raise_for_status()
     
-    result_obj = cast(object, response.json())
+    result_obj = cast(object, loads(response.content))
     if not isinstance(result_obj, dict):
         raise ValueError("LLM返回格式错误: 顶层不是JSON对象")
     result: dict[str, object] = result_obj
@@ -6,7 +6,10 @@ import logging
 from typing import Protocol, cast
 
 from state import AgentState, IntentType
+from tools.schema_prefilter import prefilter_schema_text
 from tools.schema_provider import get_schema_provider
+from tools.llm_cache import LLMResponseCache, cached_invoke
+from tools.llm_json import extract_first_json_obj
 
 try:
     from config import config
@@ -27,16 +30,16 @@ class QueryPlannerLLM(Protocol):
         ...
 
 
-class LLMResponseWithContent(Protocol):
-    content: str
-
-
-def create_query_planner(llm_client: QueryPlannerLLM):
+def create_query_planner(
+    llm_client: QueryPlannerLLM,
+    response_cache: LLMResponseCache | None = None,
+):
     """
     创建查询规划节点
 
     Args:
         llm_client: LLM 客户端
+        response_cache: 可选的 LLM 响应缓存，仅缓存通过校验的计划
     """
 
     def query_planner_node(state: AgentState) -> dict[str, object]:
@@ -71,20 +74,25 @@ def create_query_planner(llm_client: QueryPlannerLLM):
                 query=refined_intent,
             )
         else:
+            # 表较多时只保留与问题相关的表，缩短提示词（指标查询的 schema 还要交给下游，不筛选）
             prompt = SIMPLE_QUERY_PLANNER_PROMPT_TEMPLATE.format(
                 system_prompt=SIMPLE_QUERY_PLANNER_SYSTEM_PROMPT,
-                schema=schema,
+                schema=prefilter_schema_text(schema, refined_intent, config.planner_schema_max_tables),
                 query=refined_intent,
             )
 
-        response = llm_client.invoke(prompt)
-        if hasattr(response, "content"):
-            response_text = cast(LLMResponseWithContent, response).content
-        else:
-            response_text = str(response)
+        def _is_valid_plan(plan: dict[str, object]) -> bool:
+            return not _get_plan_validation_error(plan, intent_type)
 
         query_plan, validation_error = _normalize_and_validate_plan(
-            _parse_plan_json(response_text),
+            cached_invoke(
+                response_cache,
+                "query_planner",
+                llm_client,
+                prompt,
+                _parse_plan_json,
+                should_cache=_is_valid_plan,
+            ),
             intent_type,
         )
 
@@ -94,14 +102,15 @@ def create_query_planner(llm_client: QueryPlannerLLM):
                 "\n\n⚠️ 你上次的输出未能被正确解析为 JSON，或缺少必填字段。"
                 f" 问题: {validation_error}。请严格按照输出格式要求重新输出 JSON。"
             )
-            retry_response = llm_client.invoke(prompt + retry_suffix)
-            if hasattr(retry_response, "content"):
-                retry_text = cast(LLMResponseWithContent, retry_response).content
-            else:
-                retry_text = str(retry_response)
-
             query_plan, validation_error = _normalize_and_validate_plan(
-                _parse_plan_json(retry_text),
+                cached_invoke(
+                    response_cache,
+                    "query_planner",
+                    llm_client,
+                    prompt + retry_suffix,
+                    _parse_plan_json,
+                    should_cache=_is_valid_plan,
+                ),
                 intent_type,
             )
             if validation_error:
@@ -148,16 +157,7 @@ def _safe_prompt_context_text(value: object, *, context_name: str) -> str:
 
 def _parse_plan_json(text: str) -> dict[str, object]:
     """从 LLM 文本响应中提取 JSON 对象"""
-    try:
-        json_start = text.find("{")
-        json_end = text.rfind("}") + 1
-        if json_start >= 0 and json_end > json_start:
-            parsed = cast(object, json.loads(text[json_start:json_end]))
-            if isinstance(parsed, dict):
-                return cast(dict[str, object], parsed)
-        return {}
-    except json.JSONDecodeError:
-        return {}
+    return cast(dict[str, object], extract_first_json_obj(text) or {})
 
 
 def _normalize_and_validate_plan(
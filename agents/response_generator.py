@@ -2,12 +2,14 @@
 响应生成节点 - 将查询结果转换为自然语言回复
 """
 import json
+import re
 from decimal import Decimal
-from datetime import datetime, date
 from typing import Dict, Any, List
 
 from state import AgentState, IntentType
-from tools.schema_cache import get_metrics_text
+from tools.schema_cache import get_metrics_prompt_text, get_metrics_version
+from tools.llm_cache import PersistentResponseCache, make_query_key
+from tools.json_utils import dumps_compact, dumps_pretty, sql_json_default
 from prompts import (
     CHITCHAT_PROMPT,
     QUERY_RESULT_PROMPT,
@@ -19,13 +21,7 @@ from prompts import (
 class SQLResultEncoder(json.JSONEncoder):
     """自定义 JSON 编码器，处理 MySQL 返回的特殊类型"""
     def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        if isinstance(obj, bytes):
-            return obj.decode('utf-8', errors='ignore')
-        return super().default(obj)
+        return sql_json_default(obj)
 
 
 def _compute_statistics_summary(data_list: list) -> str:
@@ -97,20 +93,43 @@ def _compute_statistics_summary(data_list: list) -> str:
     return "\n".join(lines)
 
 
-def _build_smart_result_str(data, max_sample: int = 15):
+# 发给 LLM 的单元格最大长度，超长文本截断，避免宽表/大文本字段挤占 token
+_MAX_FIELD_LEN = 200
+
+
+def _truncate_row(row, max_field_len: int = _MAX_FIELD_LEN):
+    """截断行内超长字符串字段，非字典行原样返回"""
+    if not isinstance(row, dict):
+        return row
+    return {
+        k: (v[:max_field_len] + '…' if isinstance(v, str) and len(v) > max_field_len else v)
+        for k, v in row.items()
+    }
+
+
+def _dump_rows(rows, for_llm: bool) -> str:
+    """序列化结果行：LLM 输入用截断 + 紧凑格式，人工阅读用缩进格式"""
+    try:
+        if for_llm:
+            if isinstance(rows, list):
+                rows = [_truncate_row(r) for r in rows]
+            return dumps_compact(rows, default=sql_json_default)
+        return dumps_pretty(rows, default=sql_json_default)
+    except Exception:
+        return str(rows)
+
+
+def _build_smart_result_str(data, max_sample: int = 15, for_llm: bool = True):
     """
     智能构建结果字符串：统计摘要 + 采样数据。
     
     返回 (result_str, is_summarized, total_count)
-    - result_str: 供 LLM 消费的结果文本
+    - result_str: 结果文本（for_llm=True 时为紧凑 JSON，否则为缩进 JSON）
     - is_summarized: 是否做了摘要（数据量大于 max_sample*2）
     - total_count: 原始数据总条数
     """
     if not isinstance(data, list) or len(data) == 0:
-        try:
-            result_str = json.dumps(data, ensure_ascii=False, indent=2, cls=SQLResultEncoder)
-        except Exception:
-            result_str = str(data)
+        result_str = _dump_rows(data, for_llm)
         count = len(data) if isinstance(data, list) else 1
         return result_str, False, count
     
@@ -118,24 +137,13 @@ def _build_smart_result_str(data, max_sample: int = 15):
     
     if total <= max_sample * 2:
         # 数据量不大，全量序列化
-        try:
-            result_str = json.dumps(data, ensure_ascii=False, indent=2, cls=SQLResultEncoder)
-        except Exception:
-            result_str = str(data)
-        return result_str, False, total
+        return _dump_rows(data, for_llm), False, total
     
     # 数据量大：统计摘要 + 头尾采样
     summary = _compute_statistics_summary(data)
     
-    head_sample = data[:max_sample]
-    tail_sample = data[-5:]
-    
-    try:
-        head_str = json.dumps(head_sample, ensure_ascii=False, indent=2, cls=SQLResultEncoder)
-        tail_str = json.dumps(tail_sample, ensure_ascii=False, indent=2, cls=SQLResultEncoder)
-    except Exception:
-        head_str = str(head_sample)
-        tail_str = str(tail_sample)
+    head_str = _dump_rows(data[:max_sample], for_llm)
+    tail_str = _dump_rows(data[-5:], for_llm)
     
     result_str = (
         f"{summary}\n\n"
@@ -148,12 +156,13 @@ def _build_smart_result_str(data, max_sample: int = 15):
     return result_str, True, total
 
 
-def create_response_generator(llm_client=None):
+def create_response_generator(llm_client=None, definition_cache: PersistentResponseCache | None = None):
     """
     创建响应生成节点
     
     Args:
         llm_client: LLM 客户端，用于生成自然语言回复
+        definition_cache: 可选的指标定义回复持久化缓存
     """
     
     def response_generator_node(state: AgentState) -> Dict[str, Any]:
@@ -176,7 +185,7 @@ def create_response_generator(llm_client=None):
             return generate_chitchat_response(state, llm_client)
         
         elif intent_type == IntentType.METRIC_DEFINITION:
-            return generate_definition_response(state, llm_client)
+            return generate_definition_response(state, llm_client, definition_cache)
         
         else:  # SIMPLE_QUERY 或 METRIC_QUERY
             return generate_query_response(state, llm_client)
@@ -184,6 +193,22 @@ def create_response_generator(llm_client=None):
     return response_generator_node
 
 
+# 闲聊关键词 -> 类别；编译为单个正则，一次扫描得到所有命中类别
+_CHITCHAT_KEYWORDS = {
+    "greeting": ("你好", "您好", "hi", "hello", "嗨", "早上好", "下午好", "晚上好"),
+    "help": ("帮助", "help", "怎么用"),
+}
+_CHITCHAT_RE = re.compile("|".join(
+    f"(?P<{category}>{'|'.join(map(re.escape, keywords))})"
+    for category, keywords in _CHITCHAT_KEYWORDS.items()
+))
+
+
+def _match_chitchat_categories(user_query: str) -> set[str]:
+    """返回用户输入命中的闲聊类别集合"""
+    return {match.lastgroup for match in _CHITCHAT_RE.finditer(user_query.lower())}
+
+
 def generate_chitchat_response(state: AgentState, llm_client) -> Dict[str, Any]:
     """生成闲聊回复"""
     user_query = state.get("user_query", "")
@@ -194,10 +219,10 @@ def generate_chitchat_response(state: AgentState, llm_client) -> Dict[str, Any]:
         reply = response.content if hasattr(response, 'content') else str(response)
     else:
         # 使用预设回复
-        greetings = ["你好", "您好", "hi", "hello", "嗨", "早上好", "下午好", "晚上好"]
-        if any(g in user_query.lower() for g in greetings):
+        categories = _match_chitchat_categories(user_query)
+        if "greeting" in categories:
             reply = GREETING_RESPONSE
-        elif "帮助" in user_query or "help" in user_query.lower() or "怎么用" in user_query:
+        elif "help" in categories:
             reply = HELP_RESPONSE
         else:
             reply = "您好！请问有什么可以帮您的？我可以帮您查询学校数据和教育指标信息。"
@@ -209,12 +234,28 @@ def generate_chitchat_response(state: AgentState, llm_client) -> Dict[str, Any]:
     }
 
 
-def generate_definition_response(state: AgentState, llm_client) -> Dict[str, Any]:
+def generate_definition_response(
+    state: AgentState,
+    llm_client,
+    definition_cache: PersistentResponseCache | None = None,
+) -> Dict[str, Any]:
     """生成指标定义回复 - 基于全量指标体系"""
     user_query = state.get("user_query", "")
     
+    # 指标体系未变化时，相同问题直接复用持久化的回复
+    cache_key = None
+    if llm_client and definition_cache is not None:
+        cache_key = make_query_key(user_query, get_metrics_version())
+        cached_reply = definition_cache.get(cache_key)
+        if cached_reply is not None:
+            return {
+                "final_response": cached_reply,
+                "messages": [("assistant", cached_reply)],
+                "current_node": "response_generator"
+            }
+    
     # 加载全量指标 (使用缓存)
-    full_metrics_text = get_metrics_text()
+    full_metrics_text = get_metrics_prompt_text()
     if llm_client and full_metrics_text:
         # 使用 LLM 生成定义解释
         prompt = f"""你是一个教育指标专家。请根据以下指标体系定义，回答用户关于指标含义的问题。
@@ -231,6 +272,8 @@ def generate_definition_response(state: AgentState, llm_client) -> Dict[str, Any
 """
         response = llm_client.invoke(prompt)
         reply = response.content if hasattr(response, 'content') else str(response)
+        if cache_key is not None and reply:
+            definition_cache.put(cache_key, reply)
     else:
         # Fallback 到简单的关键词匹配（如果没有 LLM 或加载失败）
         reply = "抱歉，暂时无法查询指标 definition 信息。"
@@ -264,8 +307,9 @@ def generate_query_response(state: AgentState, llm_client) -> Dict[str, Any]:
 
     # 2. 处理分析结果 (METRIC_QUERY) — 使用智能摘要
     if analysis_result:
+        # 无 LLM 时结果直接展示给用户，保留缩进格式
         result_str, is_summarized, total_count = _build_smart_result_str(
-            analysis_result, max_sample=15
+            analysis_result, max_sample=15, for_llm=llm_client is not None
         )
             
         if llm_client is not None:
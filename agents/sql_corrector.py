@@ -3,8 +3,8 @@ SQL 纠错 Agent - 当 SQL 执行失败时调用
 
 参考 WrenAI 的 SQL Correction Pipeline 设计。
 """
-import json
 import re
+from functools import lru_cache
 from typing import Dict, Any
 
 from state import AgentState
@@ -13,16 +13,46 @@ from prompts.sql_correction_prompt import (
     build_sql_correction_prompt
 )
 from prompts.sql_rules import DatabaseType
+from tools.correction_memory import CorrectionMemory, format_correction_exemplars
+from tools.llm_cache import TieredResponseCache
+from tools.llm_json import extract_first_json_obj
 
 
-def create_sql_corrector(llm_client, database_type: DatabaseType = DatabaseType.MYSQL):
+# 预编译正则（模块加载时编译一次）
+_SQL_START_RE = re.compile(r"\b(WITH|SELECT|CREATE\s+TABLE)\b", re.IGNORECASE | re.DOTALL)
+_SQL_TAG_RE = re.compile(r"<sql>\s*(.*?)\s*</sql>", re.IGNORECASE | re.DOTALL)
+_SQL_FENCE_RE = re.compile(r"```sql\s*(.*?)\s*```", re.IGNORECASE | re.DOTALL)
+# 段落边界: 行首的 "### 标题 [###]" 或代码围栏 (围栏内的 "###" 不是段落标题)
+_SECTION_BOUNDARY_RE = re.compile(r"^(?:```|###[ \t]+(.+?)[ \t#]*$)", re.MULTILINE)
+
+
+def create_sql_corrector(
+    llm_client,
+    database_type: DatabaseType = DatabaseType.MYSQL,
+    sql_cache: TieredResponseCache | None = None,
+    correction_memory: CorrectionMemory | None = None,
+):
     """
     创建 SQL 纠错节点
     
     Args:
         llm_client: LLM 客户端
         database_type: 数据库类型
+        sql_cache: 可选的两级缓存，相同 (错误 SQL, 报错信息, 上下文) 直接复用纠错结果
+        correction_memory: 可选的纠错记忆，同骨架 SQL 的历史成功纠错作为参考示例
     """
+    # 温度非 0 时输出不确定，不缓存
+    if getattr(llm_client, "temperature", None) != 0:
+        sql_cache = None
+    cache_namespace = f"sql_corrector:{getattr(llm_client, 'model_name', type(llm_client).__name__)}"
+
+    # 客户端类型在节点生命周期内不变，创建时确定调用方式，避免每次调用都做 hasattr 探测
+    if hasattr(llm_client, 'invoke_with_system'):
+        def invoke_llm(system_prompt: str, user_prompt: str) -> Any:
+            return llm_client.invoke_with_system(system_prompt=system_prompt, user_prompt=user_prompt)
+    else:
+        def invoke_llm(system_prompt: str, user_prompt: str) -> Any:
+            return llm_client.invoke(f"{system_prompt}\n\n{user_prompt}")
     
     def sql_corrector_node(state: AgentState) -> Dict[str, Any]:
         """
@@ -48,6 +78,7 @@ def create_sql_corrector(llm_client, database_type: DatabaseType = DatabaseType.
             # 提取上下文信息
             schema = _extract_schema_from_prompt(assembled_prompt)
             metric_context = _extract_metric_context_from_prompt(assembled_prompt)
+            exemplars = correction_memory.retrieve(generated_sql) if correction_memory else []
             
             # 构建 ReAct 纠错提示词
             correction_prompt = build_sql_correction_prompt(
@@ -55,18 +86,20 @@ def create_sql_corrector(llm_client, database_type: DatabaseType = DatabaseType.
                 invalid_sql=generated_sql,
                 observation=observation,
                 schema=schema,
-                metric_context=metric_context
+                metric_context=metric_context,
+                instructions=format_correction_exemplars(exemplars),
             )
             
             # 获取提示词并调用 LLM
             system_prompt = get_sql_correction_system_prompt(database_type)
-            if hasattr(llm_client, 'invoke_with_system'):
-                response = llm_client.invoke_with_system(system_prompt=system_prompt, user_prompt=correction_prompt)
-            else:
-                response = llm_client.invoke(f"{system_prompt}\n\n{correction_prompt}")
-            
-            response_text = response.content if hasattr(response, 'content') else str(response)
+            cache_prompt = f"{system_prompt}\n\n{correction_prompt}"
+            response_text = sql_cache.get(cache_namespace, cache_prompt) if sql_cache else None
+            if response_text is None:
+                response = invoke_llm(system_prompt, correction_prompt)
+                response_text = response.content if hasattr(response, 'content') else str(response)
             reflection, corrected_sql = _extract_reflection_and_sql(response_text)
+            if sql_cache and _looks_like_sql(corrected_sql):
+                sql_cache.put(cache_namespace, cache_prompt, response_text)
 
             if not _looks_like_sql(corrected_sql):
                 return {
@@ -84,6 +117,9 @@ def create_sql_corrector(llm_client, database_type: DatabaseType = DatabaseType.
                 "correction_attempted": True,
                 "correction_count": correction_count,
                 "execution_error": None,
+                # 纠错后的 SQL 执行成功时，由 sql_executor 写入纠错记忆
+                "corrected_from_sql": generated_sql,
+                "correction_error": observation[:500],
                 "current_node": "sql_corrector"
             }
             
@@ -104,20 +140,12 @@ def _extract_reflection_and_sql(response_text: str) -> tuple[str, str]:
     reflection = ""
     sql = ""
 
-    try:
-        # 查找 JSON 代码块或直接查找括号
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        if start >= 0 and end > start:
-            json_str = response_text[start:end]
-            data = json.loads(json_str)
-            reflection = data.get("reflection", "")
-            sql = _clean_sql(str(data.get("sql", "")))
-            
+    data = extract_first_json_obj(response_text)
+    if data is not None:
+        reflection = str(data.get("reflection", ""))
+        sql = _clean_sql(str(data.get("sql", "")))
         if _looks_like_sql(sql):
             return reflection, sql
-    except Exception:
-        pass
 
     sql_from_text = _clean_sql(response_text)
     if _looks_like_sql(sql_from_text):
@@ -127,58 +155,43 @@ def _extract_reflection_and_sql(response_text: str) -> tuple[str, str]:
 
 
 
+@lru_cache(maxsize=32)
+def _extract_prompt_sections(assembled_prompt: str) -> dict[str, str]:
+    """
+    单遍扫描组装提示词，按标题切分为 {标题: 段落文本(含标题行)}
+
+    纠错循环中同一个 assembled_prompt 会被反复传入，结果按内容缓存。
+    """
+    headers: list[tuple[str, int]] = []
+    in_fence = False
+    for match in _SECTION_BOUNDARY_RE.finditer(assembled_prompt):
+        title = match.group(1)
+        if title is None:
+            in_fence = not in_fence
+        elif not in_fence:
+            headers.append((title, match.start()))
+
+    sections: dict[str, str] = {}
+    for i, (title, start) in enumerate(headers):
+        end = headers[i + 1][1] if i + 1 < len(headers) else len(assembled_prompt)
+        # 同名段落只取第一次出现
+        sections.setdefault(title, assembled_prompt[start:end])
+    return sections
+
+
 def _extract_schema_from_prompt(assembled_prompt: str) -> str:
     """从组装的提示词中提取 Schema"""
-    # 简单实现：查找包含 "Schema" 的部分
-    if "### 数据库 Schema" in assembled_prompt:
-        start = assembled_prompt.find("### 数据库 Schema")
-        end = assembled_prompt.find("###", start + 20)
-        if end > start:
-            return assembled_prompt[start:end]
-    return ""
+    return _extract_prompt_sections(assembled_prompt).get("数据库 Schema", "")
 
 
 def _extract_metric_context_from_prompt(assembled_prompt: str) -> str:
     """从组装的提示词中提取指标上下文"""
-    if "### 指标上下文" in assembled_prompt or "### 相关指标信息" in assembled_prompt:
-        marker = "### 指标上下文" if "### 指标上下文" in assembled_prompt else "### 相关指标信息"
-        start = assembled_prompt.find(marker)
-        end = assembled_prompt.find("###", start + 20)
-        if end > start:
-            return assembled_prompt[start:end]
-    return ""
-
-
-def _extract_sql_from_response(response_text: str) -> str:
-    """从 LLM 响应中提取 SQL"""
-    # 尝试解析 JSON 格式
-    try:
-        # 查找 JSON 块
-        json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
-        if json_start >= 0 and json_end > json_start:
-            json_str = response_text[json_start:json_end]
-            data = json.loads(json_str)
-            sql = data.get("sql", "")
-            if sql:
-                return _clean_sql(sql)
-    except:
-        pass
-    
-    # 如果 JSON 解析失败，尝试提取 SQL 代码块
-    if "```sql" in response_text:
-        start = response_text.find("```sql") + 6
-        end = response_text.find("```", start)
-        if end > start:
-            return response_text[start:end].strip()
-    elif "```" in response_text:
-        start = response_text.find("```") + 3
-        end = response_text.find("```", start)
-        if end > start:
-            return response_text[start:end].strip()
-    
-    # 最后尝试：返回整个响应（可能就是 SQL）
-    return _clean_sql(response_text)
+    sections = _extract_prompt_sections(assembled_prompt)
+    return (
+        sections.get("指标上下文")
+        or sections.get("相关指标信息")
+        or sections.get("完整指标体系", "")
+    )
 
 
 def _clean_sql(sql: str) -> str:
@@ -202,7 +215,7 @@ def _clean_sql(sql: str) -> str:
     
     text = "\n".join([line.strip() for line in sql.split("\n") if line.strip()]).strip()
 
-    match = re.search(r"(?is)\b(WITH|SELECT|CREATE\s+TABLE)\b", text)
+    match = _SQL_START_RE.search(text)
     if not match:
         return text
 
@@ -216,11 +229,11 @@ def _clean_sql(sql: str) -> str:
 
 def _extract_tagged_sql(text: str) -> str:
     """提取 <SQL>...</SQL> 或 ```sql ...``` 包裹内容。"""
-    tag_match = re.search(r"(?is)<sql>\s*(.*?)\s*</sql>", text)
+    tag_match = _SQL_TAG_RE.search(text)
     if tag_match:
         return tag_match.group(1).strip()
 
-    fenced_match = re.search(r"(?is)```sql\s*(.*?)\s*```", text)
+    fenced_match = _SQL_FENCE_RE.search(text)
     if fenced_match:
         return fenced_match.group(1).strip()
 
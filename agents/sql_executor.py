@@ -6,15 +6,28 @@ SQL 执行节点 - 连接 MySQL 执行 SQL
 """
 from typing import Dict, Any, List, Optional
 import json
+import contextlib
 import csv
 import os
 import uuid
 
 from state import AgentState, IntentType
-from config import config
+from prompts.sql_rules import is_safe_sql
+from tools.correction_memory import CorrectionMemory
+from tools.json_utils import dumps_compact, sql_json_default
+from tools.mysql_pool import get_mysql_pool
+from tools.sql_result_cache import get_sql_result_cache
 from datetime import datetime, date
 from decimal import Decimal
 
+try:
+    import pymysql  # pyright: ignore[reportMissingModuleSource]
+except ImportError:  # 未安装 PyMySQL 时执行路径返回模拟结果/错误
+    pymysql = None
+
+# 观测结果写回 LLM prompt 的字节上限，超出后只给样本摘要
+_OBSERVATION_BYTE_BUDGET = 8 * 1024
+
 # 临时文件目录
 TEMP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "temp")
 
@@ -25,14 +38,29 @@ def ensure_temp_dir():
         os.makedirs(TEMP_DIR)
 
 
-def create_sql_executor(db_connection=None):
+def create_sql_executor(db_connection=None, correction_memory: Optional[CorrectionMemory] = None):
     """
     创建 SQL 执行节点
     
     Args:
         db_connection: 可选的数据库连接对象
+        correction_memory: 可选的纠错记忆，纠错后的 SQL 执行成功且有结果时记录本次纠错
     """
     
+    def _remember_correction(state: AgentState, result: Dict[str, Any]) -> Dict[str, Any]:
+        bad_sql = state.get("corrected_from_sql")
+        if not bad_sql:
+            return result
+        if correction_memory is not None and result.get("execution_error") is None and result.get("execution_result"):
+            correction_memory.record(
+                question=state.get("user_query", ""),
+                bad_sql=bad_sql,
+                good_sql=state.get("generated_sql", ""),
+                error=state.get("correction_error") or "",
+            )
+        # 每次纠错只记录一次
+        return {**result, "corrected_from_sql": None}
+    
     def sql_executor_node(state: AgentState) -> Dict[str, Any]:
         """SQL 执行节点 - 根据意图类型选择执行模式"""
         generated_sql = state.get("generated_sql", "")
@@ -63,7 +91,7 @@ def create_sql_executor(db_connection=None):
                 return _execute_streaming_to_csv(generated_sql, db_connection)
             else:
                 # 普通查询: 直接返回结果
-                return _execute_normal(generated_sql, db_connection)
+                return _remember_correction(state, _execute_normal(generated_sql, db_connection))
                 
         except Exception as e:
             # 结构化错误信息，便于纠错
@@ -85,7 +113,8 @@ def _execute_normal(sql: str, db_connection=None) -> Dict[str, Any]:
     if db_connection is not None:
         result = execute_with_connection(db_connection, sql)
     else:
-        result = execute_sql(sql)
+        # 只读查询，短期内相同 SQL 直接复用结果（纠错重试常生成与上次相同的 SQL）
+        result = get_sql_result_cache().get_or_compute(_normalize_sql(sql), lambda: execute_sql(sql))
 
     execution_result = result
     if result is not None and not _is_clean_list_of_dicts(result):
@@ -111,79 +140,74 @@ def _execute_streaming_to_csv(sql: str, db_connection=None) -> Dict[str, Any]:
     使用 fetchmany 分批获取 + csv.DictWriter 流式写入
     优点: O(1) 内存占用, 可处理 GB 级数据
     """
-    import pymysql  # pyright: ignore[reportMissingModuleSource]
-    
+    if db_connection is None and pymysql is None:
+        return {
+            "execution_result": None,
+            "data_file_path": None,
+            "execution_observation": "ERROR: PyMySQL 未安装",
+            "execution_error": "PyMySQL 未安装，无法连接数据库",
+            "current_node": "sql_executor"
+        }
+
     ensure_temp_dir()
     
     # 生成唯一文件名
     query_id = str(uuid.uuid4())[:8]
     file_path = os.path.join(TEMP_DIR, f"query_{query_id}.csv")
     
-    connection: Any = None
-    cursor: Any = None
-    owns_connection: bool = False
     row_count = 0
     columns = []
     
     try:
-        # 建立连接
-        if db_connection is not None:
-            connection = db_connection
-            cursor = connection.cursor()
-            owns_connection = False
-        else:
-            connection = pymysql.connect(
-                host=config.database.host,
-                port=config.database.port,
-                user=config.database.user,
-                password=config.database.password,
-                database=config.database.database,
-                charset=config.database.charset,
-                cursorclass=pymysql.cursors.DictCursor
-            )
+        with contextlib.ExitStack() as stack:
+            # 建立连接（未注入连接时从共享连接池借出，退出时归还）
+            if db_connection is not None:
+                connection = db_connection
+            else:
+                connection = stack.enter_context(get_mysql_pool().connection())
             cursor = connection.cursor()
-            owns_connection = True
-        
-        # 执行 SQL
-        cursor.execute(sql)
-        
-        # 获取列名
-        if cursor.description:
-            columns = [desc[0] for desc in cursor.description]
-        
-        if not columns:
-            # 无结果集 (可能是非 SELECT 语句或空结果)
-            return {
-                "execution_result": [],
-                "data_file_path": None,
-                "execution_observation": "Observation: 执行成功，但未返回数据列。",
-                "execution_error": None,
-                "current_node": "sql_executor"
-            }
-        
-        # 流式写入 CSV
-        batch_size = 2000  # 每批获取 2000 行
-        sample_rows = []  # 保存前 5 行用于观测
-        
-        with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=columns)
-            writer.writeheader()
+            stack.callback(cursor.close)
+            
+            # 执行 SQL
+            cursor.execute(sql)
+            
+            # 获取列名
+            if cursor.description:
+                columns = [desc[0] for desc in cursor.description]
             
-            while True:
-                # 分批获取
-                batch = cursor.fetchmany(batch_size)
-                if not batch:
-                    break
+            if not columns:
+                # 无结果集 (可能是非 SELECT 语句或空结果)
+                return {
+                    "execution_result": [],
+                    "data_file_path": None,
+                    "execution_observation": "Observation: 执行成功，但未返回数据列。",
+                    "execution_error": None,
+                    "current_node": "sql_executor"
+                }
+            
+            # 流式写入 CSV
+            batch_size = 2000  # 每批获取 2000 行
+            sample_rows = []  # 保存前 5 行用于观测
+            
+            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=columns)
+                writer.writeheader()
                 
-                # 清洗并写入
-                for row in batch:
-                    sanitized_row = _sanitize_row(row)
-                    writer.writerow(sanitized_row)
-                    row_count += 1
+                while True:
+                    # 分批获取
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
                     
-                    # 保存样本
-                    if len(sample_rows) < 5:
-                        sample_rows.append(sanitized_row)
+                    # 清洗并写入
+                    for row in batch:
+                        sanitized_row = _sanitize_row(row)
+                        writer.writerow(sanitized_row)
+                        row_count += 1
+                        
+                        # 保存样本
+                        if len(sample_rows) < 5:
+                            sample_rows.append(sanitized_row)
         
         # 生成观测结果
         observation = _format_streaming_observation(row_count, columns, sample_rows, file_path)
@@ -198,27 +222,12 @@ def _execute_streaming_to_csv(sql: str, db_connection=None) -> Dict[str, Any]:
             "current_node": "sql_executor"
         }
         
-    except ImportError:
-        return {
-            "execution_result": None,
-            "data_file_path": None,
-            "execution_observation": "ERROR: PyMySQL 未安装",
-            "execution_error": "PyMySQL 未安装，无法连接数据库",
-            "current_node": "sql_executor"
-        }
     except Exception as e:
         # 清理可能产生的不完整文件
         if os.path.exists(file_path):
-            try:
+            with contextlib.suppress(OSError):
                 os.remove(file_path)
-            except:
-                pass
         raise
-    finally:
-        if cursor:
-            cursor.close()
-        if owns_connection and connection:
-            connection.close()
 
 
 def _sanitize_row(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -256,73 +265,67 @@ def _format_streaming_observation(row_count: int, columns: List[str],
 
 
 def format_observation(result: List[Dict[str, Any]]) -> str:
-    """格式化执行结果观测，防止 Token 爆炸"""
+    """格式化执行结果观测，按字节预算截断，防止 Token 爆炸"""
     if not result:
         return "Observation: 执行成功。返回了 0 条记录。这意味着 WHERE 条件可能设置得过于严格，或者数据库中不存在匹配该字符串的值（例如全称/简称不匹配）。"
     
     row_count = len(result)
     columns = list(result[0].keys()) if row_count > 0 else []
     
-    # 既然结果已经过 _sanitize_results 处理，这里可以直接 dump
-    if row_count <= 100:
-        res_str = json.dumps(result, ensure_ascii=False)
+    # 逐行序列化并累计字节数，超出预算即停止；已序列化的行直接复用为样本
+    pieces: List[str] = []
+    size = 0
+    truncated = False
+    for row in result:
+        piece = dumps_compact(row, default=sql_json_default)
+        size += len(piece.encode('utf-8')) + 1
+        if size > _OBSERVATION_BYTE_BUDGET:
+            if not pieces:
+                # 单行就超出预算时仍保留截断后的首行，避免纠错时完全看不到样本
+                pieces.append(_truncate_utf8(piece, _OBSERVATION_BYTE_BUDGET) + "...(已截断)")
+            truncated = True
+            break
+        pieces.append(piece)
+    
+    if not truncated:
+        res_str = "[" + ",".join(pieces) + "]"
         return f"Observation: 执行成功。返回了 {row_count} 条记录：\n{res_str}"
     
-    # 结果过多（超过100条），进行摘要展示
-    sample = result[:5]
-    res_str = json.dumps(sample, ensure_ascii=False)
+    # 结果超出字节预算，进行摘要展示
+    sample = pieces[:5]
+    res_str = "[" + ",".join(sample) + "]"
     return (
         f"Observation: 执行成功。返回了大量结果（共 {row_count} 条）。\n"
         f"字段列表: {columns}\n"
-        f"前 5 条样本数据: {res_str}\n"
+        f"前 {len(sample)} 条样本数据: {res_str}\n"
         f"提示：如果你的原始意图是获取宏观统计数据而非海量明细，请确认是否需要增加聚合函数或更严格的筛选条件。"
     )
 
 
-def is_safe_sql(sql: str) -> bool:
-    """检查 SQL 是否安全（只允许 SELECT）"""
-    sql_upper = sql.upper().strip()
-    
-    # 禁止的关键词
-    dangerous_keywords = [
-        "DROP", "DELETE", "UPDATE", "INSERT", "ALTER", "TRUNCATE",
-        "CREATE", "REPLACE", "GRANT", "REVOKE", "EXEC", "EXECUTE"
-    ]
-    
-    for keyword in dangerous_keywords:
-        if keyword in sql_upper:
-            return False
-    
-    return True
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """按 UTF-8 字节数截断字符串（不切断多字节字符）"""
+    return text.encode('utf-8')[:max_bytes].decode('utf-8', errors='ignore')
+
+
+def _normalize_sql(sql: str) -> str:
+    """去掉首尾空白与结尾分号，作为结果缓存键（不改动中间文本，字符串字面量内的空白与大小写保持原样）"""
+    return sql.strip().rstrip(";").rstrip()
 
 
 def execute_sql(sql: str) -> List[Dict[str, Any]]:
     """执行 SQL 并返回结果 (普通模式)"""
+    if pymysql is None:
+        # PyMySQL 未安装，返回模拟结果
+        return [{"message": "数据库连接未配置，这是模拟结果", "sql": sql}]
     try:
-        import pymysql  # pyright: ignore[reportMissingModuleSource]
-        
-        connection = pymysql.connect(
-            host=config.database.host,
-            port=config.database.port,
-            user=config.database.user,
-            password=config.database.password,
-            database=config.database.database,
-            charset=config.database.charset,
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        
-        try:
+        # 从共享连接池借出连接，退出时归还
+        with get_mysql_pool().connection() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(sql)
                 result = cursor.fetchall()
                 # 关键：在这里进行清洗，确保流出的数据全是标准 JSON 类型
                 return _sanitize_results(list(result))
-        finally:
-            connection.close()
-            
-    except ImportError:
-        # PyMySQL 未安装，返回模拟结果
-        return [{"message": "数据库连接未配置，这是模拟结果", "sql": sql}]
+
     except Exception as e:
         raise Exception(f"数据库执行错误: {str(e)}")
 
@@ -352,14 +355,25 @@ def _is_clean_list_of_dicts(data: Any) -> bool:
     return True
 
 
+def _dict_cursor_class(connection) -> Any:
+    """PyMySQL 连接返回 DictCursor 类（行由驱动直接构造为 dict），其他驱动返回 None"""
+    if pymysql is not None and isinstance(connection, pymysql.connections.Connection):
+        return pymysql.cursors.DictCursor
+    return None
+
+
 def execute_with_connection(connection, sql: str) -> List[Dict[str, Any]]:
     """使用已有连接执行 SQL"""
-    cursor = connection.cursor()
+    dict_cursor = _dict_cursor_class(connection)
+    cursor = connection.cursor(dict_cursor) if dict_cursor else connection.cursor()
     try:
         cursor.execute(sql)
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
         rows = cursor.fetchall()
-        result = [dict(zip(columns, row)) for row in rows]
+        if dict_cursor:
+            result = list(rows)
+        else:
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            result = [dict(zip(columns, row)) for row in rows]
         # 关键：清洗已有连接返回的结果
         return _sanitize_results(result)
     finally:
@@ -1,22 +1,28 @@
 """
 SQL 生成节点 - 调用微调模型生成 SQL
 """
-import requests
 import json
 import re
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterator, Optional
 
 from state import AgentState
 from config import config
+from tools.json_utils import dumps_compact, loads
+from tools.llm_cache import TieredResponseCache
 
 
-def create_sql_generator(model_client=None):
+def create_sql_generator(model_client=None, sql_cache: TieredResponseCache | None = None):
     """
     创建 SQL 生成节点
     
     Args:
         model_client: 可选的模型客户端，如果不提供则使用 Ollama API
+        sql_cache: 可选的两级 SQL 缓存，仅在 temperature == 0（输出确定）时启用
     """
+    cache_namespace = _generation_cache_namespace(model_client) if sql_cache is not None else None
+    # 客户端能力在创建时探测一次，节点内不再逐次 hasattr
+    client_supports_stream = model_client is not None and hasattr(model_client, 'stream')
     
     def sql_generator_node(state: AgentState) -> Dict[str, Any]:
         """SQL 生成节点 - 调用微调模型"""
@@ -30,16 +36,30 @@ def create_sql_generator(model_client=None):
             }
         
         try:
-            if model_client is not None:
-                # 使用提供的客户端
-                response = model_client.invoke(assembled_prompt)
-                sql = response.content if hasattr(response, 'content') else str(response)
-            else:
-                # 使用 Ollama API
-                sql = call_ollama_api(assembled_prompt)
-            
-            # 清理 SQL（移除可能的 markdown 标记）
-            sql = clean_sql(sql)
+            sql = sql_cache.get(cache_namespace, assembled_prompt) if cache_namespace else None
+            if sql is None:
+                emit = _get_token_writer()
+                if model_client is not None:
+                    # 使用提供的客户端（在图内运行且支持 stream 时逐段推送）
+                    if emit is not None and client_supports_stream:
+                        sql = _collect_stream(
+                            (getattr(chunk, 'content', chunk) for chunk in model_client.stream(assembled_prompt)),
+                            emit,
+                        )
+                    else:
+                        response = model_client.invoke(assembled_prompt)
+                        sql = response.content if hasattr(response, 'content') else str(response)
+                elif emit is not None:
+                    # 使用 Ollama 流式 API，边生成边推送
+                    sql = _collect_stream(stream_ollama_api(assembled_prompt), emit)
+                else:
+                    # 使用 Ollama API
+                    sql = call_ollama_api(assembled_prompt)
+                
+                # 清理 SQL（移除可能的 markdown 标记）
+                sql = clean_sql(sql)
+                if cache_namespace and looks_like_sql(sql):
+                    sql_cache.put(cache_namespace, assembled_prompt, sql)
 
             if not looks_like_sql(sql):
                 return {
@@ -63,28 +83,112 @@ def create_sql_generator(model_client=None):
     return sql_generator_node
 
 
-def call_ollama_api(prompt: str) -> str:
-    """调用 Ollama API 生成 SQL"""
-    url = f"{config.finetuned_model.api_base}/api/generate"
-    
-    payload = {
-        "model": config.finetuned_model.model_name,
-        "prompt": prompt,
-        "stream": False,
+def _generation_cache_namespace(model_client=None) -> str | None:
+    """
+    SQL 缓存命名空间（模型名 + 温度）；温度非 0 时输出不确定，返回 None 表示不缓存
+    """
+    if model_client is None:
+        model_name = config.finetuned_model.model_name
+        temperature = config.finetuned_model.temperature
+    else:
+        model_name = getattr(model_client, "model_name", type(model_client).__name__)
+        temperature = getattr(model_client, "temperature", None)
+    if temperature != 0:
+        return None
+    return f"sql_generator:{model_name}"
+
+
+def _get_token_writer() -> Optional[Callable[[str], None]]:
+    """
+    获取 LangGraph 自定义流写入器，把生成片段作为 token 事件推给前端
+
+    不在图内运行（如单元测试直接调用节点）时返回 None。
+    """
+    try:
+        from langgraph.config import get_stream_writer
+
+        writer = get_stream_writer()
+    except (ImportError, RuntimeError):
+        return None
+    return lambda delta: writer({"type": "token", "node": "sql_generator", "delta": delta})
+
+
+def _collect_stream(deltas: Iterator[Any], emit: Callable[[str], None]) -> str:
+    """逐段推送生成内容，同时拼接完整输出"""
+    parts = []
+    for delta in deltas:
+        if not isinstance(delta, str) or not delta:
+            continue
+        parts.append(delta)
+        emit(delta)
+    return "".join(parts)
+
+
+# 请求体中除 prompt 外的字段在进程内不变，预先序列化，每次只编码 prompt
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@lru_cache(maxsize=8)
+def _ollama_payload_head(model_name: str, temperature: float, max_tokens: int, stream: bool) -> str:
+    head = dumps_compact({
+        "model": model_name,
+        "stream": stream,
         "options": {
-            "temperature": config.finetuned_model.temperature,
-            "num_predict": config.finetuned_model.max_tokens,
+            "temperature": temperature,
+            "num_predict": max_tokens,
             "stop": ["</SQL>"]
         }
-    }
+    })
+    return head[:-1]  # 去掉结尾的 "}"，拼接 prompt 字段后补回
+
+
+def _build_ollama_payload(prompt: str, stream: bool) -> bytes:
+    head = _ollama_payload_head(
+        config.finetuned_model.model_name,
+        config.finetuned_model.temperature,
+        config.finetuned_model.max_tokens,
+        stream,
+    )
+    return f'{head},"prompt":{dumps_compact(prompt)}}}'.encode("utf-8")
+
+
+def call_ollama_api(prompt: str) -> str:
+    """调用 Ollama API 生成 SQL"""
+    url = f"{config.finetuned_model.api_base}/api/generate"
     
-    response = requests.post(url, json=payload, timeout=60)
+    # 复用进程级共享的 keep-alive 连接池
+    from runtime import get_llm_http_clients
+
+    http_client, _ = get_llm_http_clients()
+    response = http_client.post(url, content=_build_ollama_payload(prompt, stream=False), headers=_JSON_HEADERS, timeout=60)
     response.raise_for_status()
     
     result = response.json()
     return result.get("response", "")
 
 
+def stream_ollama_api(prompt: str) -> Iterator[str]:
+    """流式调用 Ollama API，逐行解析 NDJSON 并产出生成片段"""
+    url = f"{config.finetuned_model.api_base}/api/generate"
+
+    from runtime import get_llm_http_clients
+
+    http_client, _ = get_llm_http_clients()
+    with http_client.stream(
+        "POST", url, content=_build_ollama_payload(prompt, stream=True), headers=_JSON_HEADERS, timeout=60
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = loads(line)
+            delta = data.get("response", "")
+            if delta:
+                yield delta
+            if data.get("done"):
+                break
+
+
 def clean_sql(sql: str) -> str:
     """清理 SQL 字符串，仅保留第一条可执行 SQL 语句。"""
     sql = sql.strip()
@@ -0,0 +1,110 @@
+"""
+统一分析智能体 - 一次 LLM 调用完成意图分类、歧义检测和相关指标提取
+
+仅用于非澄清轮次。输出无法通过校验时返回 intent_type=None，
+由图回退到 intent_classifier -> ambiguity_checker 的逐步流程。
+"""
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from state import AgentState, IntentType
+from tools.schema_cache import get_metrics_prompt_text
+from tools.llm_cache import LLMResponseCache, cached_invoke
+from tools.llm_json import extract_first_json_model
+from agents.ambiguity_checker import AmbiguityResult, _filter_metric_items
+from agents.intent_classifier import _INTENT_TYPE_MAP, IntentResult
+
+
+class UnifiedAnalysisResult(BaseModel):
+    """统一分析 LLM 输出"""
+    intent: IntentResult
+    ambiguity: AmbiguityResult = AmbiguityResult()
+    selected_indicators: List[Any] = []
+
+
+def create_unified_analyzer(llm_client, prompt_builder, response_cache: LLMResponseCache | None = None):
+    """
+    创建统一分析节点函数
+
+    Args:
+        llm_client: LLM 客户端
+        prompt_builder: 提示词构建器
+        response_cache: 可选的 LLM 响应缓存，相同 prompt 直接复用解析结果
+    """
+
+    def unified_analyzer_node(state: AgentState) -> Dict[str, Any]:
+        """统一分析节点"""
+        user_query = state.get("user_query", "")
+        clarification_count = state.get("clarification_count", 0)
+
+        # 与 intent_classifier 一致：排除当前消息，取最近 3 轮对话
+        messages = state.get("messages", [])
+        history_text = "无"
+        if len(messages) > 1:
+            history_lines = []
+            for m in messages[:-1][-6:]:
+                role = "User" if m.type == "human" else "Assistant"
+                history_lines.append(f"{role}: {m.content}")
+            history_text = "\n".join(history_lines)
+
+        prompt = prompt_builder.build_unified_analysis_prompt(
+            query=user_query,
+            chat_history=history_text,
+            full_metrics_context=get_metrics_prompt_text()
+        )
+
+        # 调用 LLM (带缓存，校验失败的结果不缓存，交给回退流程)
+        result = cached_invoke(
+            response_cache,
+            "unified_analyzer",
+            llm_client,
+            prompt,
+            _parse_unified_result,
+        )
+        if result is None:
+            return {"intent_type": None, "current_node": "unified_analyzer"}
+
+        intent_type = _INTENT_TYPE_MAP[result.intent.intent_type]
+        final_query = result.intent.refined_intent or user_query
+
+        update = {
+            "intent_type": intent_type,
+            "intent_analysis": result.intent.analysis or "",
+            "user_query": final_query,
+            "correction_count": 0,
+            "current_node": "unified_analyzer"
+        }
+        if intent_type != IntentType.METRIC_QUERY:
+            return update
+
+        ambiguity = result.ambiguity
+        if clarification_count < 2 and ambiguity.ambiguity_detected:
+            update.update({
+                "ambiguity_detected": True,
+                "ambiguity_details": ambiguity.ambiguity_details,
+                "clarification_question": ambiguity.clarification_question or "请提供更多细节",
+                "clarification_count": clarification_count + 1
+            })
+            return update
+
+        update.update({
+            "ambiguity_detected": False,
+            "ambiguity_details": [],
+            "refined_intent": ambiguity.refined_intent or final_query,
+            "metrics_context": _filter_metric_items(result.selected_indicators),
+        })
+        return update
+
+    return unified_analyzer_node
+
+
+def _parse_unified_result(response_text: str) -> Optional[UnifiedAnalysisResult]:
+    """解析并校验统一分析输出，意图缺失或未知时返回 None"""
+    result = extract_first_json_model(response_text, UnifiedAnalysisResult)
+    if result is None:
+        return None
+    # IntentResult 对缺省 intent_type 有默认值，这里要求 LLM 显式给出合法意图
+    if "intent_type" not in result.intent.model_fields_set or result.intent.intent_type not in _INTENT_TYPE_MAP:
+        return None
+    return result
@@ -6,30 +6,24 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
-from typing import Optional, AsyncGenerator, Any
+from typing import Optional, AsyncGenerator, Any, Iterator
 import os
 import re
 import json
 import asyncio
+import contextlib
+import contextvars
+import threading
 import uuid
 import logging
-from decimal import Decimal
-from datetime import date, datetime
-
-class CustomJSONEncoder(json.JSONEncoder):
-    """处理 Decimal 和日期类型的 JSON 编码器"""
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        if isinstance(o, (date, datetime)):
-            return o.isoformat()
-        return super().default(o)
 
 from state import AgentState
 from config import config
-from graph import process_clarification
-from runtime_bootstrap import create_runtime_graph  # pyright: ignore[reportMissingImports]
+from graph import process_clarification, release_metric_run
+from runtime_bootstrap import get_shared_runtime_graph  # pyright: ignore[reportMissingImports]
 from tools.result_normalizer import normalize_canonical_tabular_result
+from tools.session_store import SessionStore
+from tools.json_utils import dumps_compact, loads as json_loads, sql_json_default
 from tools.auth_utils import create_access_token, decode_access_token
 from tools.chat_store import (
     AuthenticatedUser,
@@ -110,7 +104,13 @@ class SaveConversationMessagesRequest(BaseModel):
 
 # 会话存储
 DEFAULT_WORKSPACE_ID = "default"
-sessions = {}
+sessions = SessionStore(
+    max_entries=config.session_max_entries,
+    ttl_seconds=config.session_ttl_seconds,
+    on_evict=lambda session: _cleanup_session_resources(session),
+    # 图运行进行中的会话不淘汰，避免清理检查点打断正在执行或待恢复的运行
+    is_busy=lambda session: session.get("active_runs", 0) > 0,
+)
 bearer_scheme = HTTPBearer(auto_error=False)
 chat_schema_ready = {"ready": False}
 
@@ -179,15 +179,13 @@ def get_or_create_session(session_id: str, workspace_id: Optional[str] = None):
     session_key = _build_session_key(session_id, normalized_workspace_id)
 
     if session_key not in sessions:
-        graph, _, _ = create_runtime_graph(
-            enable_embedding_in_graph=True,
-        )
-
         sessions[session_key] = {
             "session_id": session_id,
             "workspace_id": normalized_workspace_id,
             "session_key": session_key,
-            "graph": graph,
+            # 所有会话共用一个编译好的图，对话状态按 checkpointer thread_id 隔离
+            "graph": get_shared_runtime_graph(),
+            "checkpoint_thread_ids": set(),
             "state": None,
             "waiting_for_clarification": False,
             "waiting_for_plan_review": False
@@ -196,11 +194,49 @@ def get_or_create_session(session_id: str, workspace_id: Optional[str] = None):
     return sessions[session_key]
 
 
+@contextlib.contextmanager
+def _session_run(session: dict[str, Any]) -> Iterator[None]:
+    """标记会话有图运行进行中（期间 SessionStore 不会淘汰该会话）"""
+    session["active_runs"] = session.get("active_runs", 0) + 1
+    try:
+        yield
+    finally:
+        session["active_runs"] -= 1
+
+
+def _release_metric_run(graph, run_config: dict[str, Any]) -> None:
+    """图运行异常结束时释放该运行的指标临时表与连接（正常结束由 metric_cleanup 节点释放）"""
+    thread_id = run_config.get("configurable", {}).get("thread_id")
+    if not thread_id:
+        return
+    try:
+        release_metric_run(graph, thread_id)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"释放指标查询连接失败: {thread_id}, {e}")
+
+
+def _graph_run_config(session: dict[str, Any]) -> dict[str, Any]:
+    """
+    构建图运行配置
+
+    共享图的 checkpointer 跨会话共用，thread_id 加上会话键前缀，
+    避免不同会话传入相同 thread_id 时读到彼此的状态；会话清理时据此删除检查点。
+    """
+    thread_id = session.get("current_thread_id") or "default_thread"
+    checkpoint_thread_id = f"{session['session_key']}:{thread_id}"
+    session.setdefault("checkpoint_thread_ids", set()).add(checkpoint_thread_id)
+    return {
+        "recursion_limit": 50,
+        "configurable": {"thread_id": checkpoint_thread_id}
+    }
+
+
 # 节点名称映射（前端步骤展示）
 NODE_DISPLAY_NAMES = {
     "vector_search": "向量检索",
     "intent_classifier": "意图识别",
     "ambiguity_checker": "歧义检测",
+    "unified_analyzer": "意图与歧义分析",
     "query_planner": "查询规划",
     "context_assembler": "上下文组装",
     "sql_generator": "SQL 生成",
@@ -387,6 +423,65 @@ def _build_step_data(
     return step_data
 
 
+_STREAM_EXHAUSTED = object()
+
+
+def _sse_event(payload: Any) -> str:
+    """序列化为一条 SSE data 帧（orjson 紧凑编码，处理 Decimal/日期等 MySQL 类型）"""
+    return f"data: {dumps_compact(payload, default=sql_json_default)}\n\n"
+
+
+async def _iterate_in_thread(iterator: Iterator[Any]) -> AsyncGenerator[Any, None]:
+    """
+    在后台线程中推进同步迭代器（graph.stream），通过队列把事件交回事件循环
+
+    节点内部是阻塞的 LLM/DB 调用，直接在协程里迭代会卡住事件循环，
+    使所有并发 SSE 连接串行等待同一次生成。生产线程不等待消费方，
+    下一个节点的计算与当前 SSE 帧的发送重叠进行；消费方退出（客户端断开）后，
+    生产线程在下一个事件处停止并关闭迭代器。
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[tuple[Any, Optional[BaseException]]] = asyncio.Queue()
+    stop = threading.Event()
+
+    def post(item: Any, error: Optional[BaseException] = None) -> None:
+        # 事件循环已关闭（服务退出）时丢弃
+        with contextlib.suppress(RuntimeError):
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+
+    def produce() -> None:
+        try:
+            for item in iterator:
+                post(item)
+                if stop.is_set():
+                    close = getattr(iterator, "close", None)
+                    if close is not None:
+                        close()
+                    break
+        except BaseException as e:
+            post(_STREAM_EXHAUSTED, e)
+        else:
+            post(_STREAM_EXHAUSTED)
+
+    # 独立线程而非默认线程池：一次图运行可能持续数十秒，不占用 to_thread 的工作线程
+    threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(produce,),
+        name="graph-stream",
+        daemon=True,
+    ).start()
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _STREAM_EXHAUSTED:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
 async def _stream_graph_events(
     graph,
     initial_state: AgentState,
@@ -399,20 +494,20 @@ async def _stream_graph_events(
     update_waiting_for_clarification: bool = False,
 ) -> AsyncGenerator[str, None]:
     """复用的 Graph SSE 流式输出逻辑"""
+    config_dict = _graph_run_config(session)
     try:
-        yield f"data: {json.dumps({'type': 'start', 'message': start_message}, ensure_ascii=False)}\n\n"
-        await asyncio.sleep(0.1)
+        yield _sse_event({'type': 'start', 'message': start_message})
 
         current_step = 1
         accumulated_state = initial_state.copy()
 
-        thread_id = session.get("current_thread_id") or session.get("session_key", "default_thread")
-        config_dict = {
-            "recursion_limit": 50,
-            "configurable": {"thread_id": thread_id}
-        }
-
-        for event in graph.stream(initial_state, config=config_dict):
+        async for mode, event in _iterate_in_thread(
+            graph.stream(initial_state, config=config_dict, stream_mode=["updates", "custom"])
+        ):
+            if mode == "custom":
+                # 节点内推送的增量事件（如 SQL 生成 token），直接转发
+                yield _sse_event(event)
+                continue
             for node_name, node_output in event.items():
                 if node_output and isinstance(node_output, dict):
                     accumulated_state.update(node_output)
@@ -428,9 +523,8 @@ async def _stream_graph_events(
                     use_accumulated_query_plan=use_accumulated_query_plan,
                 )
 
-                yield f"data: {json.dumps(step_data, ensure_ascii=False, cls=CustomJSONEncoder)}\n\n"
+                yield _sse_event(step_data)
                 current_step += 1
-                await asyncio.sleep(0.1)
 
         # 检查是否有 interrupt（计划审核暂停）
         interrupt_data = None
@@ -452,7 +546,7 @@ async def _stream_graph_events(
                 "plan_nodes": interrupt_data.get("plan_nodes", []),
                 "message": "请审核以下查询计划",
             }
-            yield f"data: {json.dumps(plan_review_event, ensure_ascii=False, cls=CustomJSONEncoder)}\n\n"
+            yield _sse_event(plan_review_event)
             session["state"] = accumulated_state
             session["waiting_for_plan_review"] = True
             yield "data: [DONE]\n\n"
@@ -496,7 +590,7 @@ async def _stream_graph_events(
             if include_sql_reflection:
                 result_data['sql_reflection'] = final_state.get("sql_reflection")
 
-            yield f"data: {json.dumps(result_data, ensure_ascii=False, cls=CustomJSONEncoder)}\n\n"
+            yield _sse_event(result_data)
 
         yield "data: [DONE]\n\n"
 
@@ -504,6 +598,7 @@ async def _stream_graph_events(
         import traceback
         error_detail = traceback.format_exc()
         print(f"流式执行错误: {error_detail}")
+        await asyncio.to_thread(_release_metric_run, graph, config_dict)
         message = str(e)
         if error_message_prefix:
             message = f"{error_message_prefix}{message}"
@@ -511,7 +606,7 @@ async def _stream_graph_events(
             'type': 'error',
             'message': message
         }
-        yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+        yield _sse_event(error_data)
 
 
 async def stream_graph_execution(graph, initial_state: AgentState, session: dict[str, Any]) -> AsyncGenerator[str, None]:
@@ -526,16 +621,17 @@ async def stream_graph_execution(graph, initial_state: AgentState, session: dict
     Yields:
         SSE 格式的事件数据
     """
-    async for chunk in _stream_graph_events(
-        graph,
-        initial_state,
-        session,
-        start_message="开始处理查询...",
-        error_message_prefix="处理出错: ",
-        include_sql_reflection=True,
-        update_waiting_for_clarification=True,
-    ):
-        yield chunk
+    with _session_run(session):
+        async for chunk in _stream_graph_events(
+            graph,
+            initial_state,
+            session,
+            start_message="开始处理查询...",
+            error_message_prefix="处理出错: ",
+            include_sql_reflection=True,
+            update_waiting_for_clarification=True,
+        ):
+            yield chunk
 
 
 @app.post("/api/chat/stream")
@@ -549,7 +645,8 @@ async def chat_stream(request: ChatRequest):
         new_state: AgentState = {
             "user_query": previous_state.get("user_query", ""),
             "clarification_response": request.message,
-            "messages": previous_state.get("messages", []) + [
+            # 同一 thread 的检查点已保存历史消息，messages 经 add_messages 归并，只需传入本轮新增的两条
+            "messages": [
                 {"role": "assistant", "content": previous_state.get("clarification_question", "")},
                 {"role": "user", "content": request.message},
             ],
@@ -560,14 +657,15 @@ async def chat_stream(request: ChatRequest):
         session["waiting_for_clarification"] = False
 
         async def clarification_stream() -> AsyncGenerator[str, None]:
-            async for chunk in _stream_graph_events(
-                graph,
-                new_state,
-                session,
-                start_message="处理澄清回复...",
-                use_accumulated_query_plan=True,
-            ):
-                yield chunk
+            with _session_run(session):
+                async for chunk in _stream_graph_events(
+                    graph,
+                    new_state,
+                    session,
+                    start_message="处理澄清回复...",
+                    use_accumulated_query_plan=True,
+                ):
+                    yield chunk
 
         return StreamingResponse(clarification_stream(), media_type="text/event-stream")
 
@@ -653,22 +751,25 @@ async def chat(request: ChatRequest):
         graph = session["graph"]
 
         # 配置递归限制
-        thread_id = session.get("current_thread_id") or session.get("session_key", "default_thread")
-        config: dict[str, object] = {
-            "recursion_limit": 50,
-            "configurable": {"thread_id": thread_id}
-        }
-
-        if session["waiting_for_clarification"] and session["state"]:
-            result = process_clarification(graph, session["state"], request.message, config=config)
-        else:
-            initial_state: AgentState = {
-                "user_query": request.message,
-                "messages": [],
-                "clarification_count": 0,
-                "workspace_id": request.workspace_id or DEFAULT_WORKSPACE_ID,
-            }
-            result = graph.invoke(initial_state, config=config)
+        config: dict[str, object] = _graph_run_config(session)
+
+        with _session_run(session):
+            try:
+                if session["waiting_for_clarification"] and session["state"]:
+                    result = await asyncio.to_thread(
+                        process_clarification, graph, session["state"], request.message, config=config
+                    )
+                else:
+                    initial_state: AgentState = {
+                        "user_query": request.message,
+                        "messages": [],
+                        "clarification_count": 0,
+                        "workspace_id": request.workspace_id or DEFAULT_WORKSPACE_ID,
+                    }
+                    result = await asyncio.to_thread(graph.invoke, initial_state, config=config)
+            except Exception:
+                await asyncio.to_thread(_release_metric_run, graph, config)
+                raise
 
         session["state"] = result
 
@@ -710,7 +811,7 @@ class ReplayRequest(BaseModel):
 
 def _to_jsonable(data: Any) -> Any:
     """将任意对象转换为可 JSON 序列化的数据"""
-    return json.loads(json.dumps(data, ensure_ascii=False, cls=CustomJSONEncoder))
+    return json_loads(dumps_compact(data, default=sql_json_default))
 
 
 def _normalize_tabular_payload(
@@ -741,7 +842,7 @@ async def replay_data(request: ReplayRequest):
             from agents.python_executor import execute_python_code, clean_code
 
             code = clean_code(request.python_code)
-            data, error = execute_python_code(code)
+            data, error = await asyncio.to_thread(execute_python_code, code)
             if error:
                 return {"data": None, "error": f"回放失败: {error}"}
 
@@ -758,7 +859,7 @@ async def replay_data(request: ReplayRequest):
         if request.sql and request.sql.strip():
             from tools.db_client import load_data
 
-            df = load_data(request.sql)
+            df = await asyncio.to_thread(load_data, request.sql)
             data = df.to_dict(orient='records')
 
             if session.get("state"):
@@ -806,7 +907,7 @@ async def generate_chart(request: ChartRequest):
         from agents.chart_generator import create_chart_generator
 
         chart_gen = create_chart_generator()
-        return chart_gen(chart_state)
+        return await asyncio.to_thread(chart_gen, chart_state)
     except Exception as e:
         import traceback
 
@@ -820,9 +921,12 @@ async def cancel_plan_review(session_id: str = "default", workspace_id: Optional
     """取消计划审核等待状态，恢复正常流程"""
     session_key = _build_session_key(session_id, workspace_id)
     if session_key in sessions:
-        sessions[session_key]["waiting_for_plan_review"] = False
+        session = sessions[session_key]
+        session["waiting_for_plan_review"] = False
         if thread_id:
-            sessions[session_key]["current_thread_id"] = thread_id
+            session["current_thread_id"] = thread_id
+        # 停在计划审核处的运行不会再恢复，释放其指标临时表与连接
+        await asyncio.to_thread(_release_metric_run, session["graph"], _graph_run_config(session))
     return {"message": "计划审核已取消"}
 
 
@@ -849,11 +953,7 @@ async def resume_plan_review(request: PlanResumeRequest):
     # 优先使用前端传来的 thread_id，否则用 session 中保存的
     if request.thread_id:
         session["current_thread_id"] = request.thread_id
-    thread_id = session.get("current_thread_id") or session.get("session_key", "default_thread")
-    config_dict = {
-        "recursion_limit": 50,
-        "configurable": {"thread_id": thread_id}
-    }
+    config_dict = _graph_run_config(session)
 
     # 构造 resume decision
     if request.approved:
@@ -862,13 +962,14 @@ async def resume_plan_review(request: PlanResumeRequest):
         decision = {"approved": False, "adjustments": request.adjustments or ""}
 
     async def resume_stream() -> AsyncGenerator[str, None]:
-        async for chunk in _stream_graph_events_with_resume(
-            graph,
-            decision,
-            session,
-            config_dict,
-        ):
-            yield chunk
+        with _session_run(session):
+            async for chunk in _stream_graph_events_with_resume(
+                graph,
+                decision,
+                session,
+                config_dict,
+            ):
+                yield chunk
 
     return StreamingResponse(resume_stream(), media_type="text/event-stream")
 
@@ -883,8 +984,7 @@ async def _stream_graph_events_with_resume(
     from langgraph.types import Command
 
     try:
-        yield f"data: {json.dumps({'type': 'start', 'message': '继续处理计划审核...'}, ensure_ascii=False)}\n\n"
-        await asyncio.sleep(0.1)
+        yield _sse_event({'type': 'start', 'message': '继续处理计划审核...'})
 
         # 从 checkpoint 获取完整状态作为 accumulated_state 的基础
         accumulated_state: dict[str, Any] = {}
@@ -897,7 +997,12 @@ async def _stream_graph_events_with_resume(
 
         current_step = 1
 
-        for event in graph.stream(Command(resume=decision), config=config_dict):
+        async for mode, event in _iterate_in_thread(
+            graph.stream(Command(resume=decision), config=config_dict, stream_mode=["updates", "custom"])
+        ):
+            if mode == "custom":
+                yield _sse_event(event)
+                continue
             for node_name, node_output in event.items():
                 if node_output and isinstance(node_output, dict):
                     accumulated_state.update(node_output)
@@ -912,9 +1017,8 @@ async def _stream_graph_events_with_resume(
                     accumulated_state=accumulated_state,
                 )
 
-                yield f"data: {json.dumps(step_data, ensure_ascii=False, cls=CustomJSONEncoder)}\n\n"
+                yield _sse_event(step_data)
                 current_step += 1
-                await asyncio.sleep(0.1)
 
         # 检查是否又有 interrupt（用户调整后的二次审核）
         interrupt_data = None
@@ -936,7 +1040,7 @@ async def _stream_graph_events_with_resume(
                 "plan_nodes": interrupt_data.get("plan_nodes", []),
                 "message": "请审核调整后的查询计划",
             }
-            yield f"data: {json.dumps(plan_review_event, ensure_ascii=False, cls=CustomJSONEncoder)}\n\n"
+            yield _sse_event(plan_review_event)
             session["state"] = accumulated_state
             session["waiting_for_plan_review"] = True
             yield "data: [DONE]\n\n"
@@ -973,7 +1077,7 @@ async def _stream_graph_events_with_resume(
                 'suggested_questions': final_state.get("suggested_questions", [])
             }
 
-            yield f"data: {json.dumps(result_data, ensure_ascii=False, cls=CustomJSONEncoder)}\n\n"
+            yield _sse_event(result_data)
 
         yield "data: [DONE]\n\n"
 
@@ -981,18 +1085,18 @@ async def _stream_graph_events_with_resume(
         import traceback
         error_detail = traceback.format_exc()
         print(f"resume 流式执行错误: {error_detail}")
+        await asyncio.to_thread(_release_metric_run, graph, config_dict)
         error_data = {'type': 'error', 'message': str(e)}
-        yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+        yield _sse_event(error_data)
 
 
 @app.post("/api/reset")
 async def reset_session(session_id: str = "default", workspace_id: Optional[str] = None):
     """重置旧版会话。"""
     session_key = _build_session_key(session_id, workspace_id)
-    if session_key in sessions:
-        session = sessions[session_key]
+    session = sessions.pop(session_key, None)
+    if session is not None:
         _cleanup_session_resources(session)
-        del sessions[session_key]
     return {"message": "会话已重置"}
 
 
@@ -1000,12 +1104,24 @@ def _cleanup_session_resources(session: dict[str, Any]) -> None:
     """
     清理会话持有的资源
 
-    注意：MetricDBConnectionManager 被 metric_executor 节点闭包捕获，
-    无法直接访问。但我们依赖 MySQL TEMPORARY TABLE 的特性：
-    连接断开时自动清理。
+    共享图按运行（thread_id）保存 MetricDBConnectionManager，正常结束的运行由
+    metric_cleanup 节点释放；停在计划审核后未恢复的运行在这里释放，
+    连接关闭后其 TEMPORARY TABLE 随之清理。
 
-    这里清理的是会话级别的显式资源。
+    这里清理的是会话级别的显式资源，以及共享图 checkpointer 中该会话的检查点。
     """
+    graph = session.get("graph")
+    checkpointer = getattr(graph, "checkpointer", None)
+    for checkpoint_thread_id in session.get("checkpoint_thread_ids", ()):
+        try:
+            release_metric_run(graph, checkpoint_thread_id)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"释放指标查询连接失败: {checkpoint_thread_id}, {e}")
+        try:
+            checkpointer.delete_thread(checkpoint_thread_id)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"清理会话检查点失败: {checkpoint_thread_id}, {e}")
+
     try:
         # 如果会话有 state，检查是否有需要清理的临时文件
         state = session.get("state")
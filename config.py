@@ -3,14 +3,21 @@ Text2SQL 智能体系统配置文件
 """
 import os
 from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
 
-# 自动加载 .env 文件
-try:
-    from dotenv import load_dotenv
-    _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    _ = load_dotenv(os.path.join(_BASE_DIR, ".env"))
-except ImportError:
-    pass  # python-dotenv 未安装时跳过
+_BASE_DIR = str(Path(__file__).resolve().parent)
+_SCHEMA_PATH = os.path.join(_BASE_DIR, "test_number.json")
+_METRICS_PATH = os.path.join(_BASE_DIR, "基教指标.json")
+
+# 自动加载 .env 文件（子进程继承环境变量，已加载过则跳过重复解析）
+if not os.environ.get("_DOTENV_LOADED"):
+    try:
+        from dotenv import load_dotenv
+        _ = load_dotenv(os.path.join(_BASE_DIR, ".env"))
+        os.environ["_DOTENV_LOADED"] = "1"
+    except ImportError:
+        pass  # python-dotenv 未安装时跳过
 
 
 def _get_env_bool(name: str, default: bool = False) -> bool:
@@ -21,7 +28,7 @@ def _get_env_bool(name: str, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
-@dataclass
+@dataclass(slots=True)
 class LLMConfig:
     """LLM 配置 (兼容 OpenAI 格式)"""
     api_base: str = os.getenv("LLM_API_BASE", "http://localhost:11434/v1")
@@ -29,9 +36,11 @@ class LLMConfig:
     model_name: str = os.getenv("LLM_MODEL_NAME", "qwen2.5:7b")
     temperature: float = 0.0
     max_tokens: int = 2048
+    max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    timeout: float = float(os.getenv("LLM_TIMEOUT", "120"))
 
 
-@dataclass
+@dataclass(slots=True)
 class FineTunedModelConfig:
     """微调模型配置 (Ollama API)"""
     api_base: str = os.getenv("FINETUNED_API_BASE", "http://localhost:11434")
@@ -40,7 +49,7 @@ class FineTunedModelConfig:
     max_tokens: int = 1024
 
 
-@dataclass
+@dataclass(slots=True)
 class EmbeddingConfig:
     """Embedding 模型配置"""
     api_base: str = os.getenv("EMBEDDING_API_BASE", "http://localhost:11434/v1")
@@ -49,7 +58,7 @@ class EmbeddingConfig:
     dimension: int = 1024
 
 
-@dataclass
+@dataclass(slots=True)
 class DatabaseConfig:
     """MySQL 数据库配置"""
     host: str = os.getenv("DB_HOST", "localhost")
@@ -58,9 +67,10 @@ class DatabaseConfig:
     password: str = os.getenv("DB_PASSWORD", "your_password_here")
     database: str = os.getenv("DB_NAME", "education_metrics")
     charset: str = "utf8mb4"
+    pool_max_connections: int = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "25"))
 
 
-@dataclass
+@dataclass(slots=True)
 class AuthConfig:
     """Authentication settings for the web UI."""
     jwt_secret: str = os.getenv("JWT_SECRET", "text2sql-dev-secret")
@@ -69,19 +79,16 @@ class AuthConfig:
     bootstrap_admin_password: str = os.getenv("BOOTSTRAP_ADMIN_PASSWORD", "")
 
 
-@dataclass
+@dataclass(slots=True)
 class PathConfig:
     """路径配置"""
-    base_dir: str = os.path.dirname(os.path.abspath(__file__))
-    schema_path: str = field(default="")
-    metrics_path: str = field(default="")
-    
-    def __post_init__(self):
-        self.schema_path = os.path.join(self.base_dir, "test_number.json")
-        self.metrics_path = os.path.join(self.base_dir, "基教指标.json")
+    base_dir: str = _BASE_DIR
+    schema_path: str = _SCHEMA_PATH
+    metrics_path: str = _METRICS_PATH
+    cache_dir: str = os.getenv("CACHE_DIR", os.path.join(_BASE_DIR, ".cache"))
 
 
-@dataclass
+@dataclass(slots=True)
 class AppConfig:
     """应用总配置"""
     llm: LLMConfig = field(default_factory=LLMConfig)
@@ -91,6 +98,15 @@ class AppConfig:
     auth: AuthConfig = field(default_factory=AuthConfig)
     paths: PathConfig = field(default_factory=PathConfig)
     use_workspace_context: bool = _get_env_bool("USE_WORKSPACE_CONTEXT", False)
+    # 非澄清轮次用一次 LLM 调用完成意图分类 + 歧义检测 + 指标提取
+    unified_analysis: bool = _get_env_bool("UNIFIED_ANALYSIS", False)
+    
+    # API 会话存储上限: 最多保留的会话数、空闲多久后淘汰（秒）
+    session_max_entries: int = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+    session_ttl_seconds: float = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+    
+    # 普通查询规划时 Schema 最多保留的表数（按问题预筛选），0 表示不筛选
+    planner_schema_max_tables: int = int(os.getenv("PLANNER_SCHEMA_MAX_TABLES", "5"))
     
     # 向量检索配置
     vector_top_k: int = 5
@@ -99,7 +115,17 @@ class AppConfig:
     def refresh_feature_flags(self):
         """按需从环境变量刷新功能开关和相关运行时配置"""
         self.use_workspace_context = _get_env_bool("USE_WORKSPACE_CONTEXT", False)
+        self.unified_analysis = _get_env_bool("UNIFIED_ANALYSIS", False)
+
+
+@cache
+def get_config() -> AppConfig:
+    """获取全局配置实例（首次访问时创建）"""
+    return AppConfig()
 
 
-# 全局配置实例
-config = AppConfig()
+def __getattr__(name: str):
+    # 兼容 `from config import config`: 首次访问时才构建配置
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,35 +5,92 @@ LangGraph 图编排 - 定义智能体工作流
 1. VALUE_QUERY: 直接 SQL 生成 -> 执行 -> 响应
 2. METRIC_QUERY: 简单 SQL 拉取数据 -> 数据分析 -> 验证 -> 响应
 """
-from typing import Literal, Dict, Any
+from typing import TYPE_CHECKING, Literal, Dict, Any, Optional
+from importlib import import_module
+import contextvars
 import os
+import threading
 import time
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from concurrent.futures import ThreadPoolExecutor
 
 from state import AgentState, IntentType
-from agents.intent_classifier import create_intent_classifier
-from agents.ambiguity_checker import create_ambiguity_checker
-from agents.query_planner import create_query_planner
-from agents.context_assembler import create_context_assembler
-from agents.sql_generator import create_sql_generator
-from agents.sql_executor import create_sql_executor
-from agents.sql_corrector import create_sql_corrector
-from agents.response_generator import create_response_generator
-from agents.question_suggester import create_question_suggester
-from agents.verifier import create_verifier
-from agents.python_executor import create_python_executor
-from agents.metric_loop_planner import create_metric_loop_planner
-from agents.metric_sql_generator import create_metric_sql_generator
-from agents.metric_executor import create_metric_executor
-from agents.metric_observer import create_metric_observer
 from prompts.sql_rules import DatabaseType
 
+if TYPE_CHECKING:
+    from agents.intent_classifier import create_intent_classifier
+    from agents.ambiguity_checker import create_ambiguity_checker
+    from agents.unified_analyzer import create_unified_analyzer
+    from agents.query_planner import create_query_planner
+    from agents.context_assembler import create_context_assembler
+    from agents.sql_generator import create_sql_generator
+    from agents.sql_executor import create_sql_executor
+    from agents.sql_corrector import create_sql_corrector
+    from agents.response_generator import create_response_generator
+    from agents.question_suggester import create_question_suggester
+    from agents.verifier import create_verifier
+    from agents.python_executor import create_python_executor
+    from agents.metric_loop_planner import create_metric_loop_planner
+    from agents.metric_sql_generator import create_metric_sql_generator
+    from agents.metric_executor import create_metric_executor
+    from agents.metric_observer import create_metric_observer
+
+
+# 节点工厂 -> 所在模块；langgraph 与各 Agent 模块在首次构建图时才导入，
+# 只用到 process_clarification 等轻量函数的入口（如 main.py --help）不必加载它们
+_AGENT_FACTORY_MODULES: Dict[str, str] = {
+    "create_intent_classifier": "agents.intent_classifier",
+    "create_ambiguity_checker": "agents.ambiguity_checker",
+    "create_unified_analyzer": "agents.unified_analyzer",
+    "create_query_planner": "agents.query_planner",
+    "create_context_assembler": "agents.context_assembler",
+    "create_sql_generator": "agents.sql_generator",
+    "create_sql_executor": "agents.sql_executor",
+    "create_sql_corrector": "agents.sql_corrector",
+    "create_response_generator": "agents.response_generator",
+    "create_question_suggester": "agents.question_suggester",
+    "create_verifier": "agents.verifier",
+    "create_python_executor": "agents.python_executor",
+    "create_metric_loop_planner": "agents.metric_loop_planner",
+    "create_metric_sql_generator": "agents.metric_sql_generator",
+    "create_metric_executor": "agents.metric_executor",
+    "create_metric_observer": "agents.metric_observer",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """按需导入节点工厂，并缓存为模块属性（之后的访问不再经过这里）"""
+    module_name = _AGENT_FACTORY_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    factory = getattr(import_module(module_name), name)
+    globals()[name] = factory
+    return factory
+
+
+def _load_agent_factories() -> None:
+    """导入尚未加载的节点工厂（保留测试中通过 monkeypatch 替换的工厂）"""
+    for name in _AGENT_FACTORY_MODULES:
+        if name not in globals():
+            __getattr__(name)
+
 
 # 临时文件目录 (用于清理)
 TEMP_DIR = os.path.join(os.path.dirname(__file__), "temp")
 
+# 并行 LLM 调用线程池（懒加载，池大小即并发上限，避免超出服务商限流）
+_llm_executor: ThreadPoolExecutor | None = None
+
+
+def _get_llm_executor() -> ThreadPoolExecutor:
+    global _llm_executor
+    if _llm_executor is None:
+        from config import config as app_config
+        _llm_executor = ThreadPoolExecutor(
+            max_workers=app_config.llm.max_concurrency,
+            thread_name_prefix="llm-parallel",
+        )
+    return _llm_executor
+
 
 class MetricDBConnectionManager:
     """
@@ -114,6 +171,79 @@ class MetricDBConnectionManager:
             logging.getLogger(__name__).warning(f"MetricDBConnectionManager 清理警告: {'; '.join(errors)}")
 
 
+class MetricDBManagerRegistry:
+    """
+    按运行隔离的 MetricDBConnectionManager 集合
+
+    所有会话共用一个编译好的图，并发的指标查询若共用同一个管理器，
+    会共享非线程安全的连接，且一方清理时会删掉另一方仍在使用的临时表。
+    这里以 checkpointer 的 thread_id 为键，每个运行使用独立的连接与临时表。
+    """
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self._managers: Dict[str, MetricDBConnectionManager] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, run_key: str) -> MetricDBConnectionManager:
+        """获取该运行的管理器（不存在时创建）"""
+        with self._lock:
+            manager = self._managers.get(run_key)
+            if manager is None:
+                manager = MetricDBConnectionManager(self.db_config)
+                self._managers[run_key] = manager
+            return manager
+
+    def release(self, run_key: str) -> None:
+        """清理该运行的临时表与连接（不影响其他运行）"""
+        with self._lock:
+            manager = self._managers.pop(run_key, None)
+        if manager is not None:
+            manager.cleanup()
+
+    def __len__(self) -> int:
+        return len(self._managers)
+
+
+def _run_key(run_config: Optional[Dict[str, Any]]) -> str:
+    """运行配置中的 checkpointer thread_id；缺失时报错，避免不同运行共用同一个管理器"""
+    configurable = (run_config or {}).get("configurable") or {}
+    thread_id = configurable.get("thread_id")
+    if not thread_id:
+        raise ValueError("指标查询需要在运行配置中提供 configurable.thread_id")
+    return str(thread_id)
+
+
+def release_metric_run(graph, thread_id: str) -> None:
+    """
+    释放图中某个运行的指标连接管理器（删除临时表并关闭连接）
+
+    正常结束的运行由 metric_cleanup 节点释放；运行异常结束、停在计划审核后
+    不再恢复、或会话被清理时由调用方调用。图中没有该运行的管理器时不做任何事。
+    """
+    registry = getattr(graph, "metric_db_managers", None)
+    if registry is not None:
+        registry.release(thread_id)
+
+
+def _normalize_intent(value: Any) -> Optional[IntentType]:
+    """将状态中的意图统一为 IntentType 成员（可能是字符串），无法识别时返回 None"""
+    if value is None or isinstance(value, IntentType):
+        return value
+    try:
+        return IntentType(value)
+    except ValueError:
+        return None
+
+
+# 意图分类后的路由表（键为归一化后的 IntentType 成员）
+_INTENT_ROUTES: Dict[IntentType, str] = {
+    IntentType.CHITCHAT: "response_generator",
+    IntentType.METRIC_DEFINITION: "response_generator",
+    IntentType.VALUE_QUERY: "query_planner",  # 数值查询：直接进入规划器
+}
+
+
 def create_graph(llm_client, embedding_client=None, db_connection=None, sql_model_client=None, 
                  domain_config=None, database_type=DatabaseType.MYSQL, max_correction_attempts=3):
     """
@@ -132,44 +262,89 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
         编译后的 Graph
     """
     
+    from langgraph.graph import StateGraph, END
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    _load_agent_factories()
+
     # 初始化域配置和提示词构建器
-    from prompts import EducationDomain, PromptBuilder
+    # 默认域复用进程级共享的 PromptBuilder；自定义域单独构建
+    from prompts import PromptBuilder, get_prompt_builder
     if domain_config is None:
-        domain_config = EducationDomain()
-    prompt_builder = PromptBuilder(domain_config)
+        prompt_builder = get_prompt_builder()
+    else:
+        prompt_builder = PromptBuilder(domain_config)
+    
+    # 进程级共享的 LLM 响应缓存（相同 prompt 复用解析结果）
+    from tools.llm_cache import get_definition_cache, get_llm_response_cache, get_sql_cache
+    response_cache = get_llm_response_cache()
+    sql_cache = get_sql_cache()
     
     # 创建各个节点（传入 prompt_builder）
-    intent_classifier = create_intent_classifier(llm_client, prompt_builder)
-    ambiguity_checker = create_ambiguity_checker(llm_client, prompt_builder)
-    query_planner = create_query_planner(llm_client)
+    intent_classifier = create_intent_classifier(llm_client, prompt_builder, response_cache)
+    ambiguity_checker = create_ambiguity_checker(llm_client, prompt_builder, response_cache)
+    unified_analyzer = create_unified_analyzer(llm_client, prompt_builder, response_cache)
+    query_planner = create_query_planner(llm_client, response_cache)
     context_assembler = create_context_assembler(prompt_builder)
-    sql_generator = create_sql_generator(sql_model_client or llm_client)
-    sql_executor = create_sql_executor(db_connection)
-    sql_corrector = create_sql_corrector(llm_client, database_type)
-    response_generator = create_response_generator(llm_client)
+    sql_generator = create_sql_generator(sql_model_client or llm_client, sql_cache)
+    from tools.correction_memory import get_correction_memory
+    correction_memory = get_correction_memory()
+    sql_executor = create_sql_executor(db_connection, correction_memory)
+    sql_corrector = create_sql_corrector(llm_client, database_type, sql_cache, correction_memory)
+    response_generator = create_response_generator(llm_client, get_definition_cache())
     question_suggester = create_question_suggester(llm_client)
     
     python_executor = create_python_executor()  # 代码执行节点
     verifier = create_verifier(llm_client)
     
-    # 创建 Metric DB 连接管理器（用于共享连接）
+    # Metric DB 连接管理器按运行（thread_id）隔离：同一运行的各步骤共享连接，不同运行互不干扰
     from config import config as app_config
-    metric_db_manager = MetricDBConnectionManager(app_config.database)
+    from langchain_core.runnables import RunnableConfig
+    metric_db_managers = MetricDBManagerRegistry(app_config.database)
     
     metric_loop_planner = create_metric_loop_planner(llm_client)
     metric_sql_generator = create_metric_sql_generator(llm_client)
-    metric_executor = create_metric_executor(metric_db_manager)
     metric_observer = create_metric_observer(llm_client)
     
+    def metric_executor(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Metric 执行节点 - 使用当前运行的连接管理器"""
+        return create_metric_executor(metric_db_managers.acquire(_run_key(config)))(state)
+    
     # 定义 Metric 清理节点（循环结束时清理连接和临时表）
-    def metric_cleanup_node(state: AgentState) -> Dict[str, Any]:
-        """Metric 循环清理节点 - 清理共享连接和临时表"""
+    def metric_cleanup_node(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Metric 循环清理节点 - 清理当前运行的连接和临时表"""
         try:
-            metric_db_manager.cleanup()
+            metric_db_managers.release(_run_key(config))
         except Exception as e:
             print(f"DEBUG: Metric cleanup failed: {e}")
         return {"current_node": "metric_cleanup"}
     
+    # 定义响应阶段节点
+    def response_stage_node(state: AgentState) -> Dict[str, Any]:
+        """
+        响应生成 + 推荐问题
+
+        question_suggester 只依赖 user_query/generated_sql/execution_result，
+        不读取 final_response，因此与 response_generator 并行执行，
+        总耗时为两者的最大值而非之和。
+        """
+        if not state.get("enable_suggestions", False):
+            return response_generator(state)
+
+        # 在调用方上下文的副本中运行，LangGraph 的运行配置、回调与追踪才能传到该 LLM 调用
+        suggestion_future = _get_llm_executor().submit(
+            contextvars.copy_context().run, question_suggester, state
+        )
+        result = dict(response_generator(state))
+        try:
+            suggestion_output = suggestion_future.result()
+        except Exception as e:
+            print(f"DEBUG: 推荐问题生成失败: {e}")
+        else:
+            result["suggested_questions"] = suggestion_output.get("suggested_questions", [])
+        return result
+    
     # 定义澄清返回节点
     def clarification_return_node(state: AgentState) -> Dict[str, Any]:
         """澄清返回节点 - 将澄清问题作为最终回复"""
@@ -313,6 +488,8 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
             "correction_count": 0,
             "verification_count": 0,
             "max_correction_attempts": max_correction_attempts,
+            "corrected_from_sql": None,
+            "correction_error": None,
             "max_verification_attempts": 2,
             "analysis_result": None,
             "analysis_error": None,
@@ -345,6 +522,8 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
     workflow.add_node("init", init_node)
     workflow.add_node("intent_classifier", intent_classifier)
     workflow.add_node("ambiguity_checker", ambiguity_checker)
+    if app_config.unified_analysis:
+        workflow.add_node("unified_analyzer", unified_analyzer)
     workflow.add_node("query_planner", query_planner)
     workflow.add_node("clarification_return", clarification_return_node)
     workflow.add_node("plan_review_handler", plan_review_handler_node)
@@ -359,28 +538,35 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
     workflow.add_node("metric_executor", metric_executor)
     workflow.add_node("metric_observer", metric_observer)
     workflow.add_node("metric_cleanup", metric_cleanup_node)  # 新增清理节点
-    workflow.add_node("response_generator", response_generator)
-    workflow.add_node("question_suggester", question_suggester)
+    workflow.add_node("response_generator", response_stage_node)  # 内部并行生成推荐问题
     workflow.add_node("cleanup", cleanup_node)         # 新增
     
     # 设置入口点
     workflow.set_entry_point("init")
 
-    # init -> intent_classifier
-    workflow.add_edge("init", "intent_classifier")
+    # init -> intent_classifier (开启统一分析时，非澄清轮次走 unified_analyzer)
+    def route_after_init(state: AgentState) -> Literal["unified_analyzer", "intent_classifier"]:
+        if state.get("clarification_response"):
+            return "intent_classifier"
+        return "unified_analyzer"
+
+    if app_config.unified_analysis:
+        workflow.add_conditional_edges(
+            "init",
+            route_after_init,
+            {
+                "unified_analyzer": "unified_analyzer",
+                "intent_classifier": "intent_classifier",
+            }
+        )
+    else:
+        workflow.add_edge("init", "intent_classifier")
 
     # 意图分类后的条件路由
     def route_after_intent(state: AgentState) -> Literal["response_generator", "ambiguity_checker", "query_planner"]:
-        intent_type = state.get("intent_type", IntentType.CHITCHAT)
-        
-        if intent_type == IntentType.CHITCHAT:
-            return "response_generator"
-        elif intent_type == IntentType.METRIC_DEFINITION:
-            return "response_generator"
-        elif intent_type == IntentType.VALUE_QUERY:
-            return "query_planner"  # 数值查询：直接进入规划器
-        else:  # METRIC_QUERY
-            return "ambiguity_checker"  # 可能需要澄清聚合方式
+        # 其余意图 (METRIC_QUERY) 进入歧义检测，可能需要澄清聚合方式
+        intent = _normalize_intent(state.get("intent_type", IntentType.CHITCHAT))
+        return _INTENT_ROUTES.get(intent, "ambiguity_checker")
     
     workflow.add_conditional_edges(
         "intent_classifier",
@@ -398,11 +584,8 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
         if ambiguity_detected:
             return "clarification_return"
 
-        intent_type = state.get("intent_type")
-        is_metric_query = (intent_type == IntentType.METRIC_QUERY or
-                          intent_type == "metric_query")
         # 关键调整: METRIC_QUERY 不再经过 query_planner，直接进入 metric_loop_planner
-        if is_metric_query:
+        if _normalize_intent(state.get("intent_type")) is IntentType.METRIC_QUERY:
             return "metric_loop_planner"
 
         return "query_planner"
@@ -416,6 +599,30 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
             "metric_loop_planner": "metric_loop_planner",
         }
     )
+
+    # 统一分析后的条件路由：解析失败回退到逐步流程，其余复用意图/歧义路由
+    def route_after_unified(state: AgentState) -> Literal[
+        "intent_classifier", "response_generator", "query_planner", "clarification_return", "metric_loop_planner"
+    ]:
+        intent_type = state.get("intent_type")
+        if intent_type is None:
+            return "intent_classifier"
+        if _normalize_intent(intent_type) is IntentType.METRIC_QUERY:
+            return route_after_ambiguity(state)
+        return route_after_intent(state)
+
+    if app_config.unified_analysis:
+        workflow.add_conditional_edges(
+            "unified_analyzer",
+            route_after_unified,
+            {
+                "intent_classifier": "intent_classifier",
+                "response_generator": "response_generator",
+                "query_planner": "query_planner",
+                "clarification_return": "clarification_return",
+                "metric_loop_planner": "metric_loop_planner",
+            }
+        )
     
     # QueryPlanner -> 条件路由 (规划失败时短路到 response_generator)
     def route_after_planner(state: AgentState) -> Literal["context_assembler", "response_generator"]:
@@ -530,17 +737,13 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
         注意: METRIC_QUERY 在 ambiguity_checker 后直接进入 metric_loop_planner，
               不会经过 sql_executor。
         """
-        execution_error = state.get("execution_error")
         execution_result = state.get("execution_result")
         correction_count = state.get("correction_count", 0)
-        max_limit = state.get("max_correction_attempts", 3)
-        
-        # 场景 1: 数据库硬报错
-        if execution_error:
-            if correction_count < max_limit:
-                return "sql_corrector"
+
+        # 场景 1: 数据库硬报错（init 节点总会写入 max_correction_attempts）
+        if state.get("execution_error"):
             # 达到上限, 直接响应错误
-            return "response_generator"
+            return "sql_corrector" if correction_count < state["max_correction_attempts"] else "response_generator"
         
         # 场景 2: 空结果 - 尝试纠错
         if isinstance(execution_result, list) and len(execution_result) == 0:
@@ -582,30 +785,8 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
         }
     )
     
-    # 响应生成后的路由 (推荐问题)
-    def route_after_response(state: AgentState) -> str:
-        """
-        根据配置决定是否生成推荐问题
-        
-        注意: Code-Based 模式下 METRIC_QUERY 不再产生 CSV，无需 cleanup
-        """
-        enable = state.get("enable_suggestions", False)
-        
-        if enable:
-            return "question_suggester"
-        return "end"
-
-    workflow.add_conditional_edges(
-        "response_generator",
-        route_after_response,
-        {
-            "question_suggester": "question_suggester",
-            "end": END
-        }
-    )
-    
-    # 推荐问题后直接结束
-    workflow.add_edge("question_suggester", END)
+    # 响应生成后结束（推荐问题已在响应阶段并行生成）
+    workflow.add_edge("response_generator", END)
     
     # 清理后结束
     workflow.add_edge("cleanup", END)
@@ -634,6 +815,8 @@ def create_graph(llm_client, embedding_client=None, db_connection=None, sql_mode
     serde = JsonPlusSerializer().with_msgpack_allowlist([IntentType])
     memory = MemorySaver(serde=serde)
     app = workflow.compile(checkpointer=memory)
+    # 暴露按运行隔离的连接管理器，供 release_metric_run 在运行异常或会话清理时释放
+    app.metric_db_managers = metric_db_managers
     
     return app
 
@@ -655,12 +838,15 @@ def process_clarification(
     Returns:
         更新后的状态
     """
-    new_state = dict(state)
-    new_state["clarification_response"] = user_response
-    new_state["messages"] = state.get("messages", []) + [
-        {"role": "assistant", "content": state.get("clarification_question", "")},
-        {"role": "user", "content": user_response}
-    ]
+    new_state = {
+        **state,
+        "clarification_response": user_response,
+        "messages": [
+            *state.get("messages", []),
+            {"role": "assistant", "content": state.get("clarification_question", "")},
+            {"role": "user", "content": user_response},
+        ],
+    }
     
     result = app.invoke(new_state, config=config)
     return result
@@ -7,6 +7,7 @@ Text2SQL 提示词模块
 # 原有提示词
 from .intent_classifier_prompt import INTENT_CLASSIFIER_PROMPT
 from .ambiguity_checker_prompt import AMBIGUITY_CHECKER_PROMPT
+from .unified_analysis_prompt import UNIFIED_ANALYSIS_PROMPT
 from .context_assembler_prompt import (
     SQL_GENERATOR_INSTRUCTION,
     SQL_GENERATOR_PROMPT_TEMPLATE
@@ -29,23 +30,27 @@ from .sql_rules import (
 from .sql_samples import SQLSampleLibrary, SQLSample, get_education_samples
 from .sql_correction_prompt import (
     get_sql_correction_system_prompt,
-    build_sql_correction_prompt
+    build_sql_correction_prompt,
+    make_correction_formatter,
 )
 from .domain_config import (
     DomainConfig,
     EducationDomain,
     TableSchema,
     IntentType,
+    DEFAULT_DOMAIN_NAME,
     register_domain,
     get_domain,
     list_domains
 )
-from .prompt_builder import PromptBuilder
+from .prompt_builder import PromptBuilder, get_prompt_builder
+from .template import CompiledTemplate
 
 __all__ = [
     # 原有提示词
     "INTENT_CLASSIFIER_PROMPT",
     "AMBIGUITY_CHECKER_PROMPT",
+    "UNIFIED_ANALYSIS_PROMPT",
     "SQL_GENERATOR_INSTRUCTION",
     "SQL_GENERATOR_PROMPT_TEMPLATE",
     "CHITCHAT_PROMPT",
@@ -68,16 +73,20 @@ __all__ = [
     # SQL 纠错
     "get_sql_correction_system_prompt",
     "build_sql_correction_prompt",
+    "make_correction_formatter",
     
     # 域配置
     "DomainConfig",
     "EducationDomain",
     "TableSchema",
     "IntentType",
+    "DEFAULT_DOMAIN_NAME",
     "register_domain",
     "get_domain",
     "list_domains",
     
     # 提示词构建器
     "PromptBuilder",
+    "get_prompt_builder",
+    "CompiledTemplate",
 ]
@@ -5,12 +5,12 @@
 参考 WrenAI 的设计模式，通过配置化方式支持多业务场景。
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 
 from .sql_rules import DatabaseType
-from .sql_samples import SQLSampleLibrary
+from .sql_samples import SQLSampleLibrary, get_education_samples
 
 
 class IntentType(str, Enum):
@@ -21,7 +21,7 @@ class IntentType(str, Enum):
     CHITCHAT = "chitchat"
 
 
-@dataclass
+@dataclass(slots=True)
 class TableSchema:
     """表结构描述"""
     name: str                    # 表名
@@ -30,7 +30,7 @@ class TableSchema:
     alias: Optional[str] = None  # 表别名
 
 
-@dataclass
+@dataclass(slots=True)
 class DomainConfig:
     """业务域配置基类"""
     
@@ -40,28 +40,28 @@ class DomainConfig:
     database_type: DatabaseType = DatabaseType.MYSQL  # 数据库类型
     
     # 数据结构
-    tables: List[TableSchema] = field(default_factory=list)  # 表结构
+    tables: Tuple[TableSchema, ...] = ()  # 表结构
     
     # 业务规则
-    business_rules: List[str] = field(default_factory=list)  # 业务规则
+    business_rules: Tuple[str, ...] = ()  # 业务规则
     metric_definitions: Dict[str, str] = field(default_factory=dict)  # 指标定义
     
     # 查询示例
     sql_samples: Optional[SQLSampleLibrary] = None  # SQL 示例库
     
     # SQL 函数说明
-    sql_functions: List[str] = field(default_factory=list)  # 数据库函数说明
+    sql_functions: Tuple[str, ...] = ()  # 数据库函数说明
     
     # 意图分类
-    supported_intents: List[IntentType] = field(default_factory=lambda: [
+    supported_intents: FrozenSet[IntentType] = frozenset({
         IntentType.SIMPLE_QUERY,
         IntentType.METRIC_QUERY,
         IntentType.METRIC_DEFINITION,
         IntentType.CHITCHAT,
-    ])
+    })
     
     # 歧义检测规则
-    ambiguity_rules: List[str] = field(default_factory=list)
+    ambiguity_rules: Tuple[str, ...] = ()
     
     def get_schema_description(self) -> str:
         """获取完整的 Schema 描述"""
@@ -102,38 +102,50 @@ class DomainConfig:
         return "\n".join(lines)
 
 
+# 默认域名称（EducationDomain 注册在该名称下）
+DEFAULT_DOMAIN_NAME = "教育指标体系"
+
+
+# 教育指标域的静态配置（模块导入时构建一次，各 EducationDomain 实例共享，只读）
+_EDUCATION_METRIC_DEFINITIONS: Dict[str, str] = {
+    "基础设施": "评估学校为师生数字化教学提供的技术支撑情况（网络、终端、教室）",
+    "数字资源": "评估数字教育资源的建设和应用情况（规模、质量、应用）",
+    "教育教学": "评估教学、评价等要素的数字化程度（教学方式、教学评价）",
+    "数字素养": "评估学生和教师的数字技术思维和应用能力",
+    "教育治理": "学校利用数字化改革赋能校园治理现代化（学校治理、政务服务、网络安全）",
+    "保障机制": "评估教育数字化保障能力（组织保障、人力保障、财力保障）",
+}
+
+_EDUCATION_BUSINESS_RULES = (
+    "优先使用标准化的指标表字段进行查询",
+    "对于涉及多年数据对比的查询，需明确指定年份范围",
+    "涉及地区筛选时，支持省-市-区县三级筛选",
+    "指标得分通常为 0-100 分的数值",
+)
+
+_EDUCATION_AMBIGUITY_RULES = (
+    "用户只提一级指标时，需澄清是查看所有二级指标明细还是计算综合得分",
+    "缺少年份时，需澄清查询的时间范围",
+    "缺少地区范围时，需澄清是全国、特定省市还是特定学校",
+    "查询目标不明时，需澄清是单个学校数据、学校对比还是区域汇总",
+)
+
+_EDUCATION_SAMPLES = get_education_samples()
+
+
 # 教育指标域配置（默认实现）
 class EducationDomain(DomainConfig):
     """教育指标体系域配置"""
     
     def __init__(self):
-        from .sql_samples import get_education_samples
-        
         super().__init__(
-            name="教育指标体系",
+            name=DEFAULT_DOMAIN_NAME,
             description="用于评估学校教育数字化水平的数据库",
             database_type=DatabaseType.MYSQL,
-            metric_definitions={
-                "基础设施": "评估学校为师生数字化教学提供的技术支撑情况（网络、终端、教室）",
-                "数字资源": "评估数字教育资源的建设和应用情况（规模、质量、应用）",
-                "教育教学": "评估教学、评价等要素的数字化程度（教学方式、教学评价）",
-                "数字素养": "评估学生和教师的数字技术思维和应用能力",
-                "教育治理": "学校利用数字化改革赋能校园治理现代化（学校治理、政务服务、网络安全）",
-                "保障机制": "评估教育数字化保障能力（组织保障、人力保障、财力保障）",
-            },
-            business_rules=[
-                "优先使用标准化的指标表字段进行查询",
-                "对于涉及多年数据对比的查询，需明确指定年份范围",
-                "涉及地区筛选时，支持省-市-区县三级筛选",
-                "指标得分通常为 0-100 分的数值",
-            ],
-            sql_samples=get_education_samples(),
-            ambiguity_rules=[
-                "用户只提一级指标时，需澄清是查看所有二级指标明细还是计算综合得分",
-                "缺少年份时，需澄清查询的时间范围",
-                "缺少地区范围时，需澄清是全国、特定省市还是特定学校",
-                "查询目标不明时，需澄清是单个学校数据、学校对比还是区域汇总",
-            ]
+            metric_definitions=_EDUCATION_METRIC_DEFINITIONS,
+            business_rules=_EDUCATION_BUSINESS_RULES,
+            sql_samples=_EDUCATION_SAMPLES,
+            ambiguity_rules=_EDUCATION_AMBIGUITY_RULES,
         )
 
 
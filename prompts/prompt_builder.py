@@ -2,13 +2,25 @@
 提示词构建器 - 支持全量指标上下文
 """
 
+from functools import cache
 from typing import List, Optional, Dict, Any
-import json
 
-from .domain_config import DomainConfig
+from tools.json_utils import dumps_compact
+
+from .domain_config import DEFAULT_DOMAIN_NAME, DomainConfig, get_domain
 from .sql_rules import get_sql_rules
 from .sql_samples import SQLSampleLibrary
 from .context_assembler_prompt import SQL_GENERATOR_INSTRUCTION
+from .intent_classifier_prompt import INTENT_CLASSIFIER_PROMPT
+from .ambiguity_checker_prompt import AMBIGUITY_CHECKER_PROMPT, DEFAULT_FILTER_CONDITIONS_GUIDANCE
+from .unified_analysis_prompt import UNIFIED_ANALYSIS_PROMPT
+from .template import CompiledTemplate
+
+
+# 模板在模块导入时解析一次，每次构建只做字段替换
+_INTENT_CLASSIFIER_TEMPLATE = CompiledTemplate(INTENT_CLASSIFIER_PROMPT)
+_AMBIGUITY_CHECKER_TEMPLATE = CompiledTemplate(AMBIGUITY_CHECKER_PROMPT)
+_UNIFIED_ANALYSIS_TEMPLATE = CompiledTemplate(UNIFIED_ANALYSIS_PROMPT)
 
 
 class PromptBuilder:
@@ -16,6 +28,23 @@ class PromptBuilder:
     
     def __init__(self, domain: DomainConfig):
         self.domain = domain
+        # 域配置在构建器生命周期内不变，静态文本只渲染一次
+        self._schema_description = domain.get_schema_description()
+        self._metric_definitions_text = domain.get_metric_definitions_text()
+        self._intent_template = _INTENT_CLASSIFIER_TEMPLATE.partial(
+            domain_description=domain.description,
+        )
+        self._ambiguity_template = _AMBIGUITY_CHECKER_TEMPLATE.partial(
+            domain_description=domain.description,
+            database_schema_summary=self._schema_description,
+            filter_conditions_guidance=DEFAULT_FILTER_CONDITIONS_GUIDANCE,
+        )
+        # 最近一次序列化的 (schema 对象, JSON 文本)；持有引用保证 is 比较可靠
+        self._schema_json: Optional[tuple[Dict[str, Any], str]] = None
+        self._unified_template = _UNIFIED_ANALYSIS_TEMPLATE.partial(
+            domain_description=domain.description,
+            database_schema_summary=self._schema_description,
+        )
     
     def _format_metric_context(self, matched_metrics: Optional[List[Any]], full_context: Optional[str] = None) -> str:
         """格式化指标上下文"""
@@ -23,15 +52,17 @@ class PromptBuilder:
             return f"### 完整指标体系 ###\n```json\n{full_context}\n```"
             
         if matched_metrics:
-            metric_context = "### 相关指标信息 ###\n"
+            lines = ["### 相关指标信息 ###"]
             for m in matched_metrics[:5]:
-                # 统一处理对象或字典
-                if hasattr(m, 'level1_name'):
-                    name = m.level1_name
+                # 统一处理对象 (MetricInfo) 或字典
+                level1_name = getattr(m, 'level1_name', None)
+                if level1_name is not None:
+                    name = level1_name
                     desc = m.level1_description
-                    if hasattr(m, 'level2_name') and m.level2_name:
-                         name += f" > {m.level2_name}"
-                         desc = m.level2_description
+                    level2_name = getattr(m, 'level2_name', None)
+                    if level2_name:
+                        name += f" > {level2_name}"
+                        desc = m.level2_description
                 elif isinstance(m, dict):
                     name = m.get('level1_name', '')
                     desc = m.get('level1_description', '')
@@ -40,11 +71,25 @@ class PromptBuilder:
                         desc = m.get('level2_description')
                 else:
                     continue
-                metric_context += f"- **{name}**: {desc}\n"
-            return metric_context
+                lines.append(f"- **{name}**: {desc}")
+            return "\n".join(lines) + "\n"
             
         return "无特定指标信息"
 
+    def _serialize_schema(self, schema: Dict[str, Any]) -> str:
+        """
+        序列化 Schema（同一个 schema 对象只序列化一次）
+
+        context_assembler 传入的 schema 来自按文本缓存的解析结果，Schema 不变时为同一对象（只读）。
+        """
+        cached = self._schema_json
+        if cached is not None and cached[0] is schema:
+            return cached[1]
+        # 紧凑序列化：LLM 不需要缩进，省去约 30% 的空白 token（优先走 orjson）
+        schema_str = dumps_compact(schema)
+        self._schema_json = (schema, schema_str)
+        return schema_str
+
     def build_sql_generation_prompt(
         self,
         query: str,
@@ -59,7 +104,7 @@ class PromptBuilder:
         构建 SQL 生成提示词
         """
         # Schema
-        schema_str = json.dumps(schema, ensure_ascii=False, indent=2)
+        schema_str = self._serialize_schema(schema)
         
         # 指标上下文 (优先使用 full_metrics_context)
         metric_context = self._format_metric_context(matched_metrics, full_metrics_context)
@@ -72,16 +117,17 @@ class PromptBuilder:
         # 用户指令
         instructions_text = ""
         if instructions:
-            instructions_text = "### USER INSTRUCTIONS ###\n"
-            for i, inst in enumerate(instructions, 1):
-                instructions_text += f"{i}. {inst}\n"
+            instructions_text = "### USER INSTRUCTIONS ###\n" + "".join(
+                f"{i}. {inst}\n" for i, inst in enumerate(instructions, 1)
+            )
 
         # 推理计划
         reasoning_text = ""
         if reasoning_plan:
             reasoning_text = f"### REASONING PLAN ###\n{reasoning_plan}\n"
         
-        # 组装完整提示词
+        # 组装完整提示词: 固定内容 (说明/Schema/示例) 在前，随轮次变化的内容在后，
+        # 相邻轮次共享尽可能长的相同前缀，推理端可复用 KV 缓存
         prompt = f"""### 任务说明
 {SQL_GENERATOR_INSTRUCTION}
 
@@ -94,10 +140,10 @@ class PromptBuilder:
 
 ---
 
-{metric_context}
-
 {samples_text}
 
+{metric_context}
+
 {instructions_text}
 
 {reasoning_text}
@@ -125,19 +171,14 @@ class PromptBuilder:
             chat_history: 对话历史文本
             full_metrics_context: 精简的指标体系摘要 (来自 schema_cache.get_metrics_summary())
         """
-        # 获取域上下文
-        domain_description = self.domain.description
-        
         # 指标定义: 优先使用精简摘要 (包含一级+二级指标名), 否则回退到 domain_config 固定定义
         if full_metrics_context:
             metric_definitions = full_metrics_context
         else:
-            metric_definitions = self.domain.get_metric_definitions_text()
-        
-        from .intent_classifier_prompt import INTENT_CLASSIFIER_PROMPT
+            metric_definitions = self._metric_definitions_text
         
-        return INTENT_CLASSIFIER_PROMPT.format(
-            domain_description=domain_description,
+        # 域描述已在构建器初始化时预先填入模板
+        return self._intent_template.render(
             metric_definitions=metric_definitions,
             chat_history=chat_history,
             user_query=query
@@ -158,29 +199,54 @@ class PromptBuilder:
             metrics_text = f"（完整指标体系已包含，此处省略详细列表）"
         elif matched_metrics:
             metrics_text = "\n".join([
-               f"- {m.level1_name}" + (f" > {m.level2_name}" if hasattr(m, 'level2_name') and m.level2_name else "") 
+               f"- {m.level1_name}" + (f" > {level2_name}" if (level2_name := getattr(m, 'level2_name', None)) else "") 
                for m in matched_metrics[:5]
             ])
         else:
             metrics_text = "无特定指标匹配"
 
-        domain_description = self.domain.description
-        database_schema_summary = self.domain.get_schema_description()
-        metric_structure = full_metrics_context if full_metrics_context else self.domain.get_metric_definitions_text()
+        metric_structure = full_metrics_context if full_metrics_context else self._metric_definitions_text
         
-        from .ambiguity_checker_prompt import DEFAULT_FILTER_CONDITIONS_GUIDANCE
-        from .ambiguity_checker_prompt import AMBIGUITY_CHECKER_PROMPT
-        
-        return AMBIGUITY_CHECKER_PROMPT.format(
-            domain_description=domain_description,
-            database_schema_summary=database_schema_summary,
+        # 域描述、Schema 摘要、筛选条件说明已在构建器初始化时预先填入模板
+        return self._ambiguity_template.render(
             metric_structure=metric_structure,
             matched_metrics=metrics_text,
             user_query=query,
             conversation_history=conversation_history or "无",
-            filter_conditions_guidance=DEFAULT_FILTER_CONDITIONS_GUIDANCE
         )
-    
+
+    def build_unified_analysis_prompt(
+        self,
+        query: str,
+        chat_history: str = "无",
+        full_metrics_context: Optional[str] = None,
+    ) -> str:
+        """
+        构建统一分析提示词 (意图分类 + 歧义检测 + 相关指标提取)
+
+        Args:
+            query: 用户查询
+            chat_history: 对话历史文本
+            full_metrics_context: 全量指标体系 JSON 文本 (来自 schema_cache.get_metrics_prompt_text())
+        """
+        return self._unified_template.render(
+            metric_structure=full_metrics_context or self._metric_definitions_text,
+            chat_history=chat_history or "无",
+            user_query=query
+        )
+
     # [已废弃] build_simple_sql_prompt() - Code-Based 模式下 METRIC_QUERY 
     # 直接使用 data_analyzer_prompt.py，不再需要此方法
 
+
+@cache
+def get_prompt_builder(domain_name: str = DEFAULT_DOMAIN_NAME) -> PromptBuilder:
+    """
+    获取已注册域的共享 PromptBuilder（每个域只构建一次）
+
+    PromptBuilder 只读取域配置并缓存静态文本，可在多个图/会话间共享。
+    """
+    domain = get_domain(domain_name)
+    if domain is None:
+        raise ValueError(f"未注册的域配置: {domain_name}")
+    return PromptBuilder(domain)
@@ -313,38 +313,40 @@ _PLAN_REVIEW_ADJUSTMENT_PROMPT = """你是数据分析规划师，用户对当
 ```
 """
 
+# 稳定内容（系统提示词、指标体系、Schema）在前，随请求变化的查询/计划/调整要求在后，
+# 便于推理服务按公共前缀复用 KV 缓存（与其它规划模板的段落顺序一致）
 _PLAN_REVIEW_ADJUSTMENT_TEMPLATE = """{system_prompt}
 
 ---
 
-## 用户原始查询
-{query}
+## 指标体系
+```json
+{metrics}
+```
 
 ---
 
-## 当前计划（需要调整）
+## 数据库 Schema
 ```json
-{original_plan}
+{schema}
 ```
 
 ---
 
-## 用户调整要求
-{adjustments}
+## 用户原始查询
+{query}
 
 ---
 
-## 指标体系
+## 当前计划（需要调整）
 ```json
-{metrics}
+{original_plan}
 ```
 
 ---
 
-## 数据库 Schema
-```json
-{schema}
-```
+## 用户调整要求
+{adjustments}
 
 ---
 
@@ -4,12 +4,18 @@ SQL 纠错提示词
 参考 WrenAI 的 SQL Correction 设计，用于在 SQL 执行失败后生成纠正的 SQL。
 """
 
+from functools import lru_cache
+
 from .sql_rules import get_sql_rules, get_sql_correction_rules, DatabaseType
+from .template import CompiledTemplate
 
 
+@lru_cache(maxsize=8)
 def get_sql_correction_system_prompt(database_type: DatabaseType = DatabaseType.MYSQL) -> str:
     """
     获取 SQL 纠错/反思的系统提示词 (ReAct 版)
+
+    输出只由数据库类型决定，每种类型只拼装一次。
     """
     sql_rules = get_sql_rules(database_type)
     correction_rules = get_sql_correction_rules()
@@ -65,6 +71,27 @@ SQL_CORRECTION_USER_PROMPT_TEMPLATE = """### DATABASE SCHEMA ###
 
 
 
+_SQL_CORRECTION_USER_TEMPLATE = CompiledTemplate(SQL_CORRECTION_USER_PROMPT_TEMPLATE)
+
+
+@lru_cache(maxsize=16)
+def make_correction_formatter(
+    schema: str,
+    metric_context: str = "",
+    instructions: str = "",
+) -> CompiledTemplate:
+    """
+    预填 Schema / 指标上下文 / 用户指令，返回只剩 user_query、invalid_sql、observation 的模板
+
+    同一查询的多轮纠错中这些部分不变（Schema 通常是最长的字段），只需拼接一次。
+    """
+    return _SQL_CORRECTION_USER_TEMPLATE.partial(
+        schema=schema,
+        metric_context=f"### 指标上下文 ###\n{metric_context}\n" if metric_context else "",
+        instructions=f"### USER INSTRUCTIONS ###\n{instructions}\n" if instructions else "",
+    )
+
+
 def build_sql_correction_prompt(
     user_query: str,
     invalid_sql: str,
@@ -76,15 +103,8 @@ def build_sql_correction_prompt(
     """
     构建 SQL 纠错/反思提示词
     """
-    # 格式化可选部分
-    _metric_context = f"### 指标上下文 ###\n{metric_context}\n" if metric_context else ""
-    _instructions = f"### USER INSTRUCTIONS ###\n{instructions}\n" if instructions else ""
-    
-    return SQL_CORRECTION_USER_PROMPT_TEMPLATE.format(
+    return make_correction_formatter(schema, metric_context, instructions).render(
         user_query=user_query,
-        schema=schema,
-        metric_context=_metric_context,
-        instructions=_instructions,
         invalid_sql=invalid_sql,
         observation=observation,
     )
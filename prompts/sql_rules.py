@@ -5,6 +5,7 @@ SQL 规则库
 支持不同数据库类型的特定规则。
 """
 
+import re
 from typing import List
 from enum import Enum
 
@@ -111,6 +112,15 @@ SQLITE_SPECIFIC_RULES = """
 """
 
 
+# 各数据库的完整规则文本（规则为静态常量，导入时拼接一次）
+_RULES_BY_DB = {
+    DatabaseType.MYSQL: f"{COMMON_SQL_RULES}\n\n{MYSQL_SPECIFIC_RULES}",
+    DatabaseType.POSTGRESQL: f"{COMMON_SQL_RULES}\n\n{POSTGRESQL_SPECIFIC_RULES}",
+    DatabaseType.SQLITE: f"{COMMON_SQL_RULES}\n\n{SQLITE_SPECIFIC_RULES}",
+    DatabaseType.GENERIC: COMMON_SQL_RULES,
+}
+
+
 def get_sql_rules(database_type: DatabaseType = DatabaseType.GENERIC) -> str:
     """
     获取完整的 SQL 规则
@@ -121,16 +131,7 @@ def get_sql_rules(database_type: DatabaseType = DatabaseType.GENERIC) -> str:
     Returns:
         完整的 SQL 规则文本
     """
-    rules = [COMMON_SQL_RULES]
-    
-    if database_type == DatabaseType.MYSQL:
-        rules.append(MYSQL_SPECIFIC_RULES)
-    elif database_type == DatabaseType.POSTGRESQL:
-        rules.append(POSTGRESQL_SPECIFIC_RULES)
-    elif database_type == DatabaseType.SQLITE:
-        rules.append(SQLITE_SPECIFIC_RULES)
-    
-    return "\n\n".join(rules)
+    return _RULES_BY_DB.get(database_type, COMMON_SQL_RULES)
 
 
 def get_sql_correction_rules() -> str:
@@ -160,25 +161,31 @@ FORBIDDEN_KEYWORDS = [
 ]
 
 
-def is_safe_sql(sql: str) -> bool:
+# 安全检查正则：只允许 SELECT / WITH 开头；禁止关键字按词边界匹配，避免误杀 updated_at 等字段名
+_SELECT_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+_FORBIDDEN_RE = re.compile(r"\b(?:" + "|".join(FORBIDDEN_KEYWORDS) + r")\b", re.IGNORECASE)
+
+# 指标循环物化中间结果时额外允许 CREATE [TEMPORARY] TABLE 开头（其余禁止关键字不变）
+_SELECT_OR_CREATE_TABLE_RE = re.compile(
+    r"^\s*(?:SELECT|WITH|CREATE\s+(?:TEMPORARY\s+)?TABLE)\b", re.IGNORECASE
+)
+_FORBIDDEN_EXCEPT_CREATE_RE = re.compile(
+    r"\b(?:" + "|".join(k for k in FORBIDDEN_KEYWORDS if k != "CREATE") + r")\b", re.IGNORECASE
+)
+
+
+def is_safe_sql(sql: str, allow_create_table: bool = False) -> bool:
     """
     检查 SQL 是否安全（只允许 SELECT）
     
     Args:
         sql: SQL 语句
+        allow_create_table: 是否允许 CREATE [TEMPORARY] TABLE（指标循环物化临时表）
         
     Returns:
         是否安全
     """
-    sql_upper = sql.upper().strip()
-    
-    # 必须是 SELECT 语句
-    if not sql_upper.startswith("SELECT"):
-        return False
-    
-    # 不能包含禁止的关键词
-    for keyword in FORBIDDEN_KEYWORDS:
-        if keyword in sql_upper:
-            return False
-    
-    return True
+    # 单次预编译正则扫描，不再整串 upper() 复制 + 逐关键字子串查找
+    if allow_create_table:
+        return bool(_SELECT_OR_CREATE_TABLE_RE.match(sql)) and _FORBIDDEN_EXCEPT_CREATE_RE.search(sql) is None
+    return bool(_SELECT_RE.match(sql)) and _FORBIDDEN_RE.search(sql) is None
@@ -6,11 +6,12 @@ SQL 示例查询库
 
 from typing import List, Dict, Any
 from dataclasses import dataclass
-import json
 import os
 
+from tools.json_utils import loads
 
-@dataclass
+
+@dataclass(slots=True)
 class SQLSample:
     """SQL 示例"""
     question: str     # 用户问题
@@ -23,6 +24,8 @@ class SQLSampleLibrary:
     
     def __init__(self):
         self.samples: List[SQLSample] = []
+        # limit -> 渲染好的提示词文本；示例变化时清空
+        self._prompt_cache: Dict[int, str] = {}
     
     def add_sample(self, question: str, sql: str, description: str = ""):
         """添加一个示例"""
@@ -31,6 +34,7 @@ class SQLSampleLibrary:
             sql=sql,
             description=description
         ))
+        self._prompt_cache.clear()
     
     def get_samples(self, limit: int = None) -> List[SQLSample]:
         """获取示例列表"""
@@ -43,8 +47,8 @@ class SQLSampleLibrary:
         if not os.path.exists(file_path):
             return
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = loads(f.read())
         
         for item in data:
             self.add_sample(
@@ -63,21 +67,22 @@ class SQLSampleLibrary:
         Returns:
             格式化的示例文本
         """
-        samples = self.get_samples(limit)
-        if not samples:
-            return ""
-        
-        result = []
-        for i, sample in enumerate(samples, 1):
-            result.append(f"**示例 {i}:**")
-            result.append(f"Question: {sample.question}")
-            result.append(f"SQL:")
-            result.append(f"```sql\n{sample.sql}\n```")
-            if sample.description:
-                result.append(f"说明: {sample.description}")
-            result.append("")  # 空行分隔
-        
-        return "\n".join(result)
+        # 示例库加载后基本不变，同一 limit 只渲染一次
+        key = limit or 0
+        text = self._prompt_cache.get(key)
+        if text is None:
+            text = self._prompt_cache[key] = self._render_prompt(self.get_samples(limit))
+        return text
+
+    @staticmethod
+    def _render_prompt(samples: List[SQLSample]) -> str:
+        """渲染示例文本（每个示例后留一个空行分隔）"""
+        return "".join(
+            f"**示例 {i}:**\nQuestion: {sample.question}\nSQL:\n```sql\n{sample.sql}\n```\n"
+            + (f"说明: {sample.description}\n" if sample.description else "")
+            + ("\n" if i < len(samples) else "")
+            for i, sample in enumerate(samples, 1)
+        )
 
 
 # 教育指标领域的默认示例
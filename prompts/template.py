@@ -0,0 +1,64 @@
+"""
+提示词模板预编译
+
+str.format 每次调用都要重新解析整段模板（数 KB 的提示词尤其明显）。
+CompiledTemplate 在导入时用 string.Formatter 解析一次，
+渲染时只做字段替换和一次 join，输出与 template.format(**kwargs) 完全一致。
+"""
+from string import Formatter
+from typing import List, Optional, Tuple
+
+_FORMATTER = Formatter()
+
+
+class CompiledTemplate:
+    """预解析的 str.format 模板（仅支持简单的 {name} 字段）"""
+
+    def __init__(self, template: str):
+        self.template = template
+        parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field_name, format_spec, conversion in _FORMATTER.parse(template):
+            if field_name is not None and (format_spec or conversion or not field_name.isidentifier()):
+                raise ValueError(f"CompiledTemplate 仅支持简单字段, 不支持: {{{field_name}}}")
+            parts.append((literal, field_name))
+        self._parts = tuple(parts)
+        self.field_names = frozenset(name for _, name in parts if name is not None)
+
+    @classmethod
+    def _from_parts(cls, template: str, parts: List[Tuple[str, Optional[str]]]) -> "CompiledTemplate":
+        compiled = cls.__new__(cls)
+        compiled.template = template
+        compiled._parts = tuple(parts)
+        compiled.field_names = frozenset(name for _, name in parts if name is not None)
+        return compiled
+
+    def partial(self, **kwargs: object) -> "CompiledTemplate":
+        """
+        预先填入部分字段（如域描述等静态内容），返回只含剩余字段的新模板
+
+        已填入的值并入相邻的字面量片段，渲染时不再逐段拼接。
+        """
+        parts: List[Tuple[str, Optional[str]]] = []
+        pending = ""
+        for literal, field_name in self._parts:
+            pending += literal
+            if field_name is None:
+                continue
+            if field_name in kwargs:
+                pending += str(kwargs[field_name])
+            else:
+                parts.append((pending, field_name))
+                pending = ""
+        if pending:
+            parts.append((pending, None))
+        return self._from_parts(self.template, parts)
+
+    def render(self, **kwargs: object) -> str:
+        """等价于 template.format(**kwargs)，缺少字段时抛出 KeyError"""
+        chunks: List[str] = []
+        for literal, field_name in self._parts:
+            if literal:
+                chunks.append(literal)
+            if field_name is not None:
+                chunks.append(str(kwargs[field_name]))
+        return "".join(chunks)
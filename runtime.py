@@ -1,22 +1,72 @@
 """
 Shared LLM/embedding factory functions for API and CLI.
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Any
 
 from config import config
 
+# 进程级共享的 HTTP 连接池（所有 LLM 客户端复用 keep-alive 连接）
+_llm_http_clients: tuple[Any, Any] | None = None
+_llm_http_clients_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  # pyright: ignore[reportMissingImports, reportUnusedImport]
+    except ImportError:
+        return False
+    return True
+
+
+def get_llm_http_clients() -> tuple[Any, Any]:
+    """
+    获取共享的 (httpx.Client, httpx.AsyncClient)
+
+    复用 keep-alive 连接，省去每次 LLM 调用的 TCP/TLS 握手；
+    安装了 h2 时启用 HTTP/2 多路复用；建连失败时自动重试 2 次。
+    初始化加锁：API 在多个线程中并发首次调用时只创建一组连接池。
+    """
+    global _llm_http_clients
+    if _llm_http_clients is not None:
+        return _llm_http_clients
+    with _llm_http_clients_lock:
+        if _llm_http_clients is not None:
+            return _llm_http_clients
+        import httpx
+
+        limits = httpx.Limits(max_keepalive_connections=16, max_connections=64)
+        timeout = httpx.Timeout(config.llm.timeout)
+        http2 = _http2_available()
+        _llm_http_clients = (
+            httpx.Client(
+                transport=httpx.HTTPTransport(http2=http2, limits=limits, retries=2),
+                timeout=timeout,
+            ),
+            httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(http2=http2, limits=limits, retries=2),
+                timeout=timeout,
+            ),
+        )
+    return _llm_http_clients
+
 
 def create_llm_client():
     """创建 LLM 客户端"""
     try:
         from langchain_openai import ChatOpenAI  # pyright: ignore[reportMissingImports]
 
+        http_client, http_async_client = get_llm_http_clients()
         return ChatOpenAI(
             base_url=config.llm.api_base,
             api_key=config.llm.api_key,
             model=config.llm.model_name,
             temperature=config.llm.temperature,
-            max_tokens=config.llm.max_tokens
+            max_tokens=config.llm.max_tokens,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
     except ImportError:
         print("警告: langchain_openai 未安装，使用简易 LLM 客户端")
@@ -30,33 +80,69 @@ def create_embedding_client():
 
 
 class OllamaEmbeddingClient:
-    """Ollama Embedding 客户端"""
+    """Ollama Embedding 客户端（相同文本的嵌入向量按 LRU 缓存）"""
 
     def __init__(self):
-        import requests
-        self.base_url = config.embedding.api_base.rstrip('/v1').rstrip('/')
+        self.base_url = config.embedding.api_base.rstrip('/').removesuffix('/v1')
         self.model = config.embedding.model_name
-        self.session = requests.Session()
+        self.url = f"{self.base_url}/api/embeddings"
+        self.batch_url = f"{self.base_url}/api/embed"
+        # 复用进程级共享的 httpx 连接池（keep-alive，安装 h2 时为 HTTP/2）
+        self.http_client, _ = get_llm_http_clients()
+        # 澄清多轮中同一问题会被重复嵌入；只缓存成功结果（失败时抛异常，不进入缓存）
+        self._embed_cached = lru_cache(maxsize=1024)(self._embed)
+
+    def _embed(self, text: str) -> tuple[Any, ...]:
+        response = self.http_client.post(
+            self.url,
+            json={"model": self.model, "prompt": text},
+            timeout=30,
+        )
+        response.raise_for_status()
+        embedding = response.json().get("embedding")
+        if not embedding:
+            raise ValueError("Ollama 返回了空的嵌入向量")
+        return tuple(embedding)
 
     def embed_query(self, text: str) -> list[Any]:
         """生成文本嵌入向量"""
-        import requests
-
-        url = f"http://localhost:11434/api/embeddings"
-        payload = {
-            "model": self.model,
-            "prompt": text
-        }
-
         try:
-            response = self.session.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            return result.get("embedding", [])
+            return list(self._embed_cached(text))
         except Exception as e:
             print(f"Embedding 生成失败: {e}")
             return []
 
+    def _embed_batch(self, texts: list[str]) -> list[list[Any]]:
+        """一次请求生成多段文本的嵌入向量（Ollama /api/embed 批量接口）"""
+        response = self.http_client.post(
+            self.batch_url,
+            json={"model": self.model, "input": texts},
+            timeout=120,
+        )
+        response.raise_for_status()
+        embeddings = response.json().get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            raise ValueError("Ollama 批量接口返回的嵌入向量数量与输入不一致")
+        return embeddings
+
+    def embed_documents(self, texts: list[str], batch_size: int = 64, max_workers: int = 8) -> list[list[Any]]:
+        """
+        生成多段文本的嵌入向量（顺序与输入一致）
+
+        优先按 batch_size 分批调用批量接口；服务端不支持（旧版 Ollama）时退回并发逐条请求。
+        """
+        try:
+            embeddings: list[list[Any]] = []
+            for start in range(0, len(texts), batch_size):
+                embeddings.extend(self._embed_batch(texts[start:start + batch_size]))
+            return embeddings
+        except Exception as e:
+            print(f"批量 Embedding 失败，改为逐条请求: {e}")
+        if len(texts) <= 1:
+            return [self.embed_query(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as executor:
+            return list(executor.map(self.embed_query, texts))
+
 
 class SimpleLLMClient:
     """简易 LLM 客户端（用于测试）"""
@@ -2,6 +2,8 @@
 Shared runtime/bootstrap helpers for CLI and API entrypoints.
 """
 
+from functools import lru_cache
+
 from graph import create_graph
 from runtime import create_embedding_client, create_llm_client
 
@@ -13,6 +15,17 @@ def create_runtime_clients(llm_client=None, embedding_client=None):
     return resolved_llm_client, resolved_embedding_client
 
 
+@lru_cache(maxsize=1)
+def get_shared_runtime_clients():
+    """
+    Process-wide default (llm_client, embedding_client).
+
+    Both clients are stateless and reuse pooled HTTP connections, so API
+    sessions share one pair instead of constructing new clients per session.
+    """
+    return create_runtime_clients()
+
+
 def create_runtime_graph(
     llm_client=None,
     embedding_client=None,
@@ -34,3 +47,32 @@ def create_runtime_graph(
     )
 
     return graph, resolved_llm_client, resolved_embedding_client
+
+
+def get_shared_runtime_graph():
+    """
+    Process-wide compiled graph built from the shared default clients.
+
+    One compiled graph serves every API session; conversations are kept
+    apart by the checkpointer thread_id passed in each run config.
+
+    The graph topology depends on the UNIFIED_ANALYSIS feature flag, so flags
+    are refreshed first and one graph is kept per flag value. Existing sessions
+    keep the graph they were created with.
+    """
+    from config import config
+
+    config.refresh_feature_flags()
+    return _build_shared_runtime_graph(config.unified_analysis)
+
+
+@lru_cache(maxsize=2)
+def _build_shared_runtime_graph(unified_analysis: bool):
+    """Build the shared graph for one feature-flag combination (the key only selects the cache slot)."""
+    llm_client, embedding_client = get_shared_runtime_clients()
+    graph, _, _ = create_runtime_graph(
+        llm_client,
+        embedding_client,
+        enable_embedding_in_graph=True,
+    )
+    return graph
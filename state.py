@@ -23,7 +23,7 @@ class IntentType(str, Enum):
     SIMPLE_QUERY = "value_query"            # 别名，保持兼容
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MetricInfo:
     """指标信息"""
     level1_name: str                  # 一级指标名称
@@ -100,6 +100,8 @@ class AgentState(TypedDict, total=False):
     correction_attempted: bool        # 是否尝试过纠错
     correction_count: int             # 纠错次数
     max_correction_attempts: int      # 最大纠错次数（默认2次）
+    corrected_from_sql: str | None    # 本次纠错前的 SQL（纠错后执行成功时写入纠错记忆）
+    correction_error: str | None      # 纠错前 SQL 的执行观测（错误信息或空结果）
     
     # 查询规划相关 (Query Planner)
     query_plan: dict[str, object]        # 结构化查询计划 (JSON)
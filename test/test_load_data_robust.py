@@ -58,7 +58,7 @@ def test_load_data():
                  # 随便找个表测试
                  table_name = df_tables.iloc[0,0]
                  sql = f"SELECT * FROM {table_name} LIMIT 1"
-        except:
+        except Exception:
              pass
 
         print(f"Executing SQL: {sql}")
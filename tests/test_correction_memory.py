@@ -0,0 +1,47 @@
+"""
+测试纠错记忆的 SQL 骨架与记录/检索
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from tools.correction_memory import CorrectionMemory, format_correction_exemplars, sql_skeleton
+
+
+def test_skeleton_ignores_literals_whitespace_and_case():
+    a = "SELECT name FROM schools WHERE district = '海淀区' AND year = 2023;"
+    b = "select name  from schools\nwhere district = 'O''Brien' and year = 2024"
+    assert sql_skeleton(a) == sql_skeleton(b)
+    assert sql_skeleton(a) != sql_skeleton("SELECT name FROM schools WHERE city = '北京'")
+    # 标识符中的数字不是字面量
+    assert sql_skeleton("SELECT col1 FROM t") != sql_skeleton("SELECT col2 FROM t")
+
+
+def test_record_and_retrieve_by_skeleton(tmp_path):
+    memory = CorrectionMemory(str(tmp_path / "corrections.sqlite3"), max_per_skeleton=2)
+    bad = "SELECT * FROM schools WHERE district = '海淀'"
+    for i in range(3):
+        memory.record(f"问题{i}", bad, f"SELECT * FROM schools WHERE district LIKE '%海淀%' -- {i}", "0 rows")
+    # 纠错前后相同的 SQL 不记录
+    memory.record("问题", bad, bad)
+
+    exemplars = memory.retrieve("SELECT * FROM schools WHERE district = '朝阳'", k=3)
+    assert [item["question"] for item in exemplars] == ["问题2", "问题1"]
+    assert memory.retrieve("SELECT 1") == []
+
+    text = format_correction_exemplars(exemplars)
+    assert "参考 1" in text and "LIKE '%海淀%' -- 2" in text
+    assert format_correction_exemplars([]) == ""
+
+
+def test_unwritable_cache_dir_does_not_raise(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    memory = CorrectionMemory(str(blocker / "corrections.sqlite3"))
+
+    memory.record("q", "SELECT 1", "SELECT 2", "empty")
+    assert memory.retrieve("SELECT 1") == []
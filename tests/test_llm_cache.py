@@ -0,0 +1,105 @@
+"""
+测试 LLM 响应缓存
+"""
+import json
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from agents.query_planner import create_query_planner
+from state import IntentType
+from tools.llm_cache import (
+    LLMResponseCache,
+    PersistentResponseCache,
+    TieredResponseCache,
+    cached_invoke,
+    make_query_key,
+)
+
+
+class FakeResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class CountingLLM:
+    def __init__(self, responses: list[str]):
+        self.responses = responses
+        self.calls = 0
+
+    def invoke(self, prompt: str) -> FakeResponse:
+        _ = prompt
+        text = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        return FakeResponse(text)
+
+
+def test_cached_invoke_reuses_parsed_result():
+    """相同 prompt 第二次调用不访问 LLM，且返回副本"""
+    cache = LLMResponseCache()
+    llm = CountingLLM(['{"intent_type": "value_query"}'])
+    first = cached_invoke(cache, "intent", llm, "p", json.loads)
+    first["intent_type"] = "mutated"
+    second = cached_invoke(cache, "intent", llm, "p", json.loads)
+
+    assert llm.calls == 1
+    assert second == {"intent_type": "value_query"}
+
+
+def test_cache_is_bounded():
+    """超过容量时淘汰最久未使用的条目"""
+    cache = LLMResponseCache(max_entries=2)
+    for prompt in ("a", "b", "c"):
+        cache.put("n", prompt, prompt)
+    assert len(cache) == 2
+
+
+def test_query_planner_does_not_cache_invalid_plan():
+    """校验失败的计划不进入缓存，下次请求仍会重新调用 LLM"""
+    cache = LLMResponseCache()
+    llm = CountingLLM(["not json"])
+    planner = create_query_planner(llm, cache)
+    state = {"user_query": "各校学生人数", "intent_type": IntentType.VALUE_QUERY}
+
+    first = planner(state)
+    assert first.get("planning_error")
+    assert llm.calls == 2
+
+    llm.responses = ['{"reasoning_steps": ["统计学生人数"], "target_fields": ["student.id"]}']
+    _ = planner(state)
+    assert llm.calls == 3
+    _ = planner(state)
+    assert llm.calls == 3
+
+
+def test_persistent_cache_roundtrip(tmp_path):
+    """持久化缓存跨实例可读，问题规范化后空白/大小写差异不影响命中"""
+    db_path = str(tmp_path / "cache" / "definitions.sqlite3")
+    key = make_query_key("  什么是 网络   指标? ", 1.0)
+    assert key == make_query_key("什么是 网络 指标?", 1.0)
+    assert key != make_query_key("什么是 网络 指标?", 2.0)
+
+    PersistentResponseCache(db_path).put(key, "网络指标定义")
+    assert PersistentResponseCache(db_path).get(key) == "网络指标定义"
+
+
+def test_sql_generator_reuses_tiered_cache(tmp_path):
+    """temperature == 0 时相同 prompt 只调用一次模型；L2 在新进程 (新 L1) 中仍可命中"""
+    from agents.sql_generator import create_sql_generator
+
+    db_path = str(tmp_path / "sql.sqlite3")
+    llm = CountingLLM(["```sql\nSELECT 1;\n```"])
+    llm.model_name, llm.temperature = "fake", 0.0
+    state = {"assembled_prompt": "### 用户查询\n学校数量"}
+
+    node = create_sql_generator(llm, TieredResponseCache(LLMResponseCache(), PersistentResponseCache(db_path)))
+    assert node(state)["generated_sql"] == "SELECT 1;"
+    assert node(state)["generated_sql"] == "SELECT 1;"
+
+    restarted = create_sql_generator(llm, TieredResponseCache(LLMResponseCache(), PersistentResponseCache(db_path)))
+    assert restarted(state)["generated_sql"] == "SELECT 1;"
+    assert llm.calls == 1
@@ -0,0 +1,53 @@
+"""
+测试 LLM 响应 JSON 提取
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from tools.llm_json import extract_first_json_array, extract_first_json_model, extract_first_json_obj
+
+
+def test_extracts_first_of_multiple_objects():
+    """多个 JSON 块时返回第一个，而不是截出跨块的非法片段"""
+    text = '结果: {"intent_type": "value_query"} 备注: {"x": 1}'
+    assert extract_first_json_obj(text) == {"intent_type": "value_query"}
+
+
+def test_skips_braces_in_prose_and_strings():
+    """跳过说明文字中的括号，字符串内部的括号不影响配对"""
+    text = '使用 {table} 占位符。\n```json\n{"sql": "SELECT \'}\' AS a", "reflection": "ok"}\n```'
+    assert extract_first_json_obj(text) == {"sql": "SELECT '}' AS a", "reflection": "ok"}
+
+
+def test_returns_none_without_json():
+    assert extract_first_json_obj("你好") is None
+    assert extract_first_json_obj('{"unterminated": ') is None
+
+
+def test_extracts_array():
+    text = '[注意] 输出如下:\n[{"一级指标": "基础设施", "二级指标": "网络"}]'
+    assert extract_first_json_array(text) == [{"一级指标": "基础设施", "二级指标": "网络"}]
+
+
+def test_handles_escaped_quotes_and_backslashes():
+    """转义的引号和反斜杠不会打乱字符串边界"""
+    text = r'{"reflection": "列名 \"a}\" 结尾是 \\", "sql": "SELECT 1"} 其他'
+    assert extract_first_json_obj(text) == {"reflection": '列名 "a}" 结尾是 \\', "sql": "SELECT 1"}
+
+
+def test_model_extraction_skips_candidates_failing_validation():
+    """字段类型不符的片段被拒绝，继续尝试后续候选"""
+    from pydantic import BaseModel
+
+    class _Flag(BaseModel):
+        ambiguity_detected: bool = False
+
+    text = '示例 {"ambiguity_detected": [1]} 实际 {"ambiguity_detected": true}'
+    result = extract_first_json_model(text, _Flag)
+    assert result is not None and result.ambiguity_detected is True
+    assert extract_first_json_model("无 JSON", _Flag) is None
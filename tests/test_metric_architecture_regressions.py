@@ -2,12 +2,15 @@ import sys
 from pathlib import Path
 from typing import cast
 
+import pytest
+
 
 TESTS_ROOT = Path(__file__).resolve().parents[1]
 if str(TESTS_ROOT) not in sys.path:
     sys.path.insert(0, str(TESTS_ROOT))
 
 from agents.metric_loop_planner import create_metric_loop_planner
+from graph import MetricDBManagerRegistry, _run_key, release_metric_run
 from state import AgentState
 def test_metric_log_contract_persists_final_result_static() -> None:
     logger_path = TESTS_ROOT / "tools" / "logger.py"
@@ -50,3 +53,81 @@ def test_metric_loop_planner_selects_next_runnable_step_by_depends_on() -> None:
     decision = cast(dict[str, object], result["loop_decision"])
     assert decision["decision"] == "continue"
     assert decision["next_step_id"] == "s2"
+
+
+class _FakeCursor:
+    def __init__(self, connection: "_FakeConnection") -> None:
+        self.connection = connection
+
+    def execute(self, operation: str) -> None:
+        if self.connection.closed:
+            raise RuntimeError("connection closed")
+        self.connection.executed.append(operation)
+
+    def close(self) -> None:
+        pass
+
+
+class _FakeConnection:
+    def __init__(self) -> None:
+        self.executed: list[str] = []
+        self.closed = False
+
+    def cursor(self) -> _FakeCursor:
+        return _FakeCursor(self)
+
+    def commit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_interleaved_metric_runs_do_not_drop_each_others_tables() -> None:
+    registry = MetricDBManagerRegistry(db_config=None)
+    run_a = _run_key({"configurable": {"thread_id": "session-a:t1"}})
+    run_b = _run_key({"configurable": {"thread_id": "session-b:t1"}})
+
+    manager_a = registry.acquire(run_a)
+    manager_b = registry.acquire(run_b)
+    assert manager_a is not manager_b
+    assert registry.acquire(run_a) is manager_a
+
+    manager_a._connection = conn_a = _FakeConnection()
+    manager_b._connection = conn_b = _FakeConnection()
+    manager_a.register_table("_metric_step_a1")
+    manager_b.register_table("_metric_step_b1")
+    manager_a.register_table("_metric_step_a2")
+
+    # A 先结束：只删除 A 的表，B 的连接仍可继续使用
+    registry.release(run_a)
+    assert conn_a.closed
+    assert conn_a.executed == [
+        "DROP TABLE IF EXISTS `_metric_step_a1`",
+        "DROP TABLE IF EXISTS `_metric_step_a2`",
+    ]
+    assert not conn_b.closed
+    assert conn_b.executed == []
+    assert len(registry) == 1
+
+    registry.release(run_b)
+    assert conn_b.executed == ["DROP TABLE IF EXISTS `_metric_step_b1`"]
+    assert len(registry) == 0
+
+
+def test_abandoned_metric_run_is_released_through_graph_and_thread_id_is_required() -> None:
+    class _Graph:
+        metric_db_managers = MetricDBManagerRegistry(db_config=None)
+
+    manager = _Graph.metric_db_managers.acquire("session-a:t1")
+    manager._connection = conn = _FakeConnection()
+    manager.register_table("_metric_step_a1")
+
+    # 例如停在计划审核后会话被清理：按 thread_id 释放
+    release_metric_run(_Graph(), "session-a:t1")
+    assert conn.closed
+    assert len(_Graph.metric_db_managers) == 0
+    release_metric_run(object(), "session-a:t1")  # 没有管理器的图直接忽略
+
+    with pytest.raises(ValueError):
+        _run_key({"configurable": {}})
@@ -0,0 +1,66 @@
+"""
+测试 MySQL 连接池的借出/归还/丢弃语义
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from tools.mysql_pool import MySQLConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+
+    def ping(self, reconnect=True):
+        self.pings += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_is_reused_after_release():
+    created = []
+    pool = MySQLConnectionPool(lambda: created.append(FakeConnection()) or created[-1])
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(created) == 1
+    assert second.pings == 1
+
+
+def test_failed_connection_is_discarded():
+    created = []
+    pool = MySQLConnectionPool(lambda: created.append(FakeConnection()) or created[-1])
+
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError("boom")
+    with pool.connection() as conn:
+        pass
+
+    assert created[0].closed
+    assert conn is created[1]
+
+
+def test_exhausted_pool_times_out():
+    pool = MySQLConnectionPool(FakeConnection, max_connections=1, timeout=0.01)
+
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
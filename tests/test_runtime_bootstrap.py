@@ -0,0 +1,32 @@
+"""
+测试进程级共享图随功能开关重建
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+import runtime_bootstrap
+from config import config
+
+
+def test_shared_graph_follows_unified_analysis_flag(monkeypatch):
+    monkeypatch.setattr(runtime_bootstrap, "get_shared_runtime_clients", lambda: (object(), None))
+    runtime_bootstrap._build_shared_runtime_graph.cache_clear()
+    try:
+        monkeypatch.setenv("UNIFIED_ANALYSIS", "false")
+        default_graph = runtime_bootstrap.get_shared_runtime_graph()
+        assert runtime_bootstrap.get_shared_runtime_graph() is default_graph
+        assert "unified_analyzer" not in default_graph.nodes
+
+        monkeypatch.setenv("UNIFIED_ANALYSIS", "true")
+        unified_graph = runtime_bootstrap.get_shared_runtime_graph()
+        assert "unified_analyzer" in unified_graph.nodes
+    finally:
+        # 还原全局配置中的开关，避免影响其他测试
+        monkeypatch.delenv("UNIFIED_ANALYSIS")
+        config.refresh_feature_flags()
+        runtime_bootstrap._build_shared_runtime_graph.cache_clear()
@@ -0,0 +1,49 @@
+"""
+测试 Schema/指标体系缓存
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from config import config
+from tools import schema_cache
+
+
+def _write_json(path: Path, data, mtime: float) -> None:
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_metrics_text_cached_and_reloaded_on_mtime_change(tmp_path, monkeypatch):
+    """文件未变化时复用缓存文本，mtime 变化后自动重新加载"""
+    metrics_file = tmp_path / "metrics.json"
+    _write_json(metrics_file, {"资源": {"一级指标解释": "旧"}}, 1_000_000)
+    monkeypatch.setattr(config.paths, "metrics_path", str(metrics_file))
+    schema_cache.invalidate_cache()
+
+    first = schema_cache.get_metrics_text()
+    assert "旧" in first
+    assert schema_cache.get_metrics_text() is first
+
+    _write_json(metrics_file, {"资源": {"一级指标解释": "新"}}, 2_000_000)
+    assert "新" in schema_cache.get_metrics_text()
+    assert "新" in schema_cache.get_metrics_summary()
+    schema_cache.invalidate_cache()
+
+
+def test_corrupt_json_returns_empty(tmp_path, monkeypatch):
+    """损坏的 JSON 文件返回空 dict 而不是抛异常"""
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text("{not json", encoding="utf-8")
+    monkeypatch.setattr(config.paths, "schema_path", str(schema_file))
+    schema_cache.invalidate_cache()
+
+    assert schema_cache.get_schema() == {}
+    assert schema_cache.get_schema_text() == "{}"
+    schema_cache.invalidate_cache()
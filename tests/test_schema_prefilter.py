@@ -0,0 +1,35 @@
+"""
+测试规划器 Schema 表级预筛选
+"""
+import json
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from tools.schema_prefilter import prefilter_schema_text
+
+_SCHEMA = {
+    "schools": {"description": "学校基本信息表", "fields": [{"name": "school_name"}, {"name": "district"}]},
+    "teachers": {"description": "教师信息表", "fields": [{"name": "teacher_name"}, {"name": "title"}]},
+    "devices": {"description": "终端设备台账", "fields": [{"name": "device_type"}]},
+    "budgets": {"description": "经费预算", "fields": [{"name": "amount"}]},
+}
+_SCHEMA_TEXT = json.dumps(_SCHEMA, ensure_ascii=False)
+
+
+def test_prefilter_keeps_only_matching_tables_in_schema_order():
+    filtered = json.loads(prefilter_schema_text(_SCHEMA_TEXT, "各学校的教师数量", max_tables=2))
+    assert list(filtered) == ["schools", "teachers"]
+
+
+def test_prefilter_returns_original_text_when_not_applicable():
+    assert prefilter_schema_text(_SCHEMA_TEXT, "各学校的教师数量", max_tables=0) == _SCHEMA_TEXT
+    assert prefilter_schema_text(_SCHEMA_TEXT, "学校", max_tables=4) == _SCHEMA_TEXT
+    # 没有任何表命中时保留完整 Schema
+    assert prefilter_schema_text(_SCHEMA_TEXT, "你好", max_tables=2) == _SCHEMA_TEXT
+    # 非 JSON 格式（如 MySQL 文本 Schema）原样返回
+    assert prefilter_schema_text("Table: schools", "学校", max_tables=1) == "Table: schools"
@@ -0,0 +1,53 @@
+"""
+测试会话存储的容量淘汰与空闲超时淘汰
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from tools.session_store import SessionStore
+
+
+def test_evicts_least_recently_used_when_full():
+    evicted = []
+    store = SessionStore(max_entries=2, ttl_seconds=60, on_evict=evicted.append)
+    store["a"] = "A"
+    store["b"] = "B"
+    _ = store["a"]  # 访问后 a 变为最近使用
+    store["c"] = "C"
+
+    assert "b" not in store
+    assert store.keys() == ["a", "c"]
+    assert evicted == ["B"]
+
+
+def test_evicts_idle_sessions_on_insert():
+    evicted = []
+    store = SessionStore(max_entries=10, ttl_seconds=0, on_evict=evicted.append)
+    store["a"] = "A"
+    store["b"] = "B"
+
+    assert "a" not in store
+    assert evicted == ["A"]
+    assert store.pop("missing") is None
+
+
+def test_busy_sessions_are_not_evicted_until_idle():
+    evicted = []
+    busy = {"A"}
+    store = SessionStore(max_entries=1, ttl_seconds=60, on_evict=evicted.append, is_busy=busy.__contains__)
+    store["a"] = "A"
+    store["b"] = "B"
+
+    # a 仍在运行、b 刚写入：都不淘汰，暂时超出容量
+    assert store.keys() == ["a", "b"]
+    assert evicted == []
+
+    busy.clear()
+    store["c"] = "C"
+    assert store.keys() == ["c"]
+    assert evicted == ["A", "B"]
@@ -10,10 +10,13 @@ if str(TESTS_ROOT) not in sys.path:
 
 from agents.sql_corrector import (
     create_sql_corrector,
+    _extract_metric_context_from_prompt,  # pyright: ignore[reportPrivateUsage]
     _extract_reflection_and_sql,  # pyright: ignore[reportPrivateUsage]
+    _extract_schema_from_prompt,  # pyright: ignore[reportPrivateUsage]
 )
 from prompts.sql_rules import DatabaseType
 from state import AgentState
+from tools.correction_memory import CorrectionMemory
 
 
 class _FakeLLM:
@@ -64,3 +67,46 @@ def test_sql_corrector_rejects_non_sql_response() -> None:
     result = corrector(state)
     assert result.get("generated_sql") == ""
     assert "未提取到可执行SQL" in str(result.get("execution_error", ""))
+
+
+def test_extract_prompt_sections_ignores_headers_inside_code_fence() -> None:
+    prompt = (
+        "### 数据库 Schema\n```json\n{}\n```\n\n"
+        "### 完整指标体系 ###\n```json\n### 基础设施\n网络\n```\n\n"
+        "### 用户查询\n查询网络覆盖率\n"
+    )
+    assert _extract_schema_from_prompt(prompt).startswith("### 数据库 Schema")
+    metric_context = _extract_metric_context_from_prompt(prompt)
+    assert "### 基础设施\n网络" in metric_context
+    assert "用户查询" not in metric_context
+
+
+def test_sql_corrector_uses_correction_memory_exemplars(tmp_path) -> None:
+    memory = CorrectionMemory(str(tmp_path / "corrections.sqlite3"))
+    memory.record("海淀有几所学校", "SELECT COUNT(*) FROM schools WHERE district = '海淀'",
+                  "SELECT COUNT(*) FROM schools WHERE district = '海淀区'", "0 rows")
+    prompts: list[str] = []
+
+    class _RecordingLLM(_FakeLLM):
+        def invoke(self, prompt: str):
+            prompts.append(prompt)
+            return super().invoke(prompt)
+
+    llm = _RecordingLLM('{"reflection":"区名不完整","sql":"SELECT COUNT(*) FROM schools WHERE district = \'朝阳区\'"}')
+    corrector = create_sql_corrector(llm, database_type=DatabaseType.MYSQL, correction_memory=memory)
+    state = cast(
+        AgentState,
+        cast(
+            object,
+            {
+                "user_query": "朝阳有几所学校",
+                "generated_sql": "SELECT COUNT(*) FROM schools WHERE district = '朝阳'",
+                "execution_observation": "0 rows",
+                "assembled_prompt": "### 数据库 Schema\n{}",
+                "correction_count": 0,
+            },
+        ),
+    )
+    result = corrector(state)
+    assert "district = '海淀区'" in prompts[0]
+    assert result.get("corrected_from_sql") == "SELECT COUNT(*) FROM schools WHERE district = '朝阳'"
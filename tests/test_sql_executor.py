@@ -0,0 +1,53 @@
+"""
+测试 sql_executor 的 SQL 安全检查与观测格式化
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from agents.sql_executor import _normalize_sql, format_observation, is_safe_sql
+
+
+def test_allows_select_and_cte():
+    assert is_safe_sql("select school_name, updated_at from schools")
+    assert is_safe_sql("  WITH t AS (SELECT 1 AS a) SELECT a FROM t")
+
+
+def test_rejects_dangerous_keywords_and_non_select():
+    assert not is_safe_sql("SELECT 1; drop table schools")
+    assert not is_safe_sql("DELETE FROM schools")
+    assert not is_safe_sql("SHOW TABLES")
+    # 与 prompts.sql_rules 共用同一份禁止关键字列表
+    assert not is_safe_sql("WITH x AS (SELECT 1) SELECT * FROM x WHERE CALL proc()")
+
+
+def test_format_observation_small_result_is_complete():
+    rows = [{"id": i, "name": f"学校{i}"} for i in range(150)]
+    observation = format_observation(rows)
+    assert "返回了 150 条记录" in observation
+    assert '"学校149"' in observation
+
+
+def test_format_observation_falls_back_to_sample_over_byte_budget():
+    rows = [{"id": i, "blob": "x" * 4000} for i in range(10)]
+    observation = format_observation(rows)
+    assert "共 10 条" in observation
+    assert '"id":2' not in observation
+
+
+def test_format_observation_keeps_truncated_first_row_when_it_exceeds_budget():
+    rows = [{"id": 1, "blob": "学" * 10000}]
+    observation = format_observation(rows)
+    assert "前 1 条样本数据" in observation
+    assert '{"id":1,"blob":"学学' in observation
+    assert "(已截断)" in observation
+    assert len(observation.encode("utf-8")) < 9 * 1024
+
+
+def test_result_cache_key_keeps_whitespace_inside_literals():
+    assert _normalize_sql("SELECT * FROM t WHERE name = 'A  B'") != _normalize_sql("SELECT * FROM t WHERE name = 'A B'")
+    assert _normalize_sql("  SELECT 1 ;\n") == _normalize_sql("SELECT 1")
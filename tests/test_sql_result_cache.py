@@ -0,0 +1,28 @@
+"""
+测试 SQL 查询结果短期缓存
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from tools.sql_result_cache import SQLResultCache
+
+
+def test_sql_result_cache_skips_large_results_and_returns_fresh_rows():
+    cache = SQLResultCache(max_rows=2)
+    cache.put("SELECT big", [{"a": i} for i in range(3)])
+    assert cache.get("SELECT big") is None
+
+    cache.put("SELECT small", [{"a": 1}])
+    hit = cache.get("SELECT small")
+    assert hit == [{"a": 1}]
+    hit[0]["a"] = 99
+    assert cache.get("SELECT small") == [{"a": 1}]
+
+    expired = SQLResultCache(ttl_seconds=0)
+    expired.put("SELECT small", [{"a": 1}])
+    assert expired.get("SELECT small") is None
@@ -0,0 +1,42 @@
+"""
+测试 prompts.sql_rules 的规则拼装与 SQL 安全检查
+"""
+import sys
+from pathlib import Path
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from prompts.sql_rules import (
+    COMMON_SQL_RULES,
+    MYSQL_SPECIFIC_RULES,
+    DatabaseType,
+    get_sql_rules,
+    is_safe_sql,
+)
+
+
+def test_get_sql_rules_combines_common_and_specific_rules():
+    assert get_sql_rules(DatabaseType.MYSQL) == f"{COMMON_SQL_RULES}\n\n{MYSQL_SPECIFIC_RULES}"
+    assert get_sql_rules(DatabaseType.GENERIC) == COMMON_SQL_RULES
+
+
+def test_is_safe_sql_allows_select_cte_and_keyword_like_identifiers():
+    assert is_safe_sql("select school_name, updated_at, created_by from schools")
+    assert is_safe_sql("WITH t AS (SELECT 1 AS a) SELECT a FROM t")
+
+
+def test_is_safe_sql_rejects_writes_and_non_select():
+    assert not is_safe_sql("SELECT 1; drop table schools")
+    assert not is_safe_sql("SELECT * FROM t WHERE id IN (CALL proc())")
+    assert not is_safe_sql("UPDATE schools SET name = 'x'")
+    assert not is_safe_sql("SHOW TABLES")
+
+
+def test_is_safe_sql_allows_create_table_only_when_requested():
+    assert not is_safe_sql("CREATE TABLE t AS SELECT 1")
+    assert is_safe_sql("CREATE TEMPORARY TABLE t AS SELECT updated_at FROM s", allow_create_table=True)
+    assert not is_safe_sql("CREATE TABLE t AS SELECT 1 FROM s WHERE CALL p()", allow_create_table=True)
+    assert not is_safe_sql("DELETE FROM s", allow_create_table=True)
@@ -0,0 +1,65 @@
+"""
+测试统一分析节点 (意图分类 + 歧义检测 + 指标提取合并调用)
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# 兼容从仓库根目录执行: python -m pytest text2sql/tests/...
+TESTS_ROOT = Path(__file__).resolve().parents[1]
+if str(TESTS_ROOT) not in sys.path:
+    sys.path.insert(0, str(TESTS_ROOT))
+
+from agents.unified_analyzer import create_unified_analyzer
+from prompts import EducationDomain, PromptBuilder
+from state import IntentType
+
+
+class _FakeLLM:
+    def __init__(self, content: str):
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return SimpleNamespace(content=self.content)
+
+
+def _run(content: str, **state):
+    llm = _FakeLLM(content)
+    node = create_unified_analyzer(llm, PromptBuilder(EducationDomain()))
+    return node({"user_query": "各区域基础设施得分对比", "messages": [], **state}), llm
+
+
+def test_metric_query_without_ambiguity_returns_selected_indicators():
+    result, llm = _run(
+        '{"intent": {"intent_type": "metric_query", "analysis": "对比", "refined_intent": "各区域基础设施得分对比"},'
+        ' "ambiguity": {"ambiguity_detected": false, "refined_intent": "对比各区域基础设施综合得分"},'
+        ' "selected_indicators": [{"一级指标": "基础设施", "二级指标": "网络"}, {"name": "无效"}]}'
+    )
+
+    assert llm.calls == 1
+    assert result["intent_type"] == IntentType.METRIC_QUERY
+    assert result["ambiguity_detected"] is False
+    assert result["refined_intent"] == "对比各区域基础设施综合得分"
+    assert result["metrics_context"] == [{"一级指标": "基础设施", "二级指标": "网络"}]
+
+
+def test_ambiguity_increments_clarification_count():
+    result, _ = _run(
+        '{"intent": {"intent_type": "metric_query"},'
+        ' "ambiguity": {"ambiguity_detected": true, "clarification_question": "1. 范围？\\nA. 全国\\nB. 上海\\n请选择或补充说明。"},'
+        ' "selected_indicators": []}',
+        clarification_count=1,
+    )
+
+    assert result["ambiguity_detected"] is True
+    assert result["clarification_count"] == 2
+    assert "metrics_context" not in result
+
+
+def test_invalid_output_signals_fallback():
+    result, _ = _run('{"intent_type": "metric_query"}')
+
+    assert result["intent_type"] is None
+    assert result["current_node"] == "unified_analyzer"
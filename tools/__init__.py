@@ -23,8 +23,10 @@ try:
     from tools.schema_cache import (
         get_schema,
         get_schema_text,
+        get_schema_prompt_text,
         get_metrics,
         get_metrics_text,
+        get_metrics_prompt_text,
         get_metrics_summary,
         invalidate_cache,
     )
@@ -44,8 +46,10 @@ except ImportError:
     from .schema_cache import (
         get_schema,
         get_schema_text,
+        get_schema_prompt_text,
         get_metrics,
         get_metrics_text,
+        get_metrics_prompt_text,
         get_metrics_summary,
         invalidate_cache,
     )
@@ -62,8 +66,10 @@ __all__ = [
     # schema_cache
     'get_schema',
     'get_schema_text',
+    'get_schema_prompt_text',
     'get_metrics',
     'get_metrics_text',
+    'get_metrics_prompt_text',
     'get_metrics_summary',
     'invalidate_cache',
 ]
@@ -0,0 +1,130 @@
+"""
+SQL 纠错记忆
+
+记录 "执行失败/空结果的 SQL -> 纠错后执行成功的 SQL"，按 SQL 骨架检索，
+作为后续纠错提示词中的参考示例，让结构相同的错误不必每次从零反思。
+
+骨架为去掉字符串/数字字面量、合并空白并转小写后的 SQL 摘要：
+只有筛选值不同（如地区、年份）的 SQL 共享同一骨架。
+数据保存在 sqlite3 中（进程重启后仍可命中），数据库文件在首次读写时才创建。
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 字符串字面量（支持 '' 与反斜杠转义）与独立的数字字面量
+_STRING_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_LITERAL_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def sql_skeleton(sql: str) -> str:
+    """计算 SQL 骨架摘要（字面量替换为 ?，合并空白，小写，去掉结尾分号）"""
+    skeleton = _STRING_LITERAL_RE.sub("?", sql)
+    skeleton = _NUMBER_LITERAL_RE.sub("?", skeleton)
+    skeleton = _WHITESPACE_RE.sub(" ", skeleton).strip().rstrip(";").rstrip().lower()
+    return hashlib.blake2b(skeleton.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class CorrectionMemory:
+    """基于 sqlite3 的纠错记忆（每个骨架只保留最近 max_per_skeleton 条）"""
+
+    def __init__(self, db_path: str, max_per_skeleton: int = 20):
+        self.db_path = db_path
+        self.max_per_skeleton = max_per_skeleton
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS corrections ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, skeleton TEXT NOT NULL, "
+                "question TEXT NOT NULL, bad_sql TEXT NOT NULL, good_sql TEXT NOT NULL, "
+                "error TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_corrections_skeleton ON corrections (skeleton)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, question: str, bad_sql: str, good_sql: str, error: str = "") -> None:
+        """记录一次成功的纠错（数据库或缓存目录不可用时只记录日志，不影响主流程）"""
+        if not bad_sql or not good_sql or bad_sql.strip() == good_sql.strip():
+            return
+        skeleton = sql_skeleton(bad_sql)
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT INTO corrections (skeleton, question, bad_sql, good_sql, error) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (skeleton, question, bad_sql, good_sql, error),
+                )
+                conn.execute(
+                    "DELETE FROM corrections WHERE skeleton = ? AND id NOT IN ("
+                    "SELECT id FROM corrections WHERE skeleton = ? ORDER BY id DESC LIMIT ?)",
+                    (skeleton, skeleton, self.max_per_skeleton),
+                )
+                conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("纠错记忆写入失败: %s", e)
+
+    def retrieve(self, invalid_sql: str, k: int = 3) -> List[Dict[str, str]]:
+        """按骨架检索最近的 k 条纠错记录（新的在前）"""
+        if not invalid_sql or k <= 0:
+            return []
+        try:
+            with self._lock:
+                rows = self._connection().execute(
+                    "SELECT question, bad_sql, good_sql, error FROM corrections "
+                    "WHERE skeleton = ? ORDER BY id DESC LIMIT ?",
+                    (sql_skeleton(invalid_sql), k),
+                ).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("纠错记忆读取失败: %s", e)
+            return []
+        return [
+            {"question": question, "bad_sql": bad_sql, "good_sql": good_sql, "error": error}
+            for question, bad_sql, good_sql, error in rows
+        ]
+
+
+def format_correction_exemplars(exemplars: List[Dict[str, str]]) -> str:
+    """将纠错记录格式化为提示词中的参考示例，无记录时返回空串"""
+    if not exemplars:
+        return ""
+    parts = ["以下是结构相同的 SQL 过去的成功纠错记录，可作参考（筛选值需以当前问题为准）："]
+    for i, item in enumerate(exemplars, 1):
+        parts.append(
+            f"**参考 {i}:** 问题: {item['question']}\n"
+            f"错误 SQL:\n```sql\n{item['bad_sql']}\n```\n"
+            f"观测: {item['error']}\n"
+            f"修正后 SQL:\n```sql\n{item['good_sql']}\n```"
+        )
+    return "\n".join(parts)
+
+
+_correction_memory: Optional[CorrectionMemory] = None
+
+
+def get_correction_memory() -> CorrectionMemory:
+    """获取进程级共享的纠错记忆"""
+    global _correction_memory
+    if _correction_memory is None:
+        try:
+            from config import config
+        except ImportError:
+            from ..config import config
+        _correction_memory = CorrectionMemory(
+            os.path.join(config.paths.cache_dir, "corrections.sqlite3")
+        )
+    return _correction_memory
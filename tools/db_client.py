@@ -8,9 +8,9 @@
 
 注意: 此模块将被注入到 python_executor 的沙箱环境中
 """
+import contextlib
 from typing import Optional, Dict, Any
 import pandas as pd
-import re
 
 # 数据库连接配置 (存储配置而非连接对象，每次调用时创建新连接)
 _db_config: Optional[Dict[str, Any]] = None
@@ -138,12 +138,10 @@ def load_data(sql: str) -> pd.DataFrame:
             # 虽然 SQLAlchemy 处理类型更好，但为了保险依然保留此逻辑
             for col in df.columns:
                 if df[col].dtype == 'object':
-                    try:
-                        # 尝试转换为数字，失败则保留原样 (errors='ignore')
-                        # 使用 pd.to_numeric 而不是 manual cast
+                    # 尝试转换为数字，失败则保留原样 (errors='ignore')
+                    # 使用 pd.to_numeric 而不是 manual cast
+                    with contextlib.suppress(ValueError, TypeError):
                         df[col] = pd.to_numeric(df[col], errors='ignore')
-                    except:
-                        pass
             
             return df
         finally:
@@ -163,7 +161,7 @@ def load_data(sql: str) -> pd.DataFrame:
 
 def _is_safe_sql(sql: str) -> bool:
     """
-    检查 SQL 是否安全 (只允许 SELECT)
+    检查 SQL 是否安全 (只允许 SELECT)，与 prompts.sql_rules 共用同一份禁止关键字列表
     
     Args:
         sql: SQL 语句
@@ -171,29 +169,8 @@ def _is_safe_sql(sql: str) -> bool:
     Returns:
         bool: 是否安全
     """
-    # 移除注释和多余空白
-    cleaned_sql = sql.strip().upper()
-    
-    # 禁止的关键字列表
-    forbidden_keywords = [
-        'DROP', 'DELETE', 'TRUNCATE', 'UPDATE', 'INSERT', 
-        'ALTER', 'CREATE', 'GRANT', 'REVOKE', 'EXEC', 'EXECUTE'
-    ]
-    
-    # 检查是否以 SELECT 开头
-    if not cleaned_sql.startswith('SELECT'):
-        # 也允许 WITH ... SELECT (CTE)
-        if not cleaned_sql.startswith('WITH'):
-            return False
-    
-    # 检查禁止的关键字
-    for keyword in forbidden_keywords:
-        # 使用正则确保是独立的关键字，而不是字段名的一部分
-        pattern = r'\b' + keyword + r'\b'
-        if re.search(pattern, cleaned_sql):
-            return False
-    
-    return True
+    from prompts.sql_rules import is_safe_sql
+    return is_safe_sql(sql)
 
 
 def get_db_config():
@@ -0,0 +1,82 @@
+"""
+JSON 序列化工具
+
+优先使用 orjson（C 实现，比标准库 json 快一个数量级），
+未安装或遇到 orjson 不支持的数据时回退到标准库 json，输出格式保持一致。
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+
+def _decode_bytes(value: bytes) -> str:
+    return value.decode('utf-8', errors='ignore')
+
+
+# 精确类型 -> 转换函数；按 type(obj) 一次哈希查找，代替逐个 isinstance 判断
+_TYPE_DISPATCH: Dict[type, Callable[[Any], Any]] = {
+    Decimal: float,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    bytes: _decode_bytes,
+}
+
+
+def sql_json_default(obj: Any) -> Any:
+    """处理 MySQL 返回的特殊类型 (Decimal / datetime / date / bytes)"""
+    converter = _TYPE_DISPATCH.get(type(obj))
+    if converter is not None:
+        return converter(obj)
+    # 子类走 isinstance 兜底
+    for base_type, converter in _TYPE_DISPATCH.items():
+        if isinstance(obj, base_type):
+            return converter(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(text: str | bytes) -> Any:
+    """
+    解析 JSON 文本；失败时抛出 json.JSONDecodeError（orjson.JSONDecodeError 为其子类）
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps_compact(data: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    序列化为无空白、保留中文的紧凑 JSON 文本（供 LLM prompt 使用，节省 token）
+
+    等价于 json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=default)
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=default)
+
+
+def dumps_pretty(data: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    序列化为缩进 2 空格、保留中文的 JSON 文本
+
+    等价于 json.dumps(data, ensure_ascii=False, indent=2, default=default)
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                data,
+                default=default,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+            ).decode('utf-8')
+        except TypeError:
+            # orjson 不支持的情况（如超过 64 位的整数），交给标准库处理
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2, default=default)
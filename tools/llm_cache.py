@@ -0,0 +1,231 @@
+"""
+LLM 响应缓存模块
+
+intent_classifier / ambiguity_checker / query_planner 的 prompt 是
+(用户查询, 对话历史, 指标体系/Schema 文本) 的确定性函数，
+对相同 prompt 复用上一次解析成功的结果，省去整次 LLM 往返。
+
+缓存键为 (节点名, 完整 prompt) 的 blake2b 摘要：指标体系或 Schema 文件
+变更后 prompt 文本随之变化，旧条目自然失效，无需额外的 mtime 检查。
+
+另提供基于 sqlite3 的持久化缓存，用于指标定义类问答（跨进程重启复用），
+以及 "进程内 LRU + sqlite" 两级文本缓存，用于 SQL 生成/纠错的原始输出。
+"""
+import copy
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_MISS = object()
+
+
+class LLMResponseCache:
+    """线程安全的 LRU 缓存，存放已解析的 LLM 结果"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str) -> str:
+        payload = f"{namespace}\0{prompt}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def get(self, namespace: str, prompt: str) -> Any:
+        """命中时返回结果的深拷贝，未命中返回 _MISS"""
+        key = self.make_key(namespace, prompt)
+        with self._lock:
+            if key not in self._entries:
+                return _MISS
+            self._entries.move_to_end(key)
+            value = self._entries[key]
+        # 返回副本，避免调用方修改污染缓存
+        return copy.deepcopy(value)
+
+    def put(self, namespace: str, prompt: str, value: Any) -> None:
+        key = self.make_key(namespace, prompt)
+        with self._lock:
+            self._entries[key] = copy.deepcopy(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PersistentResponseCache:
+    """
+    基于 sqlite3 的持久化文本缓存（进程重启后仍可命中）
+
+    用于 "什么是 X 指标" 这类高度重复、答案只随指标体系文件变化的问题。
+    数据库文件在首次读写时才创建。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("持久化缓存读取失败: %s", e)
+            return None
+        return row[0] if row else None
+
+    def put(self, key: str, value: str) -> None:
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("持久化缓存写入失败: %s", e)
+
+
+class TieredResponseCache:
+    """
+    两级文本缓存：进程内 LRU (L1) + sqlite 持久化 (L2)
+
+    L2 命中时回填 L1；键与 LLMResponseCache 相同，为 (命名空间, 完整 prompt) 的摘要。
+    """
+
+    def __init__(self, memory: LLMResponseCache, persistent: PersistentResponseCache | None = None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, namespace: str, prompt: str) -> str | None:
+        value = self.memory.get(namespace, prompt)
+        if value is not _MISS:
+            return value
+        if self.persistent is None:
+            return None
+        value = self.persistent.get(LLMResponseCache.make_key(namespace, prompt))
+        if value is not None:
+            self.memory.put(namespace, prompt, value)
+        return value
+
+    def put(self, namespace: str, prompt: str, value: str) -> None:
+        self.memory.put(namespace, prompt, value)
+        if self.persistent is not None:
+            self.persistent.put(LLMResponseCache.make_key(namespace, prompt), value)
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def make_query_key(query: str, version: object) -> str:
+    """规范化用户问题（合并空白、小写）并与资源版本组合成缓存键"""
+    normalized = _WHITESPACE_RE.sub(" ", query.strip()).lower()
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{version}:{digest}"
+
+
+# ============ 进程级共享实例 ============
+_llm_response_cache = LLMResponseCache()
+
+
+_definition_cache: PersistentResponseCache | None = None
+_sql_cache: TieredResponseCache | None = None
+
+
+def _cache_dir() -> str:
+    try:
+        from config import config
+    except ImportError:
+        from ..config import config
+    return config.paths.cache_dir
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """获取进程级共享的 LLM 响应缓存"""
+    return _llm_response_cache
+
+
+def get_definition_cache() -> PersistentResponseCache:
+    """获取指标定义回复的持久化缓存"""
+    global _definition_cache
+    if _definition_cache is None:
+        _definition_cache = PersistentResponseCache(
+            os.path.join(_cache_dir(), "definitions.sqlite3")
+        )
+    return _definition_cache
+
+
+def get_sql_cache() -> TieredResponseCache:
+    """获取 SQL 生成/纠错输出的两级缓存"""
+    global _sql_cache
+    if _sql_cache is None:
+        _sql_cache = TieredResponseCache(
+            LLMResponseCache(max_entries=1024),
+            PersistentResponseCache(os.path.join(_cache_dir(), "sql.sqlite3")),
+        )
+    return _sql_cache
+
+
+def cached_invoke(
+    cache: Optional[LLMResponseCache],
+    namespace: str,
+    llm_client,
+    prompt: str,
+    parse: Callable[[str], T],
+    should_cache: Optional[Callable[[T], bool]] = None,
+) -> T:
+    """
+    带缓存地调用 LLM 并解析响应
+
+    Args:
+        cache: 缓存实例，为 None 时直接调用 LLM
+        namespace: 缓存命名空间（通常为节点名）
+        llm_client: LLM 客户端，需要有 invoke 方法
+        prompt: 完整提示词
+        parse: 将响应文本解析为结果的函数，抛出的异常原样向上传播（不缓存）
+        should_cache: 判断解析结果是否值得缓存，默认缓存所有非 None 结果
+    """
+    if cache is not None:
+        cached = cache.get(namespace, prompt)
+        if cached is not _MISS:
+            logger.debug("LLM 响应缓存命中: %s", namespace)
+            return cached
+
+    response = llm_client.invoke(prompt)
+    response_text = response.content if hasattr(response, 'content') else str(response)
+    result = parse(response_text)
+
+    if cache is not None:
+        cacheable = should_cache(result) if should_cache is not None else result is not None
+        if cacheable:
+            cache.put(namespace, prompt, result)
+    return result
@@ -0,0 +1,108 @@
+"""
+LLM 响应 JSON 提取工具
+
+LLM 输出常在 JSON 前后夹带说明文字、代码围栏，甚至多个 JSON 块。
+原先各节点使用 find('{') ... rfind('}') 截取，遇到多个块或尾部文字中含括号时
+会截出非法片段而静默回退到默认结果。这里统一用单遍括号深度扫描
+（跳过字符串内部、处理转义），返回第一个可解析的 JSON 对象/数组。
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from tools.json_utils import loads
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# 只匹配影响括号配对的结构字符，由正则引擎（C 实现）跳过其余普通字符，
+# Python 层循环次数从 "字符数" 降为 "结构字符数"
+_STRUCTURAL_PATTERNS = {
+    '{': re.compile(r'[{}"\\]'),
+    '[': re.compile(r'[\[\]"\\]'),
+}
+
+
+def find_balanced_span(text: str, start: int, opener: str = '{') -> Optional[Tuple[int, int]]:
+    """
+    从 text[start]（必须是 opener）开始查找与之配对的闭合括号
+
+    Returns:
+        (start, end) 半开区间；括号未闭合时返回 None
+    """
+    closer = _CLOSERS[opener]
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    for match in _STRUCTURAL_PATTERNS[opener].finditer(text, start):
+        i = match.start()
+        if i == escaped_pos:
+            # 被反斜杠转义的字符
+            continue
+        ch = text[i]
+        if in_string:
+            if ch == '\\':
+                escaped_pos = i + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == opener:
+            depth += 1
+        elif ch == closer:
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+
+def _iter_candidates(text: str, opener: str) -> Iterator[str]:
+    """按出现顺序产出所有括号配对的候选片段"""
+    if not text:
+        return
+    pos = text.find(opener)
+    while pos >= 0:
+        span = find_balanced_span(text, pos, opener)
+        if span is not None:
+            yield text[span[0]:span[1]]
+        pos = text.find(opener, pos + 1)
+
+
+def _extract_first(text: str, opener: str, expected_type: type) -> Any:
+    for candidate in _iter_candidates(text, opener):
+        try:
+            value = loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, expected_type):
+            return value
+    return None
+
+
+def extract_first_json_obj(text: str) -> Optional[Dict[str, Any]]:
+    """提取文本中第一个可解析的 JSON 对象，没有则返回 None"""
+    return _extract_first(text, '{', dict)
+
+
+def extract_first_json_array(text: str) -> Optional[List[Any]]:
+    """提取文本中第一个可解析的 JSON 数组，没有则返回 None"""
+    return _extract_first(text, '[', list)
+
+
+def extract_first_json_model(text: str, model: Type[ModelT]) -> Optional[ModelT]:
+    """
+    提取文本中第一个能通过 model 校验的 JSON 对象，没有则返回 None
+
+    片段直接交给 pydantic 的 model_validate_json（Rust 实现，解析与校验一步完成），
+    节点拿到的是带类型的对象，不再 json.loads 后逐个 .get 取字段；
+    字段类型不符的输出在这里就被拒绝，而不是在下游静默退化。
+    """
+    for candidate in _iter_candidates(text, '{'):
+        try:
+            return model.model_validate_json(candidate)
+        except ValidationError:
+            continue
+    return None
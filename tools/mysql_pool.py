@@ -0,0 +1,121 @@
+"""
+MySQL 连接池 (PyMySQL)
+
+sql_executor 原先每次执行都 pymysql.connect() 一次，每轮对话都要付出
+TCP + 认证握手。这里维护进程级共享的连接池：用完的连接归还复用，
+取出时 ping 检测断线并自动重连；执行出错的连接直接丢弃，不放回池中。
+"""
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+try:
+    from config import config
+except ImportError:
+    from ..config import config
+
+logger = logging.getLogger(__name__)
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception as e:
+        logger.debug("关闭 MySQL 连接失败: %s", e)
+
+
+class MySQLConnectionPool:
+    """线程安全的连接池，限制总连接数，空闲连接按 LIFO 复用"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_connections: int = 25,
+        max_idle: int = 10,
+        timeout: float = 30.0,
+    ):
+        self._connect = connect
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue(maxsize=max_idle)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._timeout = timeout
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """借出一个连接，退出上下文时归还（出错时丢弃）"""
+        if not self._slots.acquire(timeout=self._timeout):
+            raise TimeoutError("MySQL 连接池已耗尽，等待空闲连接超时")
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            else:
+                conn.ping(reconnect=True)
+            yield conn
+        except Exception:
+            # 出错的连接可能处于未知状态（未读完的结果集、断线），不再复用
+            if conn is not None:
+                _close_quietly(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._release(conn)
+            self._slots.release()
+
+    def _release(self, conn: Any) -> None:
+        try:
+            # 结束隐式事务，下次借出时读到最新快照
+            conn.rollback()
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            _close_quietly(conn)
+        except Exception as e:
+            logger.debug("归还 MySQL 连接失败，已丢弃: %s", e)
+            _close_quietly(conn)
+
+    def close_all(self) -> None:
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(conn)
+
+
+# ============ 进程级共享实例 ============
+_pool: MySQLConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _connect_from_config() -> Any:
+    import pymysql  # pyright: ignore[reportMissingModuleSource]
+
+    return pymysql.connect(
+        host=config.database.host,
+        port=config.database.port,
+        user=config.database.user,
+        password=config.database.password,
+        database=config.database.database,
+        charset=config.database.charset,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def get_mysql_pool() -> MySQLConnectionPool:
+    """获取按 config.database 建立的共享连接池（首次调用时创建）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MySQLConnectionPool(
+                    _connect_from_config,
+                    max_connections=config.database.pool_max_connections,
+                )
+                atexit.register(_pool.close_all)
+    return _pool
@@ -2,49 +2,97 @@
 Schema 和指标体系缓存模块
 
 避免每次请求重复读取和解析 JSON 文件。
-模块级缓存：进程生命周期内只读一次磁盘。
+模块级缓存：同时缓存解析后的 dict 和序列化后的 JSON 文本（缩进版用于展示，
+紧凑版用于拼接 LLM prompt 以节省 token），
+每次访问仅做一次 os.stat 检查 mtime，文件变更时自动重新加载（热更新）。
 """
 import json
 import os
 import logging
+from dataclasses import dataclass, field
 from typing import Dict, Any
 
 try:
     from config import config
+    from tools.json_utils import dumps_compact, dumps_pretty, loads
 except ImportError:
     from ..config import config
+    from .json_utils import dumps_compact, dumps_pretty, loads
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class _CachedResource:
+    """单个 JSON 资源文件的缓存条目"""
+    mtime: float | None
+    data: Dict[str, Any]
+    text: str
+    compact_text: str
+    # 由 data 派生的其他结果（如指标摘要），随条目一起失效
+    derived: Dict[str, Any] = field(default_factory=dict)
+
+
 # ============ 模块级缓存 ============
-_schema_cache: Dict[str, Any] | None = None
-_metrics_cache: Dict[str, Any] | None = None
+# path -> _CachedResource
+_cache: Dict[str, _CachedResource] = {}
+
+
+def _get_resource(path: str, label: str) -> _CachedResource:
+    """按路径获取缓存条目，mtime 变化时重新加载"""
+    try:
+        mtime: float | None = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    entry = _cache.get(path)
+    if entry is not None and entry.mtime == mtime:
+        return entry
+
+    data = _load_json(path, label) if mtime is not None else _missing(path, label)
+    entry = _CachedResource(
+        mtime=mtime,
+        data=data,
+        text=dumps_pretty(data),
+        compact_text=dumps_compact(data),
+    )
+    _cache[path] = entry
+    return entry
 
 
 def get_schema() -> Dict[str, Any]:
     """获取数据库 Schema (dict 格式，带缓存)"""
-    global _schema_cache
-    if _schema_cache is None:
-        _schema_cache = _load_json(config.paths.schema_path, "Schema")
-    return _schema_cache
+    return _get_resource(config.paths.schema_path, "Schema").data
 
 
 def get_schema_text() -> str:
     """获取数据库 Schema (JSON 字符串格式，带缓存)"""
-    return json.dumps(get_schema(), ensure_ascii=False, indent=2)
+    return _get_resource(config.paths.schema_path, "Schema").text
+
+
+def get_schema_prompt_text() -> str:
+    """获取数据库 Schema (紧凑 JSON，用于 LLM prompt，带缓存)"""
+    return _get_resource(config.paths.schema_path, "Schema").compact_text
 
 
 def get_metrics() -> Dict[str, Any]:
     """获取完整指标体系 (dict 格式，带缓存)"""
-    global _metrics_cache
-    if _metrics_cache is None:
-        _metrics_cache = _load_json(config.paths.metrics_path, "指标体系")
-    return _metrics_cache
+    return _get_resource(config.paths.metrics_path, "指标体系").data
 
 
 def get_metrics_text() -> str:
     """获取完整指标体系 (JSON 字符串格式，带缓存)"""
-    return json.dumps(get_metrics(), ensure_ascii=False, indent=2)
+    return _get_resource(config.paths.metrics_path, "指标体系").text
+
+
+def get_metrics_prompt_text() -> str:
+    """获取完整指标体系 (紧凑 JSON，用于 LLM prompt，带缓存)"""
+    return _get_resource(config.paths.metrics_path, "指标体系").compact_text
+
+
+def get_metrics_version() -> float | None:
+    """获取指标体系文件的版本 (mtime)，文件不存在时为 None"""
+    return _get_resource(config.paths.metrics_path, "指标体系").mtime
 
 
 def get_metrics_summary() -> str:
@@ -54,7 +102,15 @@ def get_metrics_summary() -> str:
     用于 intent_classifier 等不需要完整 JSON 的场景，
     大幅减少 prompt token 数。
     """
-    metrics = get_metrics()
+    entry = _get_resource(config.paths.metrics_path, "指标体系")
+    summary = entry.derived.get("summary")
+    if summary is None:
+        summary = _build_metrics_summary(entry.data)
+        entry.derived["summary"] = summary
+    return summary
+
+
+def _build_metrics_summary(metrics: Dict[str, Any]) -> str:
     if not metrics:
         return "无指标信息"
     
@@ -71,22 +127,26 @@ def get_metrics_summary() -> str:
 
 def invalidate_cache():
     """清除缓存，强制下次调用重新读取文件（用于热更新场景）"""
-    global _schema_cache, _metrics_cache
-    _schema_cache = None
-    _metrics_cache = None
+    _cache.clear()
     logger.info("Schema/指标缓存已清除")
 
 
+def _missing(path: str, label: str) -> Dict[str, Any]:
+    logger.warning(f"{label}文件不存在: {path}")
+    return {}
+
+
 def _load_json(path: str, label: str) -> Dict[str, Any]:
     """安全加载 JSON 文件"""
-    if not os.path.exists(path):
-        logger.warning(f"{label}文件不存在: {path}")
-        return {}
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            logger.info(f"{label}已加载并缓存: {path}")
-            return data
-    except Exception as e:
+        # 按字节读取后解析（安装 orjson 时走 C 解析器，直接处理 UTF-8）
+        with open(path, 'rb') as f:
+            data = loads(f.read())
+    except json.JSONDecodeError as e:
+        logger.error(f"{label}文件 JSON 格式错误: {path}, 第 {e.lineno} 行第 {e.colno} 列: {e.msg}")
+        return {}
+    except (OSError, UnicodeDecodeError) as e:
         logger.error(f"{label}加载失败: {path}, 错误: {e}")
         return {}
+    logger.info(f"{label}已加载并缓存: {path}")
+    return data
@@ -0,0 +1,86 @@
+"""
+Schema 表级预筛选
+
+普通查询规划时，表较多的 Schema 会整体塞进提示词。这里按用户问题与
+表名/字段名/描述的词元重叠 (Jaccard) 粗选候选表，只把这些表的结构交给 LLM。
+
+为避免漏掉真正需要的表：表数量不超过上限、问题没有可用词元、
+或没有任何表命中时，原样返回完整 Schema。
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+from tools.json_utils import dumps_compact, loads
+
+_ASCII_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RUN_RE = re.compile(r"[一-鿿]+")
+
+
+def _tokens(text: str) -> FrozenSet[str]:
+    """英文按字母数字切词（snake_case 拆开），中文取相邻二字组"""
+    lowered = text.lower()
+    tokens = set(_ASCII_WORD_RE.findall(lowered))
+    for run in _CJK_RUN_RE.findall(lowered):
+        if len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return frozenset(tokens)
+
+
+class TableIndex:
+    """表名 -> 词元集合 的静态索引（同一份 Schema 只构建一次）"""
+
+    def __init__(self, schema: Dict[str, object]):
+        self.schema = schema
+        self.table_tokens: Dict[str, FrozenSet[str]] = {
+            name: _tokens(f"{name} {dumps_compact(table)}") for name, table in schema.items()
+        }
+
+    def prefilter(self, query: str, max_tables: int) -> List[str]:
+        """返回与问题最相关的至多 max_tables 张表（保持 Schema 中的原有顺序）"""
+        names = list(self.schema)
+        if len(names) <= max_tables:
+            return names
+        query_tokens = _tokens(query)
+        if not query_tokens:
+            return names
+        scores = {
+            name: len(query_tokens & tokens) / len(query_tokens | tokens)
+            for name, tokens in self.table_tokens.items()
+        }
+        matched = sorted((name for name in names if scores[name] > 0), key=scores.__getitem__, reverse=True)
+        selected = set(matched[:max_tables])
+        if not selected:
+            return names
+        return [name for name in names if name in selected]
+
+
+@lru_cache(maxsize=8)
+def _table_index(schema_text: str) -> Optional[TableIndex]:
+    """解析 JSON 形式的 Schema（{表名: 表结构}），其他格式返回 None"""
+    try:
+        schema = loads(schema_text)
+    except ValueError:
+        return None
+    if not isinstance(schema, dict) or not all(isinstance(t, (dict, list)) for t in schema.values()):
+        return None
+    return TableIndex(schema)
+
+
+def prefilter_schema_text(schema_text: str, query: str, max_tables: int) -> str:
+    """
+    按问题筛选 Schema 中的表，返回筛选后的紧凑 JSON
+
+    max_tables <= 0、Schema 不是 JSON 表字典或无需筛选时返回原文本。
+    """
+    if max_tables <= 0:
+        return schema_text
+    index = _table_index(schema_text)
+    if index is None:
+        return schema_text
+    selected = index.prefilter(query, max_tables)
+    if len(selected) == len(index.schema):
+        return schema_text
+    return dumps_compact({name: index.schema[name] for name in selected})
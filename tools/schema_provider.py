@@ -54,29 +54,29 @@ class StaticSchemaProvider(SchemaProvider):
 
     def get_schema_text(self) -> str:
         try:
-            from tools.schema_cache import get_schema_text
+            from tools.schema_cache import get_schema_prompt_text
         except ImportError:
-            from .schema_cache import get_schema_text
+            from .schema_cache import get_schema_prompt_text
 
         logger.debug(
             "Loading static schema for workspace=%s tag=%s",
             self.workspace_context.workspace_id,
             self.workspace_context.log_tag,
         )
-        return get_schema_text()
+        return get_schema_prompt_text()
 
     def get_metrics_text(self) -> str:
         try:
-            from tools.schema_cache import get_metrics_text
+            from tools.schema_cache import get_metrics_prompt_text
         except ImportError:
-            from .schema_cache import get_metrics_text
+            from .schema_cache import get_metrics_prompt_text
 
         logger.debug(
             "Loading static metrics for workspace=%s tag=%s",
             self.workspace_context.workspace_id,
             self.workspace_context.log_tag,
         )
-        return get_metrics_text()
+        return get_metrics_prompt_text()
 
 
 class MySQLSchemaProvider(SchemaProvider):
@@ -0,0 +1,108 @@
+"""
+会话存储 - 按最近访问时间淘汰的有界字典
+
+api.py 为每个 session 保存编译后的图和最近一次的 state（可能包含完整查询结果），
+原先的普通 dict 只增不减。这里限制会话数量，并淘汰超过 TTL 未访问的会话，
+被淘汰的会话交给 on_evict 回调清理临时文件等资源；
+is_busy 判定为忙（如图运行进行中）的会话暂不淘汰，等下次新增会话时再判断。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """线程安全的 LRU + 空闲 TTL 会话字典（读写都会刷新访问时间）"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 1800.0,
+        on_evict: Optional[Callable[[Any], None]] = None,
+        is_busy: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.is_busy = is_busy
+        # key -> (最近访问时间, 会话)，按访问顺序排列，最久未访问的在前
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            _, value = self._entries[key]
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            evicted = self._collect_evicted(now, keep=key)
+        # 过期判断只在新增会话时进行，避免 "in" 与取值之间会话被回收
+        self._evict(evicted)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def items(self) -> list[tuple[str, Any]]:
+        with self._lock:
+            return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _collect_evicted(self, now: float, keep: str) -> list[tuple[str, Any]]:
+        """取出超出容量或空闲超时的会话，跳过忙碌的会话与刚写入的 keep（调用方持有锁）"""
+        evicted: list[tuple[str, Any]] = []
+        deadline = now - self.ttl_seconds
+        overflow = len(self._entries) - self.max_entries
+        # 按最久未访问的顺序扫描：容量已满足且遇到未超时的会话时，其后的会话也都未超时
+        for key, (accessed_at, value) in self._entries.items():
+            if overflow <= 0 and accessed_at >= deadline:
+                break
+            if key == keep or (self.is_busy is not None and self.is_busy(value)):
+                continue
+            evicted.append((key, value))
+            overflow -= 1
+        for key, _ in evicted:
+            del self._entries[key]
+        return evicted
+
+    def _evict(self, evicted: list[tuple[str, Any]]) -> None:
+        if self.on_evict is None:
+            return
+        for key, value in evicted:
+            try:
+                self.on_evict(value)
+            except Exception as e:
+                logger.warning("清理过期会话 %s 失败: %s", key, e)
@@ -0,0 +1,80 @@
+"""
+SQL 查询结果的短期缓存
+
+纠错重试、澄清后重新生成时常会再次执行相同的 SELECT，
+60 秒有效期内直接复用结果，省去一次数据库往返。
+键为去掉首尾空白与结尾分号的 SQL 原文（字符串字面量保持原样）。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SQLResultCache:
+    """
+    SQL 查询结果的短期缓存（LRU + 有效期）
+
+    只缓存行数不超过 max_rows 的 "字典列表" 结果；每行保存为 (列名, 值) 元组，
+    命中时按行重建字典即可交给调用方修改，不需要 deepcopy 整个结果集。
+    大结果集不缓存：复制成本可能超过一次数据库往返，且会长期占用内存。
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 60.0, max_rows: int = 1000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        # SQL -> (过期时间, 行快照)
+        self._entries: "OrderedDict[str, tuple[float, tuple[tuple[tuple[str, Any], ...], ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sql: str) -> Optional[List[Dict[str, Any]]]:
+        """命中时返回重建的结果列表，未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(sql)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at <= time.monotonic():
+                del self._entries[sql]
+                return None
+            self._entries.move_to_end(sql)
+        return [dict(row) for row in snapshot]
+
+    def put(self, sql: str, rows: Any) -> None:
+        """写入结果；超过行数上限或不是字典列表时不缓存"""
+        if not isinstance(rows, list) or len(rows) > self.max_rows:
+            return
+        if not all(type(row) is dict for row in rows):
+            return
+        snapshot = tuple(tuple(row.items()) for row in rows)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[sql] = (expires_at, snapshot)
+            self._entries.move_to_end(sql)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, sql: str, compute: Callable[[], Any]) -> Any:
+        """命中时返回缓存结果，否则调用 compute 执行并尝试写入（异常不缓存）"""
+        rows = self.get(sql)
+        if rows is None:
+            rows = compute()
+            self.put(sql, rows)
+        return rows
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ============ 进程级共享实例 ============
+_sql_result_cache = SQLResultCache(max_entries=128, ttl_seconds=60, max_rows=1000)
+
+
+def get_sql_result_cache() -> SQLResultCache:
+    """获取进程级共享的 SQL 查询结果缓存"""
+    return _sql_result_cache
@@ -1241,6 +1241,7 @@ const app = createApp({
 
                                     if (event.sql) {
                                         tempMessage.sql = event.sql;
+                                        tempMessage.sqlDrafting = false;
                                     }
 
                                     // 指标计划数据：首次收到 metric_plan 时初始化计划面板
@@ -1322,6 +1323,15 @@ const app = createApp({
                                         typeWriter(tempMessage, 'reflection', event.reflection);
                                     }
 
+                                } else if (event.type === 'token') {
+                                    // SQL 生成增量：先展示草稿，step 事件到达后替换为清洗后的 SQL
+                                    if (event.node === 'sql_generator' && event.delta) {
+                                        if (!tempMessage.sqlDrafting) {
+                                            tempMessage.sql = '';
+                                            tempMessage.sqlDrafting = true;
+                                        }
+                                        tempMessage.sql += event.delta;
+                                    }
                                 } else if (event.type === 'result') {
                                     // 最终结果
                                     tempMessage.content = event.response;
@@ -1,14 +1,25 @@
 """
 向量检索模块 - 用于将用户口语化查询映射到标准指标
 """
-import json
+import hashlib
+import logging
 import os
-from typing import List, Dict, Any, Optional
+import sys
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 import numpy as np
 
 from config import config
 from state import MetricInfo
+from tools.json_utils import loads
+
+logger = logging.getLogger(__name__)
+
+
+# 指标数量达到该规模时改用 HNSW 近似检索；小规模下暴力内积更快且结果精确
+_HNSW_MIN_ITEMS = 500
+_HNSW_M = 32
+_HNSW_EF_CONSTRUCTION = 200
 
 
 class MetricVectorStore:
@@ -23,8 +34,11 @@ class MetricVectorStore:
         """
         self.embedding_client = embedding_client
         self.metrics_data: List[Dict[str, Any]] = []
+        # (一级指标名, 二级指标名或 None) -> metrics_data 下标，供 get_metric_definition 直接定位
+        self._row_by_name: Dict[Tuple[str, Optional[str]], int] = {}
         self.embeddings: Optional[np.ndarray] = None
         self.index = None  # FAISS index
+        self._metrics_digest = ""  # 指标文件内容摘要（嵌入向量磁盘缓存键）
         
         # 加载指标数据
         self._load_metrics()
@@ -36,69 +50,124 @@ class MetricVectorStore:
         if not os.path.exists(metrics_path):
             raise FileNotFoundError(f"指标文件不存在: {metrics_path}")
         
-        with open(metrics_path, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
+        with open(metrics_path, 'rb') as f:
+            raw_bytes = f.read()
+        raw_data = loads(raw_bytes)  # 安装 orjson 时走 C 解析器
+        self._metrics_digest = hashlib.sha1(raw_bytes).hexdigest()
         
         # 展平为列表，每个元素包含一级和二级指标信息
         self.metrics_data = []
+        self._row_by_name = {}
         
         for level1_name, level1_info in raw_data.items():
+            # 指标名会被反复比较，驻留后相等判断多为指针比较
+            level1_name = sys.intern(level1_name)
             level1_desc = level1_info.get("一级指标解释", "")
             
             # 添加一级指标本身
+            text = f"{level1_name}: {level1_desc}"
+            self._row_by_name.setdefault((level1_name, None), len(self.metrics_data))
             self.metrics_data.append({
                 "level1_name": level1_name,
                 "level1_description": level1_desc,
                 "level2_name": None,
                 "level2_description": None,
-                "text_for_embedding": f"{level1_name}: {level1_desc}"
+                "text_for_embedding": text,
+                "_lower_text": text.lower(),
             })
             
             # 添加二级指标
             level2_dict = level1_info.get("二级指标", {})
             for level2_name, level2_info in level2_dict.items():
+                level2_name = sys.intern(level2_name)
                 level2_desc = level2_info.get("二级指标解释", "")
+                text = f"{level1_name} - {level2_name}: {level2_desc}"
+                self._row_by_name.setdefault((level1_name, level2_name), len(self.metrics_data))
                 self.metrics_data.append({
                     "level1_name": level1_name,
                     "level1_description": level1_desc,
                     "level2_name": level2_name,
                     "level2_description": level2_desc,
-                    "text_for_embedding": f"{level1_name} - {level2_name}: {level2_desc}"
+                    "text_for_embedding": text,
+                    "_lower_text": text.lower(),
                 })
         
-        print(f"已加载 {len(self.metrics_data)} 个指标项")
+        logger.debug("已加载 %d 个指标项", len(self.metrics_data))
     
     def build_index(self):
         """构建向量索引"""
         if self.embedding_client is None:
             raise ValueError("未配置 embedding_client")
         
-        # 获取所有指标文本
-        texts = [m["text_for_embedding"] for m in self.metrics_data]
-        
-        # 生成 embeddings
-        embeddings_list = []
-        for text in texts:
-            emb = self.embedding_client.embed_query(text)
-            embeddings_list.append(emb)
+        # 指标文件与模型不变时直接读取磁盘缓存，省去逐条嵌入的 API 调用
+        cache_path = self._embeddings_cache_path()
+        self.embeddings = self._load_cached_embeddings(cache_path)
+        if self.embeddings is None:
+            # 获取所有指标文本
+            texts = [m["text_for_embedding"] for m in self.metrics_data]
+            
+            # 生成 embeddings（客户端支持批量接口时一次请求多条）
+            if hasattr(self.embedding_client, "embed_documents"):
+                embeddings_list = self.embedding_client.embed_documents(texts)
+            else:
+                embeddings_list = [self.embedding_client.embed_query(text) for text in texts]
+            
+            self.embeddings = np.asarray(embeddings_list, dtype=np.float32)
+            self._save_cached_embeddings(cache_path)
         
-        self.embeddings = np.array(embeddings_list, dtype=np.float32)
+        # 统一 L2 归一化（FAISS 内积与无 FAISS 的余弦搜索都依赖归一化后的矩阵）
+        norms = np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.embeddings /= norms
         
         # 构建 FAISS 索引
         try:
             import faiss
             dimension = self.embeddings.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)  # 使用内积（余弦相似度需要先归一化）
-            
-            # 归一化
-            faiss.normalize_L2(self.embeddings)
+            # 使用内积（矩阵已归一化，即余弦相似度）
+            if len(self.embeddings) >= _HNSW_MIN_ITEMS:
+                self.index = faiss.IndexHNSWFlat(dimension, _HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                self.index.hnsw.efConstruction = _HNSW_EF_CONSTRUCTION
+            else:
+                self.index = faiss.IndexFlatIP(dimension)
             self.index.add(self.embeddings)
             
-            print(f"向量索引构建完成，维度: {dimension}")
+            logger.info("向量索引构建完成，维度: %d", dimension)
         except ImportError:
-            print("警告: FAISS 未安装，将使用简单的余弦相似度搜索")
+            logger.warning("FAISS 未安装，将使用简单的余弦相似度搜索")
             self.index = None
     
+    def _embeddings_cache_path(self) -> str:
+        """嵌入向量缓存文件路径，键为 指标文件内容 + 嵌入模型名"""
+        model_name = getattr(self.embedding_client, "model", None) or config.embedding.model_name
+        key = hashlib.sha1(f"{self._metrics_digest}:{model_name}".encode("utf-8")).hexdigest()[:12]
+        return os.path.join(config.paths.cache_dir, f"metric_embeddings_{key}.npy")
+
+    def _load_cached_embeddings(self, path: str) -> Optional[np.ndarray]:
+        """读取缓存的嵌入矩阵；不存在、损坏或行数不符时返回 None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            embeddings = np.load(path)
+        except Exception as e:
+            logger.warning("读取嵌入向量缓存失败，将重新生成: %s", e)
+            return None
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(self.metrics_data):
+            return None
+        logger.debug("已从缓存加载 %d 个指标向量", embeddings.shape[0])
+        return embeddings
+
+    def _save_cached_embeddings(self, path: str) -> None:
+        """保存嵌入矩阵（只缓存完整结果；有嵌入失败的行时不写入）"""
+        embeddings = self.embeddings
+        if embeddings is None or embeddings.ndim != 2 or embeddings.shape[1] == 0:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.save(path, embeddings)
+        except OSError as e:
+            logger.warning("保存嵌入向量缓存失败: %s", e)
+
     def search(self, query: str, top_k: int = None) -> List[MetricInfo]:
         """
         搜索与查询最相关的指标
@@ -124,21 +193,16 @@ class MetricVectorStore:
             # 使用 FAISS 搜索
             import faiss
             faiss.normalize_L2(query_embedding)
+            hnsw = getattr(self.index, "hnsw", None)
+            if hnsw is not None:
+                hnsw.efSearch = max(64, 2 * top_k)
             scores, indices = self.index.search(query_embedding, top_k)
             
-            results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < 0:
-                    continue
-                metric_data = self.metrics_data[idx]
-                results.append(MetricInfo(
-                    level1_name=metric_data["level1_name"],
-                    level1_description=metric_data["level1_description"],
-                    level2_name=metric_data["level2_name"],
-                    level2_description=metric_data["level2_description"],
-                    similarity_score=float(score)
-                ))
-            return results
+            return [
+                self._metric_info(idx, float(score))
+                for score, idx in zip(scores[0], indices[0])
+                if idx >= 0
+            ]
         else:
             # 使用简单的余弦相似度
             return self._cosine_search(query_embedding[0], top_k)
@@ -146,12 +210,13 @@ class MetricVectorStore:
     def _keyword_search(self, query: str, top_k: int) -> List[MetricInfo]:
         """简单的关键词匹配搜索"""
         results = []
-        query_lower = query.lower()
+        # 中文查询通常没有空格分词，仍按子串匹配；指标文本的小写形式在加载时已预计算
+        query_words = query.lower().split()
         
         for metric_data in self.metrics_data:
-            text = metric_data["text_for_embedding"].lower()
+            text = metric_data["_lower_text"]
             # 计算匹配分数（包含的关键词越多分数越高）
-            score = sum(1 for word in query_lower.split() if word in text)
+            score = sum(1 for word in query_words if word in text)
             if score > 0:
                 results.append((score, metric_data))
         
@@ -180,21 +245,25 @@ class MetricVectorStore:
         # 计算余弦相似度
         similarities = np.dot(self.embeddings, query_norm)
         
-        # 获取 top_k 索引
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # 获取 top_k 索引：先 O(N) 分区选出 k 个，再只对这 k 个排序
+        k = min(top_k, similarities.shape[0])
+        if k <= 0:
+            return []
+        candidates = np.argpartition(similarities, -k)[-k:]
+        top_indices = candidates[np.argsort(similarities[candidates])[::-1]]
         
-        results = []
-        for idx in top_indices:
-            metric_data = self.metrics_data[idx]
-            results.append(MetricInfo(
-                level1_name=metric_data["level1_name"],
-                level1_description=metric_data["level1_description"],
-                level2_name=metric_data["level2_name"],
-                level2_description=metric_data["level2_description"],
-                similarity_score=float(similarities[idx])
-            ))
-        
-        return results
+        return [self._metric_info(idx, float(similarities[idx])) for idx in top_indices]
+    
+    def _metric_info(self, idx: int, score: float) -> MetricInfo:
+        """只为返回的 top_k 行构造 MetricInfo"""
+        metric_data = self.metrics_data[idx]
+        return MetricInfo(
+            level1_name=metric_data["level1_name"],
+            level1_description=metric_data["level1_description"],
+            level2_name=metric_data["level2_name"],
+            level2_description=metric_data["level2_description"],
+            similarity_score=score
+        )
     
     def get_all_metrics(self) -> List[Dict[str, Any]]:
         """获取所有指标数据"""
@@ -211,14 +280,13 @@ class MetricVectorStore:
         Returns:
             指标定义描述
         """
-        for metric in self.metrics_data:
-            if metric["level1_name"] == level1_name:
-                if level2_name is None or metric["level2_name"] == level2_name:
-                    if metric["level2_name"]:
-                        return f"**{metric['level1_name']} - {metric['level2_name']}**: {metric['level2_description']}"
-                    else:
-                        return f"**{metric['level1_name']}**: {metric['level1_description']}"
-        return None
+        idx = self._row_by_name.get((level1_name, level2_name))
+        if idx is None:
+            return None
+        metric = self.metrics_data[idx]
+        if metric["level2_name"]:
+            return f"**{metric['level1_name']} - {metric['level2_name']}**: {metric['level2_description']}"
+        return f"**{metric['level1_name']}**: {metric['level1_description']}"
 
 
 # 全局向量存储实例（延迟初始化）